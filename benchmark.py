@@ -0,0 +1,606 @@
+import os
+import json
+import time
+import logging
+import random
+import argparse
+import threading
+import statistics
+from datetime import datetime, timedelta
+from mock_cru import MockCruServer
+from run_history import percentile
+
+BENCHMARK_EMAIL = 'rider@example.com'
+BENCHMARK_PASSWORD = 'password'
+
+
+def benchmark_config(server):
+    '''
+    Build a configuration that points every engine at the local stand-in server.
+
+    Parameters:
+        server (MockCruServer): The running stand-in server.
+
+    Returns:
+        dict: The configuration.
+    '''
+
+    with open('config.json', 'r') as file:
+        config = json.load(file)
+
+    config['http_api'] = dict(config['http_api'], base_url = server.url)
+    config['login_url'] = f"{server.url}/schedule"
+    config['schedule_url'] = f"{server.url}/schedule"
+    config['auth_cookie'] = 'session'
+    config['run_history'] = dict(config.get('run_history', {}), enabled = False)    # stand-in runs are not history
+    return config
+
+
+def run_http_engine(config, desired_bikes):
+    '''
+    Book once with the HTTP engine, skipping the wait for the booking window.
+
+    Parameters:
+        config (dict): Configuration pointing at the stand-in server.
+        desired_bikes (list): The bikes to be selected, in order of priority.
+
+    Returns:
+        tuple: (login seconds, T0-to-booked seconds, booked).
+    '''
+
+    from http_engine import HttpBookingEngine
+
+    engine = HttpBookingEngine(config, logging.getLogger('benchmark'))
+    try:
+        started = time.perf_counter()
+        engine.client.warm()
+        engine.login_to_website()
+        logged_in = time.perf_counter()
+        booked = engine.book(desired_bikes)
+        return logged_in - started, time.perf_counter() - logged_in, booked
+    finally:
+        engine.client.close()
+
+
+def run_selenium_engine(config, desired_bikes):
+    '''
+    Book once with the BookingBot, skipping the wait for the booking window.
+    The login and location selection stand in for the pre-warm; the booking starts from the session step, as it does at T0.
+    Every attempt's WebDriver commands are checked against 'command_budgets'.
+
+    Parameters:
+        config (dict): Configuration pointing at the stand-in server.
+        desired_bikes (list): The bikes to be selected, in order of priority.
+
+    Returns:
+        tuple: (login seconds, T0-to-booked seconds, booked).
+
+    Raises:
+        CommandBudgetExceeded: If a step sent more WebDriver commands than its budget.
+    '''
+
+    from booking_bot import BookingBot
+    from commands import CommandLog
+
+    bot = BookingBot(config, logging.getLogger('benchmark'))
+    bot.resumes = 0
+    try:
+        bot.start_driver()
+        started = time.perf_counter()
+        bot.login_to_website()
+        logged_in = time.perf_counter()
+        if bot.click_book_now():
+            bot.checkpoints['location'] = bot.driver.current_url
+        bot.log_commands("Pre-warm")
+
+        at_t0 = time.perf_counter()
+        booked = bot.book(desired_bikes)
+        booking_seconds = time.perf_counter() - at_t0
+    finally:
+        bot.stop_driver()
+
+    for _, steps in bot.command_summaries:
+        CommandLog.check_budgets(steps, config.get('command_budgets', {}))
+    return logged_in - started, booking_seconds, booked
+
+
+def run_hybrid_engine(config, desired_bikes):
+    '''
+    Book once with the hybrid engine (browser login, HTTP booking), skipping the wait for the booking window.
+
+    Parameters:
+        config (dict): Configuration pointing at the stand-in server.
+        desired_bikes (list): The bikes to be selected, in order of priority.
+
+    Returns:
+        tuple: (login seconds, T0-to-booked seconds, booked).
+    '''
+
+    from hybrid_engine import HybridBookingEngine
+
+    engine = HybridBookingEngine(config, logging.getLogger('benchmark'))
+    try:
+        engine.browser.start_driver()
+        started = time.perf_counter()
+        engine.client.warm()
+        engine.login_to_website()
+        logged_in = time.perf_counter()
+        booked = engine.book(desired_bikes)
+        return logged_in - started, time.perf_counter() - logged_in, booked
+    finally:
+        engine.browser.stop_driver()
+        engine.client.close()
+
+
+ENGINES = {
+    'http': run_http_engine,
+    'hybrid': run_hybrid_engine,
+    'selenium': run_selenium_engine,
+}
+
+def benchmark_engines(engines, runs, latency = False):
+    '''
+    Book repeatedly with each engine against a fresh stand-in state, and print login and T0-to-booked latency side by side.
+    Runs entirely offline; the browser engines need Chrome.
+
+    Parameters:
+        engines (list): Names of the engines to benchmark (keys of ENGINES).
+        runs (int): Number of bookings per engine.
+        latency (bool, optional): Add the per-endpoint latency and jitter in 'mock_site.latency_ms' to the stand-in. Defaults to False.
+
+    Returns:
+        None
+    '''
+
+    os.environ['CRU_BOOKING_EMAIL'] = BENCHMARK_EMAIL
+    os.environ['CRU_BOOKING_PASSWORD'] = BENCHMARK_PASSWORD
+
+    print(f"{'engine':<10}{'runs':>6}{'booked':>8}{'login p50':>12}{'T0->booked p50':>16}{'T0->booked p95':>16}")
+
+    with open('config.json', 'r') as file:
+        base_config = json.load(file)
+    server_latency = base_config.get('mock_site', {}).get('latency_ms') if latency else None
+
+    for name in engines:
+        with MockCruServer(base_config, BENCHMARK_EMAIL, BENCHMARK_PASSWORD, latency = server_latency) as server:
+            config = benchmark_config(server)
+            logins, bookings, booked = [], [], 0
+
+            for _ in range(runs):
+                server.state.reset()
+                login_seconds, booking_seconds, success = ENGINES[name](config, config['desired_bikes'])
+                logins.append(login_seconds)
+                bookings.append(booking_seconds)
+                booked += success
+
+        print(f"{name:<10}{runs:>6}{booked:>8}{statistics.median(logins) * 1000:>10.1f}ms"
+              f"{statistics.median(bookings) * 1000:>14.1f}ms{percentile(bookings, 0.95) * 1000:>14.1f}ms")
+
+
+def benchmark_stress(engines, runs, seed = None):
+    '''
+    Book repeatedly with each engine against a stand-in with the latency in 'mock_site.latency_ms' and the faults in
+    'mock_site.faults', and print the success rate and time to success. This exercises the retry paths.
+    Command budgets are not checked, since retries legitimately send more commands.
+
+    Parameters:
+        engines (list): Names of the engines to benchmark (keys of ENGINES).
+        runs (int): Number of bookings per engine.
+        seed (int, optional): Seed for the latency and faults, for a reproducible run. Defaults to a random seed.
+
+    Returns:
+        None
+    '''
+
+    os.environ['CRU_BOOKING_EMAIL'] = BENCHMARK_EMAIL
+    os.environ['CRU_BOOKING_PASSWORD'] = BENCHMARK_PASSWORD
+
+    with open('config.json', 'r') as file:
+        base_config = json.load(file)
+    settings = base_config.get('mock_site', {})
+
+    print(f"{'engine':<10}{'runs':>6}{'booked':>8}{'success p50':>14}{'success p95':>14}{'success max':>14}  faults injected")
+
+    for name in engines:
+        with MockCruServer(base_config, BENCHMARK_EMAIL, BENCHMARK_PASSWORD, latency = settings.get('latency_ms'),
+                           faults = settings.get('faults'), seed = seed) as server:
+            config = dict(benchmark_config(server), command_budgets = {})
+            successes = []
+
+            for _ in range(runs):
+                server.state.reset()
+                try:
+                    _, booking_seconds, booked = ENGINES[name](config, config['desired_bikes'])
+                except Exception as e:
+                    logging.getLogger('benchmark').warning(f"{name} run failed: {e!r}")
+                    continue
+                if booked:
+                    successes.append(booking_seconds)
+
+            injected = ', '.join(f"{fault} x{count}" for fault, count in sorted(server.httpd.faults.injected.items())) or 'none'
+
+        if successes:
+            print(f"{name:<10}{runs:>6}{len(successes):>8}{statistics.median(successes):>13.2f}s"
+                  f"{percentile(successes, 0.95):>13.2f}s{max(successes):>13.2f}s  {injected}")
+        else:
+            print(f"{name:<10}{runs:>6}{0:>8}{'-':>14}{'-':>14}{'-':>14}  {injected}")
+
+
+def measure_page(driver, url, logged_in_selector, timeout = 30):
+    '''
+    Load a page and measure it once it is ready for the bot: its iframe shows the login form or the logged-in element,
+    as BookingBot.is_logged_in waits for. Every profile is measured at that same point, whatever its page load strategy.
+
+    Parameters:
+        driver (selenium.webdriver.Chrome): A driver launched with the performance log enabled.
+        url (str): The page to load.
+        logged_in_selector (str): CSS selector of the element shown to a logged-in user ('logged_in_selector').
+        timeout (float, optional): Seconds to wait for the page to be ready. Defaults to 30.
+
+    Returns:
+        tuple: (bytes transferred until ready, seconds until ready (time to interactive), seconds until `driver.get` returned).
+    '''
+
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+
+    driver.get_log('performance')
+    started = time.perf_counter()
+    driver.get(url)
+    load_seconds = time.perf_counter() - started
+
+    iframe = WebDriverWait(driver, timeout).until(lambda driver: driver.find_elements(By.TAG_NAME, "iframe"))[0]
+    driver.switch_to.frame(iframe)
+    try:
+        WebDriverWait(driver, timeout).until(
+            lambda driver: driver.find_elements(By.ID, "username") or driver.find_elements(By.CSS_SELECTOR, logged_in_selector))
+        interactive_seconds = time.perf_counter() - started
+    finally:
+        driver.switch_to.default_content()
+
+    transferred = 0
+    for entry in driver.get_log('performance'):
+        message = json.loads(entry['message'])['message']
+        if message['method'] == 'Network.loadingFinished':
+            transferred += message['params'].get('encodedDataLength', 0)
+
+    return transferred, interactive_seconds, load_seconds
+
+
+def benchmark_pages(profiles, runs):
+    '''
+    Load the login and schedule pages of the live site with each browser profile, and print bytes transferred,
+    time to interactive (until the page is ready for the bot) and load time. Every run uses a new browser, so nothing is served from cache.
+
+    Parameters:
+        profiles (list): Browser profiles to compare ('default' or 'lean').
+        runs (int): Number of loads per page and profile.
+
+    Returns:
+        None
+    '''
+
+    from driver_pool import launch_chrome
+
+    with open('config.json', 'r') as file:
+        config = json.load(file)
+    pages = {'login': config['login_url'], 'schedule': config['schedule_url']}
+
+    print(f"{'profile':<10}{'page':<10}{'KB p50':>10}{'TTI p50':>12}{'load p50':>12}")
+
+    for profile in profiles:
+        profile_config = dict(config, browser_profile = profile, performance_log = True)
+        results = {page: [] for page in pages}
+
+        for _ in range(runs):
+            driver = launch_chrome(profile_config)
+            try:
+                for page, url in pages.items():
+                    results[page].append(measure_page(driver, url, config['logged_in_selector']))
+            finally:
+                driver.quit()
+
+        for page, measurements in results.items():
+            transferred, interactive, load = (statistics.median(values) for values in zip(*measurements))
+            print(f"{profile:<10}{page:<10}{transferred / 1024:>10.0f}{interactive * 1000:>10.0f}ms{load * 1000:>10.0f}ms")
+
+
+class MemorySampler:
+
+    def __init__(self, measure, interval = 0.1):
+        '''
+        Sample resident memory in a background thread, keeping the peak.
+
+        Parameters:
+            measure (callable): Returns the current resident memory in MB.
+            interval (float, optional): Seconds between samples. Defaults to 0.1.
+        '''
+
+        self.measure = measure
+        self.interval = interval
+        self.peak_mb = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target = self._sample, daemon = True)
+
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak_mb = max(self.peak_mb, self.measure() or 0)
+
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._stop.set()
+        self._thread.join()
+        return False
+
+
+def run_browser_mode(config, server, mode, workers, lead):
+    '''
+    Run one round of the browser workload: every worker books its own bike on the stand-in with a BookingBot,
+    as `bot_runner.main` runs it in the given browser mode (shared login and coordinator, the configured pre-warm),
+    with T0 `lead` seconds from now. The policy lets every worker book, so each one's time to a confirmed booking is measured.
+
+    Parameters:
+        config (dict): Configuration pointing at the stand-in server.
+        server (MockCruServer): The running stand-in server, with a fresh state and at least `workers` bikes.
+        mode (str): 'per_bike' for one browser per worker, or 'tabs' for one tab per worker in a shared browser.
+        workers (int): Number of parallel workers.
+        lead (float): Seconds from now to T0, which must leave time for the pre-warm.
+
+    Returns:
+        tuple: (T0-to-confirmation seconds of each booking, peak resident MB of this process and its browsers).
+    '''
+
+    from bot_runner import create_bot, priority_bikes
+    from coordinator import BookingCoordinator
+    from driver_pool import process_tree_memory_mb
+    from session_share import SharedLogin
+    from tabs import TabBrowser
+
+    bikes = server.state.bikes[:workers]
+    opening = datetime.now() + timedelta(seconds = lead)
+    t0 = time.monotonic() + lead
+    round_config = dict(config, engine = 'selenium', browser_mode = mode, desired_bikes = bikes, booking_opening = opening.isoformat(),
+                        booking_policy = {'mode': 'up_to_k', 'max_bookings': workers})
+    if mode == 'tabs':
+        round_config['waits'] = dict(config.get('waits', {}), mode = 'poll')
+        round_config['api_capture'] = dict(config.get('api_capture', {}), enabled = False)
+
+    logger = logging.getLogger('browsers')
+    coordinator = BookingCoordinator(round_config, logger)
+    shared_login = SharedLogin(round_config) if round_config.get('shared_login') else None
+
+    with MemorySampler(lambda: process_tree_memory_mb(os.getpid())) as sampler:
+        browser = TabBrowser(round_config) if mode == 'tabs' else None
+        try:
+            if browser:
+                browser.start()
+            bots = [create_bot(round_config, bike, logging.getLogger(f"browsers.{bike}"), browser, shared_login, coordinator) for bike in bikes]
+            threads = [threading.Thread(target = bot.run, args = (priority_bikes(round_config, bike),), name = f"worker-{bike}")
+                       for bike, bot in zip(bikes, bots)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            if browser:
+                browser.close()
+
+    return [confirmed - t0 for confirmed in coordinator.confirmed_at], sampler.peak_mb
+
+
+def benchmark_browser_modes(modes, workers, runs, lead = None, seed = None):
+    '''
+    Compare one browser per bike with one tab per bike in a shared browser, booking on the stand-in server.
+    Prints the bookings, T0-to-confirmation latency and peak resident memory of each mode.
+    The stand-in adds the latency in 'mock_site.latency_ms'; no faults are injected.
+
+    Parameters:
+        modes (list): Browser modes to compare ('per_bike' or 'tabs').
+        workers (int): Number of parallel workers.
+        runs (int): Number of rounds per mode.
+        lead (float, optional): Seconds from starting the workers to T0. Defaults to enough for the pre-warm of every worker.
+        seed (int, optional): Seed for the stand-in's latency, for a reproducible run. Defaults to a random seed.
+
+    Returns:
+        None
+    '''
+
+    os.environ['CRU_BOOKING_EMAIL'] = BENCHMARK_EMAIL
+    os.environ['CRU_BOOKING_PASSWORD'] = BENCHMARK_PASSWORD
+
+    with open('config.json', 'r') as file:
+        base_config = json.load(file)
+    bikes = [f"B{number}" for number in range(1, workers + 1)]
+    # Chrome starts take a few seconds each and contend for the CPU
+    lead = lead if lead is not None else 10 + 1.5 * workers
+
+    print(f"{'mode':<10}{'workers':>8}{'booked':>8}{'T0->conf p50':>14}{'p95':>9}{'peak RSS':>12}")
+
+    with MockCruServer(base_config, BENCHMARK_EMAIL, BENCHMARK_PASSWORD, bikes = bikes,
+                       latency = base_config.get('mock_site', {}).get('latency_ms'), seed = seed) as server:
+        config = dict(benchmark_config(server), command_budgets = {})
+        config['tracing'] = dict(config.get('tracing', {}), enabled = False)
+
+        for mode in modes:
+            latencies, peaks = [], []
+            for _ in range(runs):
+                server.state.reset()
+                round_latencies, peak_mb = run_browser_mode(config, server, mode, workers, lead)
+                latencies.extend(round_latencies)
+                peaks.append(peak_mb)
+
+            if latencies:
+                timings = f"{statistics.median(latencies) * 1000:>12.0f}ms{percentile(latencies, 0.95) * 1000:>7.0f}ms"
+            else:
+                timings = f"{'-':>14}{'-':>9}"
+            print(f"{mode:<10}{workers:>8}{len(latencies):>8}{timings}{max(peaks):>9.0f} MB")
+
+
+def run_contention_round(config, server, workers, lead, rng):
+    '''
+    Race a number of booking workers for the stand-in's bikes, each driven as `bot_runner.book_bike` drives it:
+    its own bot and coordinator (every worker stands for a separate rider), the configured pre-warm, and T0 `lead` seconds from now.
+    Workers start on the desired bikes in turn and fall through to the rest of the pool in a shuffled order.
+
+    Parameters:
+        config (dict): Configuration pointing at the stand-in server.
+        server (MockCruServer): The running stand-in server, with a fresh state.
+        workers (int): Number of workers.
+        lead (float): Seconds from now to T0, which must leave time for the pre-warm.
+        rng (random.Random): Random number generator for the pool order.
+
+    Returns:
+        tuple: (number of bookings, T0-to-confirmation seconds of each booking, WebDriver commands of each booking, peak resident MB).
+    '''
+
+    from bot_runner import create_bot, priority_bikes
+    from coordinator import BookingCoordinator
+    from driver_pool import process_tree_memory_mb
+
+    popular = [bike for bike in config['desired_bikes'] if bike in server.state.bikes] or server.state.bikes[:1]
+    others = [bike for bike in server.state.bikes if bike not in popular]
+    rng.shuffle(others)
+
+    opening = datetime.now() + timedelta(seconds = lead)
+    t0 = time.monotonic() + lead
+    round_config = dict(config, desired_bikes = popular + others, booking_opening = opening.isoformat())
+
+    bots, coordinators = [], []
+    for worker in range(workers):
+        logger = logging.getLogger(f"contention.{worker}")
+        coordinators.append(BookingCoordinator(round_config, logger))
+        bots.append(create_bot(round_config, popular[worker % len(popular)], logger, coordinator = coordinators[-1]))
+
+    threads = [threading.Thread(target = bot.run, args = (priority_bikes(round_config, popular[worker % len(popular)]),), name = f"worker-{worker}")
+               for worker, bot in enumerate(bots)]
+
+    with MemorySampler(lambda: process_tree_memory_mb(os.getpid())) as sampler:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    latencies, commands = [], []
+    for bot, coordinator in zip(bots, coordinators):
+        if not coordinator.confirmed_at:
+            continue
+        latencies.append(coordinator.confirmed_at[0] - t0)
+
+        # The hybrid engine's WebDriver commands are its browser's; the HTTP engine sends none
+        summaries = getattr(getattr(bot, 'browser', bot), 'command_summaries', None)
+        if summaries is not None:
+            commands.append(sum(totals['commands'] for label, steps in summaries if label != "Pre-warm" for totals in steps.values()))
+
+    return len(latencies), latencies, commands, sampler.peak_mb
+
+
+def benchmark_contention(worker_counts, bike_count, engine = None, lead = None, seed = None):
+    '''
+    Scale the number of workers racing for a fixed pool of bikes, and print the win rate, T0-to-confirmation latency,
+    WebDriver commands per booking and peak resident memory of this process and its browsers at each scale.
+    The stand-in adds the latency in 'mock_site.latency_ms'; the bike pool is the only contention, so no faults are injected.
+
+    Parameters:
+        worker_counts (list): Numbers of workers to race.
+        bike_count (int): Number of bikes in the pool (B1 to B<n>).
+        engine (str, optional): Booking engine. Defaults to the configured engine.
+        lead (float, optional): Seconds from starting the workers to T0. Defaults to enough for the pre-warm of every worker.
+        seed (int, optional): Seed for the latency and pool order, for a reproducible run. Defaults to a random seed.
+
+    Returns:
+        None
+    '''
+
+    os.environ['CRU_BOOKING_EMAIL'] = BENCHMARK_EMAIL
+    os.environ['CRU_BOOKING_PASSWORD'] = BENCHMARK_PASSWORD
+
+    with open('config.json', 'r') as file:
+        base_config = json.load(file)
+    bikes = [f"B{number}" for number in range(1, bike_count + 1)]
+    rng = random.Random(seed)
+    logging.getLogger('contention').setLevel(logging.CRITICAL)    # every loser logs its failure
+
+    print(f"{'workers':>8}{'bikes':>7}{'booked':>8}{'win rate':>10}{'T0->conf p50':>14}{'p95':>9}{'p99':>9}{'cmds/booking':>14}{'peak RSS':>12}")
+
+    with MockCruServer(base_config, BENCHMARK_EMAIL, BENCHMARK_PASSWORD, bikes = bikes,
+                       latency = base_config.get('mock_site', {}).get('latency_ms'), seed = seed) as server:
+        config = dict(benchmark_config(server), engine = engine or base_config.get('engine'), command_budgets = {})
+        config['tracing'] = dict(config.get('tracing', {}), enabled = False)
+        browser = config['engine'] != 'http'
+
+        for workers in worker_counts:
+            server.state.reset()
+            # Chrome starts take a few seconds each and contend for the CPU
+            round_lead = lead if lead is not None else (10 + 1.5 * workers if browser else 3)
+            booked, latencies, commands, peak_mb = run_contention_round(config, server, workers, round_lead, rng)
+
+            if latencies:
+                timings = ''.join(f"{percentile(latencies, fraction) * 1000:>{width}.0f}ms" for fraction, width in ((0.5, 12), (0.95, 7), (0.99, 7)))
+            else:
+                timings = f"{'-':>14}{'-':>9}{'-':>9}"
+            per_booking = f"{statistics.mean(commands):>14.1f}" if commands else f"{'-':>14}"
+            print(f"{workers:>8}{bike_count:>7}{booked:>8}{booked / workers:>10.0%}{timings}{per_booking}{peak_mb:>9.0f} MB")
+
+
+def main():
+    '''
+    Command-line entry point for the offline benchmarks.
+
+    Returns:
+        None
+    '''
+
+    parser = argparse.ArgumentParser(description = "Offline booking benchmarks against the local stand-in site.")
+    subparsers = parser.add_subparsers(dest = 'command', required = True)
+
+    engines_parser = subparsers.add_parser('engines', help = "End-to-end latency of each booking engine.")
+    engines_parser.add_argument('--engine', action = 'append', choices = sorted(ENGINES), help = "Engine to benchmark (repeatable). Defaults to all.")
+    engines_parser.add_argument('--runs', type = int, default = 20)
+    engines_parser.add_argument('--latency', action = 'store_true', help = "Add the per-endpoint latency and jitter in 'mock_site.latency_ms'.")
+
+    stress_parser = subparsers.add_parser('stress', help = "Success rate and time to success of each engine under injected latency and faults.")
+    stress_parser.add_argument('--engine', action = 'append', choices = sorted(ENGINES), help = "Engine to benchmark (repeatable). Defaults to all.")
+    stress_parser.add_argument('--runs', type = int, default = 20)
+    stress_parser.add_argument('--seed', type = int, help = "Seed for a reproducible run.")
+
+    pages_parser = subparsers.add_parser('pages', help = "Bytes transferred and time to interactive of the live login and schedule pages, per browser profile.")
+    pages_parser.add_argument('--profile', action = 'append', choices = ['default', 'lean'], help = "Browser profile (repeatable). Defaults to both.")
+    pages_parser.add_argument('--runs', type = int, default = 5)
+
+    browsers_parser = subparsers.add_parser('browsers', help = "Time to a confirmed booking and peak memory of one browser per bike against one tab per bike.")
+    browsers_parser.add_argument('--mode', action = 'append', choices = ['per_bike', 'tabs'], help = "Browser mode (repeatable). Defaults to both.")
+    browsers_parser.add_argument('--workers', type = int, default = 4)
+    browsers_parser.add_argument('--runs', type = int, default = 3)
+    browsers_parser.add_argument('--lead', type = float, help = "Seconds from starting the workers to T0.")
+    browsers_parser.add_argument('--seed', type = int, help = "Seed for a reproducible run.")
+
+    contention_parser = subparsers.add_parser('contention', help = "Win rate, latency, commands and memory of many workers racing for a fixed bike pool.")
+    contention_parser.add_argument('--workers', default = '1,5,10,25,50', help = "Comma-separated numbers of workers. Defaults to 1,5,10,25,50.")
+    contention_parser.add_argument('--bikes', type = int, default = 10, help = "Number of bikes in the pool. Defaults to 10.")
+    contention_parser.add_argument('--engine', choices = sorted(ENGINES), help = "Booking engine. Defaults to the configured engine.")
+    contention_parser.add_argument('--lead', type = float, help = "Seconds from starting the workers to T0.")
+    contention_parser.add_argument('--seed', type = int, help = "Seed for a reproducible run.")
+
+    args = parser.parse_args()
+    logging.basicConfig(level = logging.WARNING)
+
+    if args.command == 'engines':
+        benchmark_engines(args.engine or sorted(ENGINES), args.runs, args.latency)
+    elif args.command == 'stress':
+        benchmark_stress(args.engine or sorted(ENGINES), args.runs, args.seed)
+    elif args.command == 'pages':
+        benchmark_pages(args.profile or ['default', 'lean'], args.runs)
+    elif args.command == 'browsers':
+        benchmark_browser_modes(args.mode or ['per_bike', 'tabs'], args.workers, args.runs, args.lead, args.seed)
+    elif args.command == 'contention':
+        benchmark_contention([int(workers) for workers in args.workers.split(',')], args.bikes, args.engine, args.lead, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,84 +1,162 @@
 import os
 import time
 import logging
-from datetime import datetime
-from selenium import webdriver
+from scheduler import BookingScheduler
+from driver_pool import launch_chrome
+from session_share import capture_session, inject_session
+from waits import Waiter
+from commands import CommandLog
+from coordinator import BookingCancelled
+from tracing import TRACER, traced
+from run_history import RunRecorder
+from network_capture import NetworkCapture, json_path
 from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.action_chains import ActionChains
-from selenium.common.exceptions import NoSuchElementException, TimeoutException
-from selenium.webdriver.chrome.service import Service as ChromeService
-from webdriver_manager.chrome import ChromeDriverManager
+from selenium.common.exceptions import NoSuchElementException, TimeoutException, WebDriverException, StaleElementReferenceException, ElementClickInterceptedException
+
+# Booking steps in order; see BookingBot.run_step
+BOOKING_STEPS = ['login', 'location', 'session', 'bike', 'series']
+# The bike and series steps run inside the schedule iframe, whose state no URL restores: a later attempt replays them from the session
+RESUMABLE_STEPS = ['login', 'location', 'session']
+
+# Extracts every session in a day column: text, time, data-instructor, link href and the link element itself
+SESSIONS_SCRIPT = '''
+var day = document.getElementsByClassName(arguments[0])[0];
+if (!day) return null;
+return Array.prototype.map.call(day.querySelectorAll('div[data-instructor]'), function(session) {
+    var link = session.querySelector('a');
+    var time = session.innerText.match(/\\d{1,2}:\\d{2}\\s*[AP]M/i);
+    return {
+        text: session.innerText,
+        time: time ? time[0] : null,
+        data_instructor: session.getAttribute('data-instructor'),
+        href: link ? link.href : null,
+        link: link
+    };
+});
+'''
+
+
+# Scrolls to and clicks the element matching a selector, returning its session's text (null if it is not rendered yet)
+CLICK_SCRIPT = '''
+var link = document.querySelector(arguments[0]);
+if (!link) return null;
+link.scrollIntoView();
+link.click();
+var session = link.closest('[data-instructor]') || link;
+return session.innerText;
+'''
+
+# Maps every bike on the seat map (the text of the span inside its link) to its availability and link
+SEATS_SCRIPT = '''
+var takenClasses = arguments[0], seats = {};
+Array.prototype.forEach.call(document.querySelectorAll('a span'), function(span) {
+    var link = span.closest('a'), bike = span.textContent.trim();
+    if (!bike) return;
+    var taken = takenClasses.some(function(name) { return link.classList.contains(name); })
+        || link.getAttribute('aria-disabled') === 'true'
+        || window.getComputedStyle(link).pointerEvents === 'none'
+        || link.offsetParent === null;
+    seats[bike] = {available: !taken, link: link};
+});
+return Object.keys(seats).length ? seats : null;
+'''
+
+
+def match_session(sessions, desired_session):
+    '''
+    Find the desired session in a snapshot of a day's sessions.
+
+    Parameters:
+        sessions (list): Sessions extracted by SESSIONS_SCRIPT.
+        desired_session (dict): The 'desired_session' configuration (activity, instructor and time).
+
+    Returns:
+        dict: The first matching session with a link, or None if there is no match.
+    '''
+
+    for session in sessions:
+        session_text = session['text']
+        if (desired_session['activity'] in session_text) and (desired_session['instructor'] in session_text) and (desired_session['time'] in session_text):
+            if session['link'] is not None:
+                return session
+    return None
+
 
 class BookingBot:
 
-    def __init__(self, config, logger = None):
+    def __init__(self, config, logger = None, driver_pool = None, shared_login = None, coordinator = None, user_data_dir = None):
         '''
         Initialise the BookingBot with the given configuration.
 
         Parameters:
             config (dict): Configuration settings loaded from a JSON file.
             logger (logging.Logger, optional): Logger object for logging events. Defaults to the root logger.
+            driver_pool (DriverPool or TabBrowser, optional): Pool of warm drivers, or shared browser to check out a tab from. Defaults to launching a new driver per attempt.
+            shared_login (SharedLogin, optional): Login session shared with the other bike workers. Defaults to signing in separately.
+            coordinator (BookingCoordinator, optional): Coordinator shared with the other bike workers, which cancels this bot once
+                enough bikes are booked. Defaults to booking independently.
+            user_data_dir (str, optional): Persistent Chrome profile of this worker, which keeps the HTTP cache and the login
+                between runs. Takes precedence over the driver pool, whose drivers are reset between uses. Defaults to a temporary profile.
         '''
 
         self.config = config
         self.logger = logger or logging.getLogger()
+        self.user_data_dir = user_data_dir
+        self.driver_pool = None if user_data_dir else driver_pool
+        self.shared_login = shared_login
+        self.coordinator = coordinator
+        self.is_login_leader = shared_login.claim_leadership() if shared_login else False
         self.driver = None
+        self.capture = None
         self.lag = config['default_lag']
-
-
-    def is_time_to_book(self):
-        '''
-        Check if the current day and time match the booking criteria defined in the config.json file.
-        Logs the current day and time and whether it's the right time to book.
-
-        Returns:
-            bool: True if the current day and time are within the booking window, False otherwise.
-        '''
-        
-        # Get the current date and time
-        now = datetime.now()
-
-        # Log the current day and time
-        self.logger.info(f"Current day and time: {now.strftime('%A, %H:%M')}")
-
-        # Check if today matches the booking day
-        if now.strftime('%A') == self.config['booking_day']:
-
-            # Check if the time is within the booking window
-            if now.hour == self.config['booking_hour'] and self.config['booking_minute_start'] <= now.minute <= self.config['booking_minute_end']:
-                self.logger.info("It's within the booking window!")
-                return True
-            else:
-                self.logger.info("It's not the right time to book yet.")
-                return False
-            
-        else:
-            self.logger.info("Today is not the booking day.")
-            return False
-
-
+        self.checkpoints = {}    # step -> URL reached after it last succeeded
+        self.state_times = {}    # step -> seconds spent in it
+        self.booked_bike = None
+        self.outcomes = {}    # step -> (outcome, seconds waited) of its last outcome wait
+        self.commands = None
+        self.command_records = []    # commands sent by drivers stopped since the last summary
+        self.command_summaries = []    # (label, per-step totals) of every attempt; see CommandLog.per_step
+        cancel_check = coordinator.check if coordinator else None
+        self.waiter = Waiter(config, self.logger, cancel_check)
+        self.scheduler = BookingScheduler(config, self.logger, cancel_check)
+        self.history = RunRecorder(config, 'selenium', self.scheduler, coordinator)
+
+
+    @traced()
     def start_driver(self):
         '''
         Initialise the Selenium WebDriver with Chrome as the browser.
+        Checks out a warm driver if a driver pool is set, otherwise launches a new one.
         Logs the start event.
 
         Returns:
             None
         '''
         
-        OPTIONS = Options()
-        OPTIONS.add_argument('--headless=new')  # headless: browser session not visible
-        self.driver = webdriver.Chrome(service = ChromeService(ChromeDriverManager().install()), options = OPTIONS)
-        self.logger.info("Started the Chrome driver.")
+        if self.driver_pool:
+            # Before T0 a driver is worth waiting for until the window opens; after it, for one lag at most
+            timeout = None
+            if self.scheduler.opening_monotonic is not None:
+                timeout = max(self.scheduler.seconds_until(), self.lag)
+            self.driver = self.driver_pool.acquire(timeout)
+            self.logger.info("Checked out a warm Chrome driver from the pool.")
+        else:
+            self.driver = launch_chrome(self.config, self.user_data_dir)
+            self.logger.info(f"Started the Chrome driver{' with profile ' + self.user_data_dir if self.user_data_dir else ''}.")
+
+        self.commands = CommandLog.attach(self.driver)
+
+        if self.config.get('api_capture', {}).get('enabled'):
+            self.capture = NetworkCapture(self.driver, self.config, self.logger, self.waiter.cancel_check)
+            self.capture.start()
 
 
     def stop_driver(self):
         '''
         Terminate the Selenium WebDriver session.
-        Closes the browser window and releases the resources.
+        Returns the driver to the pool if a driver pool is set, otherwise closes the browser window and releases the resources.
         Logs the stop event.
 
         Returns:
@@ -86,15 +164,145 @@ class BookingBot:
         '''
         
         if self.driver:
-            self.driver.quit()
+            self.command_records += self.commands.take()
+            self.commands = None
+            if self.driver_pool:
+                self.driver_pool.release(self.driver)
+            else:
+                self.driver.quit()
             self.driver = None
+            self.capture = None
         self.logger.info("Stopped the Chrome driver.")
 
 
+    def log_commands(self, label):
+        '''
+        Log the WebDriver commands sent since the last summary, per step (e.g. "select_session: 37 commands, 1.80s"),
+        and keep the totals in `command_summaries`.
+
+        Parameters:
+            label (str): What the commands were sent for (e.g. 'Attempt 2').
+
+        Returns:
+            dict: The per-step totals; see `CommandLog.per_step`.
+        '''
+
+        records = self.command_records + (self.commands.take() if self.commands else [])
+        self.command_records = []
+
+        steps = CommandLog.per_step(records)
+        self.command_summaries.append((label, steps))
+        self.logger.info(f"{label} commands: {CommandLog.summary(steps)}.")
+        return steps
+
+
+    def is_logged_in(self):
+        '''
+        Check whether the page loaded in the driver belongs to an authenticated session.
+        Waits for either the login form or the 'logged_in_selector' element to appear in the iframe.
+
+        Returns:
+            bool: True if the session is authenticated, False otherwise.
+        '''
+
+        logged_in_selector = self.config['logged_in_selector']
+
+        try:
+            iframe_element = self.waiter.present(self.driver, (By.TAG_NAME, "iframe"), self.lag, "iframe")
+            self.driver.switch_to.frame(iframe_element)
+
+            self.waiter.until(self.driver, lambda driver: driver.find_elements(By.ID, "username") or driver.find_elements(By.CSS_SELECTOR, logged_in_selector), self.lag, "login state")
+            return not self.driver.find_elements(By.ID, "username")
+
+        except (NoSuchElementException, TimeoutException):
+            return False
+
+        finally:
+            self.driver.switch_to.default_content()
+
+
+    def has_remembered_login(self):
+        '''
+        Check whether the persistent profile is still logged in from a previous run, by loading the login page.
+
+        Returns:
+            bool: True if the session is authenticated, False otherwise.
+        '''
+
+        self.driver.get(self.config['login_url'])
+        if self.is_logged_in():
+            self.logger.info("Already logged in with the persistent profile. Skipping the login form.")
+            return True
+        return False
+
+
+    def join_shared_session(self):
+        '''
+        Log in by injecting the leader's shared session into this driver instead of submitting the login form.
+
+        Returns:
+            bool: True if the injected session is accepted, False otherwise.
+        '''
+
+        snapshot = self.shared_login.wait(self.waiter.cancel_check)
+        if not snapshot:
+            self.logger.info("No shared login session available. Falling back to a full login.")
+            return False
+
+        script_id = inject_session(self.driver, snapshot)
+        self.driver.get(self.config['login_url'])
+        logged_in = self.is_logged_in()
+        self.driver.execute_cdp_cmd('Page.removeScriptToEvaluateOnNewDocument', {'identifier': script_id})
+
+        if logged_in:
+            self.logger.info("Logged in with the shared login session!")
+            return True
+
+        self.logger.info("Shared login session rejected. Falling back to a full login.")
+        return False
+
+
+    @traced()
     def login_to_website(self):
         '''
-        Attempt to log in to the website using the credentials set in environment variables.
+        Log in to the website.
         This method will start the driver if it's not already started.
+        With a persistent profile that is still logged in, the login form is skipped.
+        With a shared login, followers inject the leader's session and only submit the login form if it is rejected,
+        while the leader publishes its session once logged in.
+
+        Returns:
+            bool: True if the login is successful, False otherwise.
+        '''
+
+        if not self.driver:
+            self.start_driver()
+
+        if self.user_data_dir and self.has_remembered_login():
+            logged_in = True
+        else:
+            if self.shared_login and not self.is_login_leader:
+                if self.join_shared_session():
+                    return True
+
+            logged_in = self.submit_login_form()
+
+        if self.is_login_leader:
+            try:
+                if logged_in:
+                    self.shared_login.publish(capture_session(self.driver))
+                else:
+                    self.shared_login.abandon()
+            except WebDriverException as e:
+                self.logger.info(f"Error capturing the shared login session: {e}")
+                self.shared_login.abandon()
+
+        return logged_in
+
+
+    def submit_login_form(self):
+        '''
+        Attempt to log in to the website using the credentials set in environment variables.
 
         Returns:
             bool: True if the login is successful, False otherwise.
@@ -104,9 +312,6 @@ class BookingBot:
             - CRU_BOOKING_PASSWORD: The password to use for self.logger in.
         '''
 
-        if not self.driver:
-            self.start_driver()
-
         # Navigate to the login URL
         self.driver.get(self.config['login_url'])
 
@@ -124,39 +329,44 @@ class BookingBot:
 
         try:
             # Switch to the iframe
-            iframe_element = WebDriverWait(self.driver, self.lag).until(EC.presence_of_element_located((By.TAG_NAME, "iframe")))
+            iframe_element = self.waiter.present(self.driver, (By.TAG_NAME, "iframe"), self.lag, "iframe")
             self.driver.switch_to.frame(iframe_element)
 
             # Find the email and password input fields 
-            email_input = WebDriverWait(self.driver, self.lag).until(EC.presence_of_element_located((By.ID, "username")))
-            password_input = WebDriverWait(self.driver, self.lag).until(EC.presence_of_element_located((By.ID, "password")))
+            email_input = self.waiter.present(self.driver, (By.ID, "username"), self.lag, "username")
+            password_input = self.waiter.present(self.driver, (By.ID, "password"), self.lag, "password")
 
             # Input the email and password
             email_input.send_keys(email)
             password_input.send_keys(password)
 
             # Click the 'Sign In' button
-            sign_in_button = WebDriverWait(self.driver, self.lag).until(EC.element_to_be_clickable((By.XPATH, "//button[@type='submit']")))
+            sign_in_button = self.waiter.clickable(self.driver, (By.XPATH, "//button[@type='submit']"), self.lag, "sign in")
             sign_in_button.click()
 
-            # Wait for a short duration to check for the error message
-            time.sleep(self.lag)  
-            
-            try:
-                error_message = self.driver.find_element(By.CLASS_NAME, "alert")
-                if error_message.is_displayed():
-                    self.logger.info("Login failed: Incorrect username or password.")
-                    return False
-            except (NoSuchElementException, TimeoutException):
-                self.logger.info("Login successful!")
-                self.driver.switch_to.default_content()
-                return True
+            # Wait for either the error message or the login form to go away
+            outcome, _, elapsed = self.waiter.first(self.driver, {
+                'error': EC.visibility_of_element_located((By.CLASS_NAME, "alert")),
+                'success': EC.invisibility_of_element_located((By.ID, "username")),
+            }, self.lag, "login outcome")
+            self.outcomes['login'] = (outcome, elapsed)
+            self.logger.info(f"Login outcome '{outcome}' after {elapsed:.3f}s.")
+
+            if outcome == 'error':
+                self.logger.info("Login failed: Incorrect username or password.")
+                return False
+
+            # No error message within the lag also counts as a successful login
+            self.logger.info("Login successful!")
+            self.driver.switch_to.default_content()
+            return True
 
         except (NoSuchElementException, TimeoutException) as e:
             self.logger.info(f"Error during login: {e}")
             return False
 
 
+    @traced()
     def click_book_now(self):
         '''
         Hover over the 'Book Now' drop-down menu and select the desired location.
@@ -168,7 +378,7 @@ class BookingBot:
         try:
             # Locate the 'Book Now' drop-down menu
             # Note: self.lag is not used here - because there's already some lag time after logging in 
-            book_now_dropdown = WebDriverWait(self.driver, 0).until(EC.presence_of_element_located((By.ID, "book-now")))
+            book_now_dropdown = self.waiter.until(self.driver, EC.presence_of_element_located((By.ID, "book-now")), 0, "book now")
 
             # Hover over the 'Book Now' drop-down menu
             hover = ActionChains(self.driver).move_to_element(book_now_dropdown)
@@ -177,7 +387,7 @@ class BookingBot:
             # Click the desired location from the drop-down menu
             # Note: self.lag is not used here - because there's already some lag time after logging in
             desired_location = self.config['desired_location']
-            location = WebDriverWait(self.driver, 0).until(EC.element_to_be_clickable((By.LINK_TEXT, desired_location)))
+            location = self.waiter.until(self.driver, EC.element_to_be_clickable((By.LINK_TEXT, desired_location)), 0, "location")
             location.click()
 
             self.logger.info(f"Clicked 'Book Now' > {desired_location}!")
@@ -188,6 +398,7 @@ class BookingBot:
             return False
 
 
+    @traced()
     def select_session(self):
         '''
         Select the specified session based on the desired session information.
@@ -200,43 +411,50 @@ class BookingBot:
 
         try:
             # Switch to the iframe
-            iframe_element = WebDriverWait(self.driver, self.lag).until(EC.presence_of_element_located((By.TAG_NAME, "iframe")))
+            iframe_element = self.waiter.present(self.driver, (By.TAG_NAME, "iframe"), self.lag, "iframe")
             self.driver.switch_to.frame(iframe_element)
 
             # Click "NEXT WEEK" button
-            next_week_button = WebDriverWait(self.driver, self.lag).until(EC.presence_of_element_located((By.CLASS_NAME, "next")))
-            next_week_link = WebDriverWait(next_week_button, self.lag).until(EC.element_to_be_clickable((By.TAG_NAME, "a")))
+            next_week_button = self.waiter.present(self.driver, (By.CLASS_NAME, "next"), self.lag, "next week")
+            next_week_link = self.waiter.clickable(next_week_button, (By.TAG_NAME, "a"), self.lag, "next week link")
             self.driver.execute_script("arguments[0].scrollIntoView();", next_week_link)  # Scroll the element into view
+            if self.capture:
+                self.capture.mark('schedule')
             next_week_link.click()
             self.logger.info(f"Clicked 'NEXT WEEK' button!")
 
-            # Locate the desired session day
-            desired_session_day = self.config['desired_session']['day']
-            session_day = WebDriverWait(self.driver, self.lag).until(EC.presence_of_element_located((By.CLASS_NAME, desired_session_day)))
-            session_day_class_attribute = session_day.get_attribute('class')
-            self.logger.info(f"Located desired session day: {session_day_class_attribute}!")
-
-            # Locate the desired instructor (via data-instructor)
-            # Note: An instructor can have multiple sessions in a day
-            desired_session_data_instructor = self.config['desired_session']['data_instructor']
-            all_sessions_day_data_instructor = WebDriverWait(session_day, self.lag).until(EC.presence_of_all_elements_located((By.CSS_SELECTOR, f"div[data-instructor = '{desired_session_data_instructor}']")))
-
-            # Locate, confirm and click on the desired session activity
-            desired_session_activity = self.config['desired_session']['activity']
-            desired_session_instructor = self.config['desired_session']['instructor']
-            desired_session_time = self.config['desired_session']['time']
-
-            for session in all_sessions_day_data_instructor:
-                session_text = session.text
-                if (desired_session_activity in session_text) and (desired_session_instructor in session_text) and (desired_session_time in session_text):
-                    session_day_activity = WebDriverWait(session, self.lag).until(EC.element_to_be_clickable((By.TAG_NAME, "a")))
-                    self.driver.execute_script("arguments[0].scrollIntoView();", session_day_activity)   # Scroll the element into view
-                    session_day_activity.click()
-                    
-                    self.logger.info(f"Clicked on:\n{session_text}")
-                    self.driver.switch_to.default_content()
-                    return True
-            
+            # Move the commands so far to the attempt's records, so the session lookup's own commands can be totalled
+            self.command_records += self.commands.take()
+            desired_session = self.config['desired_session']
+            session = None
+
+            # Prefer the session ID from the captured schedule JSON, falling back to the DOM
+            if self.capture:
+                self.capture.mark('seats')
+                session = self.session_from_capture(desired_session)
+
+            if session is None:
+                # Snapshot the desired session day's sessions by the desired instructor (via data-instructor), in one command per poll
+                # Note: An instructor can have multiple sessions in a day
+                sessions = self.waiter.until(self.driver, lambda driver: [session for session in (driver.execute_script(SESSIONS_SCRIPT, desired_session['day']) or [])
+                                                                          if session['data_instructor'] == desired_session['data_instructor']],
+                                             self.lag, "session snapshot")
+                self.logger.info(f"Located {len(sessions)} sessions by the desired instructor on {desired_session['day']}!")
+
+                # Confirm the desired session activity on the snapshot, then click it with a single command
+                session = match_session(sessions, desired_session)
+                if session:
+                    self.driver.execute_script("arguments[0].scrollIntoView(); arguments[0].click();", session['link'])
+
+            lookup = self.commands.take()
+            self.command_records += lookup
+            self.logger.info(f"Session lookup commands: {CommandLog.summary(CommandLog.per_step(lookup))}.")
+
+            if session:
+                self.logger.info(f"Clicked on:\n{session['text']}")
+                self.driver.switch_to.default_content()
+                return True
+
             self.logger.info("Unable to find the correct activity and/or instructor.")
             return False
         
@@ -245,35 +463,116 @@ class BookingBot:
             return False
     
 
-    def select_bike(self, desired_bike):
+    def session_from_capture(self, desired_session):
+        '''
+        Find the desired session in the captured schedule JSON and click its link ('api_capture.session_link_selector').
+
+        Parameters:
+            desired_session (dict): The 'desired_session' configuration.
+
+        Returns:
+            dict: The clicked session's 'text', or None if no schedule was captured or it has no matching session.
+        '''
+
+        settings = self.config['api_capture']
+        fields = settings['fields']
+
+        schedule = self.capture.wait_for('schedule', self.lag)
+        if schedule is None:
+            self.logger.info("No schedule response captured. Falling back to the DOM.")
+            return None
+
+        for session in json_path(schedule, fields['sessions']) or []:
+            if (str(session.get(fields['day'])) == desired_session['day'] and str(session.get(fields['data_instructor'])) == desired_session['data_instructor']
+                    and desired_session['activity'] in str(session.get(fields['activity'])) and desired_session['instructor'] in str(session.get(fields['instructor']))
+                    and desired_session['time'] in str(session.get(fields['time']))):
+                selector = settings['session_link_selector'].format(id = session[fields['session_id']])
+                self.logger.info(f"Found session {session[fields['session_id']]} in the captured schedule.")
+                text = self.waiter.until(self.driver, lambda driver: driver.execute_script(CLICK_SCRIPT, selector), self.lag, "captured session link")
+                return {'text': text}
+
+        self.logger.info("No matching session in the captured schedule. Falling back to the DOM.")
+        return None
+
+
+    def seats_from_capture(self):
+        '''
+        Read bike availability from the captured seat map JSON.
+
+        Returns:
+            dict: Bike -> availability, or None if no seat map was captured.
+        '''
+
+        fields = self.config['api_capture']['fields']
+
+        seat_map = self.capture.wait_for('seats', self.lag)
+        if seat_map is None:
+            self.logger.info("No seat map response captured. Using the DOM for availability.")
+            return None
+
+        return {str(seat[fields['bike']]): bool(seat[fields['available']]) for seat in json_path(seat_map, fields['seats']) or []}
+
+
+    @traced()
+    def select_bike(self, desired_bikes):
         '''
-        Select the desired bike for the session.
+        Select the highest-priority available bike for the session.
+        The seat map is read in a single command, so taken bikes are skipped without waiting for them.
 
         Parameters:
-            desired_bike (str): The bike to be selected.
+            desired_bikes (str or list): The bike to be selected, or the bikes to be selected in order of priority.
 
         Returns:
-            bool: True if the desired bike is successfully selected, False otherwise.
+            str: The selected bike, or None if none of the desired bikes could be selected.
         '''
 
+        if isinstance(desired_bikes, str):
+            desired_bikes = [desired_bikes]
+
         try:
             # Switch to the iframe
-            iframe_element = WebDriverWait(self.driver, self.lag).until(EC.presence_of_element_located((By.TAG_NAME, "iframe")))
+            iframe_element = self.waiter.present(self.driver, (By.TAG_NAME, "iframe"), self.lag, "iframe")
             self.driver.switch_to.frame(iframe_element)
 
-            # Locate and click the desired bike
-            bike = WebDriverWait(self.driver, self.lag).until(EC.element_to_be_clickable((By.XPATH, f"//a[.//span[text()='{desired_bike}']]")))
-            bike.click()
+            # Snapshot the seat map: bike -> availability and link
+            taken_seat_classes = self.config.get('taken_seat_classes', [])
+            seats = self.waiter.until(self.driver, lambda driver: driver.execute_script(SEATS_SCRIPT, taken_seat_classes), self.lag, "seat map")
+
+            # The captured seat map JSON is authoritative for availability; the DOM only provides the links to click
+            captured_seats = self.seats_from_capture() if self.capture else None
+            if captured_seats:
+                for bike, seat in seats.items():
+                    seat['available'] = captured_seats.get(bike, seat['available'])
+            self.seat_map = {bike: seat['available'] for bike, seat in seats.items()}
+            self.history.seats(self.seat_map)
+            self.logger.info(f"Seat map: {', '.join(f'{bike} ' + ('free' if self.seat_map.get(bike) else 'taken') for bike in desired_bikes)}.")
+
+            # Click the highest-priority free bike
+            for desired_bike in desired_bikes:
+                seat = seats.get(desired_bike)
+                if not (seat and seat['available']):
+                    continue
+
+                try:
+                    seat['link'].click()
+                except (StaleElementReferenceException, ElementClickInterceptedException) as e:
+                    self.logger.info(f"Unable to click bike {desired_bike}: {e}")
+                    continue
+
+                self.logger.info(f"Clicked bike {desired_bike}!")
+                self.driver.switch_to.default_content()
+                return desired_bike
 
-            self.logger.info(f"Clicked bike {desired_bike}!")
+            self.logger.info(f"None of the desired bikes is available: {', '.join(desired_bikes)}.")
             self.driver.switch_to.default_content()
-            return True
+            return None
 
         except (NoSuchElementException, TimeoutException) as e:
             self.logger.info(f"Error when selecting bike: {e}")
-            return False
+            return None
         
     
+    @traced()
     def select_series(self):
         '''
         Select the desired series package to use for the class.
@@ -286,83 +585,359 @@ class BookingBot:
 
         try:
             # Switch to the iframe
-            iframe_element = WebDriverWait(self.driver, self.lag).until(EC.presence_of_element_located((By.TAG_NAME, "iframe")))
+            iframe_element = self.waiter.present(self.driver, (By.TAG_NAME, "iframe"), self.lag, "iframe")
             self.driver.switch_to.frame(iframe_element)
             
             # Locate and click the desired series
             desired_series = self.config['desired_series']
-            series = WebDriverWait(self.driver, self.lag).until(EC.element_to_be_clickable((By.LINK_TEXT, desired_series)))
+            series = self.waiter.clickable(self.driver, (By.LINK_TEXT, desired_series), self.lag, "series")
             series.click()
 
-            # Wait for a short duration to check for the outcome message
-            time.sleep(self.lag)  
-
-            try:
-                success_msg_element = self.driver.find_element(By.CLASS_NAME, "success-message")
-                if success_msg_element.is_displayed():
-                    return success_msg_element.text
-            except (NoSuchElementException, TimeoutException) as e:
-                return f"Error when selecting series: {e}"
+            # Wait for either the success or the error message
+            outcome, message_element, elapsed = self.waiter.first(self.driver, {
+                'success': EC.visibility_of_element_located((By.CLASS_NAME, "success-message")),
+                'error': EC.visibility_of_element_located((By.CLASS_NAME, "alert")),
+            }, self.lag, "series outcome")
+            self.outcomes['series'] = (outcome, elapsed)
+            self.logger.info(f"Series outcome '{outcome}' after {elapsed:.3f}s.")
+
+            if outcome == 'success':
+                return message_element.text
+            elif outcome == 'error':
+                return f"Error when selecting series: {message_element.text}"
+            else:
+                return f"Error when selecting series: no outcome message within {self.lag}s."
 
         except (NoSuchElementException, TimeoutException) as e:
             return f"Error when selecting series: {e}"
 
 
+    def prewarm(self):
+        '''
+        Run the pre-warm phases ahead of the booking window, each at its configured offset before T0:
+        start the driver, log in, then open the location schedule.
+        This leaves only the session, bike and series selection on the critical path at T0.
+        Logs how long each phase took and how much critical-path time was saved.
+
+        Returns:
+            bool: True if the browser is parked on the location schedule, False otherwise.
+        '''
+
+        offsets = self.config.get('prewarm_offsets', {})
+        phases = [('start_driver', self.start_driver),
+                  ('login', self.login_to_website),
+                  ('open_schedule', self.click_book_now)]
+        self.phase_timings = {}
+
+        for phase, step in phases:
+            self.scheduler.wait_until(-offsets.get(phase, 0), label = phase)
+
+            started = time.perf_counter()
+            try:
+                outcome = step()
+            except BookingCancelled:
+                raise
+            except Exception as e:
+                self.logger.error(f"Error during pre-warm phase '{phase}': {e}")
+                outcome = False
+            self.phase_timings[phase] = time.perf_counter() - started
+            self.history.step(phase, self.phase_timings[phase])
+
+            self.logger.info(f"Pre-warm phase '{phase}' took {self.phase_timings[phase]:.2f}s.")
+
+            # start_driver returns None on success
+            if outcome is False:
+                self.logger.info(f"Pre-warm phase '{phase}' failed. The first attempt will start cold.")
+                self.stop_driver()
+                return False
+
+        saved = sum(self.phase_timings.values())
+        self.logger.info(f"Pre-warm complete: {saved:.2f}s moved off the critical path.")
+        return True
+
+
+    def is_session_valid(self):
+        '''
+        Check whether the live driver can still be used to resume booking: it responds to commands,
+        neither the page nor its iframe shows the login form, and one of them proves the login,
+        with the 'auth_cookie' cookie (if set) or the 'logged_in_selector' element.
+
+        Returns:
+            bool: True if the session is still valid, False otherwise.
+        '''
+
+        if not self.driver:
+            return False
+
+        auth_cookie = self.config.get('auth_cookie')
+        logged_in_selector = self.config['logged_in_selector']
+        proven = False
+
+        try:
+            self.driver.switch_to.default_content()
+            iframes = self.driver.find_elements(By.TAG_NAME, "iframe")
+
+            for iframe in [None] + iframes[:1]:
+                if iframe is not None:
+                    self.driver.switch_to.frame(iframe)
+                if self.driver.find_elements(By.ID, "username"):
+                    return False
+                if auth_cookie and self.driver.get_cookie(auth_cookie) is not None:
+                    proven = True
+                elif self.driver.find_elements(By.CSS_SELECTOR, logged_in_selector):
+                    proven = True
+
+            self.driver.switch_to.default_content()
+            return proven
+
+        except WebDriverException:
+            return False
+
+
+    def pause(self, seconds):
+        '''
+        Sleep between retries, waking up early if the coordinator cancels this bot.
+
+        Parameters:
+            seconds (float): Number of seconds to sleep.
+
+        Returns:
+            None
+        '''
+
+        if self.coordinator:
+            self.coordinator.sleep(seconds)
+        else:
+            time.sleep(seconds)
+
+
+    def run_step(self, step, desired_bikes):
+        '''
+        Run a single booking step once.
+
+        Parameters:
+            step (str): One of BOOKING_STEPS.
+            desired_bikes (list): The bikes to be selected, in order of priority.
+
+        Returns:
+            bool: True if the step succeeded, False otherwise.
+        '''
+
+        if step == 'login':
+            return self.login_to_website()
+        elif step == 'location':
+            return self.click_book_now()
+        elif step == 'session':
+            return self.select_session()
+        elif step == 'bike':
+            self.booked_bike = self.select_bike(desired_bikes)
+            if self.booked_bike and self.coordinator:
+                self.coordinator.claim(self.booked_bike)
+            return self.booked_bike is not None
+        else:
+            # Hold a booking slot while selecting the series, so parallel workers never spend more credits than the policy allows
+            if self.coordinator and not self.coordinator.reserve(self.lag):
+                self.logger.info("Booking slots are held by other workers. Not selecting the series yet.")
+                return False
+
+            booked = False
+            try:
+                result = self.select_series()
+                booked = "successfully enrolled" in result
+                if not booked:
+                    self.logger.info(result)
+            finally:
+                if self.coordinator:
+                    if booked:
+                        self.coordinator.confirm(self.booked_bike)
+                    else:
+                        self.coordinator.release()
+            return booked
+
+
+    def prepare_retry(self, step):
+        '''
+        Bring the live driver back to the state a step starts from, before retrying or resuming it.
+        The session step reloads the location schedule; the other steps retry in place.
+
+        Parameters:
+            step (str): One of BOOKING_STEPS.
+
+        Returns:
+            None
+        '''
+
+        if not self.driver:
+            return
+
+        self.driver.switch_to.default_content()
+
+        if step == 'session' and 'location' in self.checkpoints:
+            self.driver.get(self.checkpoints['location'])
+
+
+    def attempt_step(self, step, desired_bikes, resume = False):
+        '''
+        Run a booking step with its own retry budget ('step_retries') and exponential backoff ('step_backoff').
+        Records the URL reached after a successful step in RESUMABLE_STEPS as its checkpoint, and the time spent in the step.
+
+        Parameters:
+            step (str): One of BOOKING_STEPS.
+            desired_bikes (list): The bikes to be selected, in order of priority.
+            resume (bool, optional): Whether the step resumes an earlier attempt, so its starting page is restored first. Defaults to False.
+
+        Returns:
+            bool: True if the step succeeded within its retry budget, False otherwise.
+        '''
+
+        retries = self.config.get('step_retries', {}).get(step, 0)
+        backoff = self.config.get('step_backoff', 0.25)
+        started = time.perf_counter()
+
+        try:
+            for retry in range(retries + 1):
+                if retry:
+                    self.pause(backoff * 2 ** (retry - 1))
+                    self.logger.info(f"Retrying step '{step}' ({retry} of {retries})...")
+
+                try:
+                    if retry or resume:
+                        self.prepare_retry(step)
+                    if self.run_step(step, desired_bikes):
+                        if step in RESUMABLE_STEPS:
+                            self.checkpoints[step] = self.driver.current_url
+                        return True
+                except WebDriverException as e:
+                    self.logger.info(f"Error during step '{step}': {e}")
+
+            return False
+
+        finally:
+            elapsed = time.perf_counter() - started
+            self.state_times[step] = self.state_times.get(step, 0) + elapsed
+            self.history.step(step, elapsed)
+
+
     def run(self, desired_bike):
         '''
         Main function to execute the booking process.
         
-        This function will attempt to the book desired bike based on the configuration settings.
-        This function first checks if it's the right time to book based on the configuration settings.
-        Each bike booking will then go through a series of steps: login, select location, select session and select bike.
+        This function will attempt to the book desired bike based on the configuration settings, falling through to the next bike in priority order if it is taken.
+        This function first waits for the exact opening of the booking window based on the configuration settings,
+        running the pre-warm phases (start driver, login, select location) at their configured offsets before it.
+        The booking then runs as a state machine over BOOKING_STEPS: login, select location, select session, select bike and select series.
+        Each step is retried with its own budget and backoff. Once a step's budget is spent, the next attempt resumes from the
+        previous step (at most the session step) with the live driver, and only restarts from login if the session is no longer valid.
         Each bike booking will be attempted for a maximum number of tries as specified in the configuration.
-        Logs each attempt and the outcome.
+        Logs each attempt, the time spent in each state, the number of resumes and the outcome,
+        and records every attempt in the run history (see 'run_history').
 
         Parameters:
-            desired_bike (str): The bike to be selected.
+            desired_bike (str or list): The bike to be selected, or the bikes to be selected in order of priority.
 
         Returns:
             None
         '''
 
-        # Time check
+        desired_bikes = [desired_bike] if isinstance(desired_bike, str) else list(desired_bike)
+        bikes = ' > '.join(desired_bikes)
+        TRACER.tag(bike = desired_bikes[0], attempt = 0)    # attempt 0 is the pre-warm
+        self.history.bike = desired_bikes[0]
+
+        # Time check: wait for the exact opening instant, for at most 'time_check_limit' minutes
+        self.scheduler.arm()
         time_check_limit = self.config['time_check_limit']
-        time_check_count = 0
 
-        while not self.is_time_to_book():  
-            self.logger.info("Waiting for the right time to book...")
-            time.sleep(60)  
+        if self.scheduler.seconds_until() > time_check_limit * 60:
+            self.logger.info(f"Booking window opens more than {time_check_limit} minutes from now. Exiting.")
+            return None
 
-            time_check_count += 1  
+        self.logger.info("Waiting for the right time to book...")
+        self.checkpoints = {}
+        self.state_times = {}
+        self.resumes = 0
 
-            if time_check_count >= time_check_limit:
-                self.logger.info("Reached the limit for time checks. Exiting.")
-                return None
+        try:
+            prewarmed = self.prewarm()
+            if prewarmed:
+                self.checkpoints['location'] = self.driver.current_url
+            self.history.end_attempt('prewarmed' if prewarmed else 'prewarm_failed', self.log_commands("Pre-warm"))
+            self.scheduler.wait_until()
 
-        # If within the booking window, execute bike booking attempts
-        max_tries = self.config['max_tries']
-        booking_successful = False
+            booking_successful = self.book(desired_bikes)
 
-        for attempt in range(1, max_tries + 1):
-            self.logger.info(f"Attempt {attempt} of {max_tries} for bike {desired_bike}...")
+        except BookingCancelled as e:
+            self.logger.info(f"Another worker completed the booking. Stopping: {e}")
+            self.history.end_attempt('cancelled')
+            return None
 
-            try:
-                if self.login_to_website():
-                    if self.click_book_now():
-                        if self.select_session():
-                            if self.select_bike(desired_bike):
-                                result = self.select_series()
-                                if "successfully enrolled" in result:
-                                    self.logger.info(f"Class booking successful for bike {desired_bike}!")
-                                    booking_successful = True
-                                    break
-                                else:
-                                    self.logger.info(result)
-            finally:
-                self.stop_driver()
+        except Exception:
+            self.history.end_attempt('error')
+            raise
+
+        finally:
+            self.stop_driver()
+            self.history.save(self.logger)
+            self.logger.info(f"Time per state: {', '.join(f'{step} {seconds:.2f}s' for step, seconds in self.state_times.items())}.")
+            self.logger.info(f"Resumed from a live driver {self.resumes} times.")
 
-            # Wait for a short duration before the next attempt
-            time.sleep(self.lag)
-        
         if not booking_successful:
-            self.logger.error(f"Maximum number of tries without success reached for bike {desired_bike}. Please try again later.")
\ No newline at end of file
+            self.logger.error(f"Maximum number of tries without success reached for bike {bikes}. Please try again later.")
+
+
+    def book(self, desired_bikes):
+        '''
+        Run the booking state machine over BOOKING_STEPS, starting from the pre-warmed state if there is one.
+        Each bike booking will be attempted for a maximum number of tries as specified in the configuration.
+
+        Parameters:
+            desired_bikes (list): The bikes to be selected, in order of priority.
+
+        Returns:
+            bool: True if a bike was booked, False otherwise.
+        '''
+
+        max_tries = self.config['max_tries']
+        bikes = ' > '.join(desired_bikes)
+        attempt = 1
+        TRACER.tag(attempt = attempt)
+        index = BOOKING_STEPS.index('session') if 'location' in self.checkpoints else 0
+        resume = False
+        self.logger.info(f"Attempt {attempt} of {max_tries} for bike {bikes}, from step '{BOOKING_STEPS[index]}'...")
+
+        while True:
+            if self.coordinator:
+                self.coordinator.check()
+            step = BOOKING_STEPS[index]
+
+            succeeded = self.attempt_step(step, desired_bikes, resume)
+            resume = False
+            if succeeded:
+                if step == BOOKING_STEPS[-1]:
+                    self.logger.info(f"Class booking successful for bike {self.booked_bike}!")
+                    self.history.end_attempt('booked', self.log_commands(f"Attempt {attempt}"), self.booked_bike)
+                    return True
+                index += 1
+                continue
+
+            # The step's retry budget is spent
+            self.logger.info(f"Attempt {attempt} waits: {self.waiter.summary()}.")
+            self.history.end_attempt(self.history.classify(step, desired_bikes), self.log_commands(f"Attempt {attempt}"))
+            attempt += 1
+            if attempt > max_tries:
+                return False
+            TRACER.tag(attempt = attempt)
+
+            # Wait for a short duration before the next attempt
+            self.pause(self.lag)
+
+            # A failed login leaves no session to resume, whatever the page shows
+            if step != 'login' and self.is_session_valid():
+                index = min(max(index - 1, BOOKING_STEPS.index('location')), BOOKING_STEPS.index(RESUMABLE_STEPS[-1]))
+                resume = True
+                self.resumes += 1
+            else:
+                self.logger.info("Session is no longer valid. Restarting from login.")
+                self.stop_driver()
+                index = 0
+            self.logger.info(f"Attempt {attempt} of {max_tries} for bike {bikes}, from step '{BOOKING_STEPS[index]}'...")
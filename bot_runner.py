@@ -3,6 +3,16 @@ import time
 import json
 import logging
 from booking_bot import BookingBot
+from http_engine import HttpBookingEngine
+from hybrid_engine import HybridBookingEngine
+from driver_pool import DriverPool
+from tabs import TabBrowser
+from driver_resolver import shared_resolver
+from profiles import profile_dir, prune_profiles
+from session_share import SharedLogin
+from coordinator import BookingCoordinator
+from tracing import TRACER
+from sell_out import SellOutPredictor
 from concurrent.futures import ThreadPoolExecutor
 
 # Ensure the 'logs' directory exists
@@ -14,13 +24,17 @@ with open('config.json', 'r') as file:
     config = json.load(file)
 
 
-def book_bike(desired_bike):
+def book_bike(desired_bike, driver_pool = None, shared_login = None, coordinator = None, bikes = None):
     '''
     Function to book a specific bike using the BookingBot class.
     Sets up logging and initiates the booking process for the given bike.
 
     Parameters:
-        desired_bike (str): The bike to be selected.
+        desired_bike (str): The bike to be selected, or the name of the worker (e.g. 'B4-hedge1' for a second worker on B4).
+        driver_pool (DriverPool or TabBrowser, optional): Pool of warm drivers, or the browser whose tabs are shared by all bikes. Defaults to no pool.
+        shared_login (SharedLogin, optional): Login session shared by all bikes. Defaults to each bike signing in separately.
+        coordinator (BookingCoordinator, optional): Coordinator shared by all bikes. Defaults to each bike booking independently.
+        bikes (list, optional): The bikes to be selected, in order of priority. Defaults to `priority_bikes` for the bike.
 
     Returns:
         None
@@ -46,24 +60,111 @@ def book_bike(desired_bike):
     # Add the handler to the logger
     logger.addHandler(file_handler)
 
-    # Run bike booking bot
-    bot = BookingBot(config, logger)
-    bot.run(desired_bike)
+    # Run bike booking bot with the configured engine, falling through to the other desired bikes in priority order if this one is taken
+    bikes = bikes or priority_bikes(config, desired_bike)
+    logger.info(f"Bikes in order of priority: {' > '.join(bikes)}.")
+    bot = create_bot(config, desired_bike, logger, driver_pool, shared_login, coordinator)
+    bot.run(bikes)
+
+
+def priority_bikes(config, desired_bike):
+    '''
+    Order the desired bikes for a worker: its own bike first, then the other desired bikes in the configured order.
+
+    Parameters:
+        config (dict): Configuration settings loaded from a JSON file.
+        desired_bike (str): The worker's bike.
+
+    Returns:
+        list: The bikes to be selected, in order of priority.
+    '''
+
+    return [desired_bike] + [bike for bike in config['desired_bikes'] if bike != desired_bike]
+
+
+def create_bot(config, desired_bike, logger, driver_pool = None, shared_login = None, coordinator = None):
+    '''
+    Create the booking bot of a worker with the engine set in the configuration.
+
+    Parameters:
+        config (dict): Configuration settings loaded from a JSON file.
+        desired_bike (str): The worker's bike, which names its persistent profile.
+        logger (logging.Logger): Logger object for logging events.
+        driver_pool (DriverPool or TabBrowser, optional): Pool of warm drivers, or the browser whose tabs are shared by all bikes. Defaults to no pool.
+        shared_login (SharedLogin, optional): Login session shared by all bikes. Defaults to signing in separately.
+        coordinator (BookingCoordinator, optional): Coordinator shared by all bikes. Defaults to booking independently.
+
+    Returns:
+        BookingBot, HttpBookingEngine or HybridBookingEngine: The bot.
+    '''
+
+    user_data_dir = profile_dir(config, desired_bike) if not isinstance(driver_pool, TabBrowser) else None
+    if config.get('engine') == 'http':
+        return HttpBookingEngine(config, logger, coordinator)
+    elif config.get('engine') == 'hybrid':
+        return HybridBookingEngine(config, logger, coordinator, driver_pool, shared_login, user_data_dir = user_data_dir)
+    return BookingBot(config, logger, driver_pool, shared_login, coordinator, user_data_dir)
 
 
 def main():
     '''
     Main function to initiate the booking process for each desired bike.
-    Uses multi-threading to run the booking process for each bike in parallel.
+    Uses multi-threading to run the booking process for each bike in parallel, with the engine set in the configuration.
+    If enabled in the configuration, all bikes share a pool of warm drivers and a single login session,
+    or each bike keeps its own persistent Chrome profile, pruned to its size budget before the run.
+    With 'browser_mode' set to 'tabs', all bikes share one Chrome browser, one tab each.
+    A shared coordinator stops the remaining bikes once the booking policy is met.
+    With 'sell_out.enabled' set, the sell-out predicted from the run history decides the workers and bike order;
+    see `SellOutPredictor.plan`.
+    If tracing is enabled, the spans of every worker are written to 'tracing.path' at the end of the run.
 
     Returns:
         None
     '''
 
-    desired_bikes = config['desired_bikes']
-
-    with ThreadPoolExecutor() as executor:
-        executor.map(book_bike, desired_bikes)
+    workers = SellOutPredictor(config).plan(config['desired_bikes'])
+    tracing = config.get('tracing', {})
+    if tracing.get('enabled'):
+        TRACER.enable()
+
+    uses_browser = config.get('engine') != 'http'
+    tabs = uses_browser and config.get('browser_mode') == 'tabs'
+    persistent_profiles = uses_browser and config.get('persistent_profile', {}).get('enabled')
+
+    # Resolve chromedriver once, before any worker needs it
+    if uses_browser:
+        shared_resolver(config).resolve()
+
+    if persistent_profiles:
+        prune_profiles(config)
+
+    # Pooled drivers are reset between uses, so persistent profiles replace the pool
+    driver_pool = None
+    if tabs:
+        # The session runs one command at a time: waits poll instead of blocking it on an async script,
+        # and the performance log is shared by every tab, so responses are not captured
+        config['waits'] = dict(config.get('waits', {}), mode = 'poll')
+        config['api_capture'] = dict(config.get('api_capture', {}), enabled = False)
+        driver_pool = TabBrowser(config, user_data_dir = profile_dir(config, 'tabs'))
+        driver_pool.start()
+    elif uses_browser and not persistent_profiles and config.get('driver_pool', {}).get('enabled'):
+        # Every worker holds its driver for the whole run, so the pool must cover them all
+        config['driver_pool'] = dict(config['driver_pool'], size = max(config['driver_pool'].get('size', 1), len(workers)))
+        driver_pool = DriverPool(config)
+        driver_pool.start()
+
+    shared_login = SharedLogin(config) if uses_browser and config.get('shared_login') else None
+    coordinator = BookingCoordinator(config)
+
+    try:
+        with ThreadPoolExecutor(thread_name_prefix = 'bike') as executor:
+            for worker, bikes in workers:
+                executor.submit(book_bike, worker, driver_pool, shared_login, coordinator, bikes)
+    finally:
+        if driver_pool:
+            driver_pool.close()
+        if tracing.get('enabled'):
+            TRACER.export(tracing.get('path', 'logs/trace.json'))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,158 @@
+import time
+import threading
+from tracing import TRACER
+
+# Guards attaching a log to a command executor shared by several threads
+_attach_lock = threading.Lock()
+
+
+class CommandBudgetExceeded(AssertionError):
+    '''
+    Raised by `CommandLog.check_budgets` when a step sends more WebDriver commands than its budget.
+    '''
+
+
+class CommandLog:
+
+    def __init__(self, executor):
+        '''
+        Initialise a log of every WebDriver round trip sent through a command executor.
+        Use `CommandLog.attach(driver)` rather than creating one directly.
+
+        Each record holds the command name (e.g. 'findElement', 'getElementText'), its duration, and the step
+        the calling thread was in (the innermost `traced` step, or None outside of any step).
+        Records are kept per thread, so workers sharing a browser (tabs mode) each see only their own commands.
+
+        Parameters:
+            executor (selenium.webdriver.remote.remote_connection.RemoteConnection): The driver's command executor.
+        '''
+
+        self.executor = executor
+        self._records = {}    # thread ID -> list of (step, command, seconds)
+        self._lock = threading.Lock()
+
+        execute = executor.execute
+
+        def logged_execute(command, params):
+            started = time.perf_counter()
+            try:
+                return execute(command, params)
+            finally:
+                self.record(TRACER.current_step(), command, time.perf_counter() - started)
+
+        executor.execute = logged_execute
+
+
+    @classmethod
+    def attach(cls, driver):
+        '''
+        Start logging the commands of a driver, or find the log already attached to its command executor
+        (e.g. a pooled driver, or another tab of the same browser).
+
+        Parameters:
+            driver (selenium.webdriver.Chrome): The driver.
+
+        Returns:
+            CommandLog: The driver's command log.
+        '''
+
+        executor = driver.command_executor
+        with _attach_lock:
+            log = getattr(executor, 'command_log', None)
+            if log is None:
+                log = executor.command_log = cls(executor)
+        return log
+
+
+    def record(self, step, command, seconds):
+        '''
+        Record a command for the calling thread.
+
+        Parameters:
+            step (str): The step the command was sent from.
+            command (str): The WebDriver command.
+            seconds (float): How long the round trip took.
+
+        Returns:
+            None
+        '''
+
+        with self._lock:
+            self._records.setdefault(threading.get_ident(), []).append((step, command, seconds))
+
+
+    def take(self):
+        '''
+        Remove and return the calling thread's records.
+
+        Returns:
+            list: (step, command, seconds) of every command since the last call.
+        '''
+
+        with self._lock:
+            return self._records.pop(threading.get_ident(), [])
+
+
+    @staticmethod
+    def per_step(records):
+        '''
+        Total the command count and round-trip time of each step, in order of the steps' first command.
+
+        Parameters:
+            records (list): (step, command, seconds) records.
+
+        Returns:
+            dict: step -> {'commands': count, 'seconds': total, 'by_command': {command: count}}.
+        '''
+
+        steps = {}
+        for step, command, seconds in records:
+            totals = steps.setdefault(step or 'other', {'commands': 0, 'seconds': 0, 'by_command': {}})
+            totals['commands'] += 1
+            totals['seconds'] += seconds
+            totals['by_command'][command] = totals['by_command'].get(command, 0) + 1
+        return steps
+
+
+    @staticmethod
+    def summary(steps):
+        '''
+        Format per-step totals for the log, e.g. "select_session: 37 commands, 1.80s".
+
+        Parameters:
+            steps (dict): Totals from `per_step`.
+
+        Returns:
+            str: The summary.
+        '''
+
+        if not steps:
+            return "no commands"
+        return '; '.join(f"{step}: {totals['commands']} commands, {totals['seconds']:.2f}s" for step, totals in steps.items())
+
+
+    @staticmethod
+    def check_budgets(steps, budgets):
+        '''
+        Assert that no step sent more commands than its budget, so round-trip regressions fail a benchmark.
+
+        Parameters:
+            steps (dict): Totals from `per_step`.
+            budgets (dict): step -> maximum number of commands. Steps without a budget are not checked.
+
+        Returns:
+            None
+
+        Raises:
+            CommandBudgetExceeded: If any step is over its budget, listing each such step and its most frequent commands.
+        '''
+
+        over = []
+        for step, budget in budgets.items():
+            totals = steps.get(step)
+            if totals and totals['commands'] > budget:
+                frequent = sorted(totals['by_command'].items(), key = lambda item: -item[1])[:3]
+                over.append(f"{step}: {totals['commands']} commands > {budget} ({', '.join(f'{command} x{count}' for command, count in frequent)})")
+
+        if over:
+            raise CommandBudgetExceeded(f"WebDriver command budget exceeded: {'; '.join(over)}.")
@@ -0,0 +1,172 @@
+import time
+import logging
+import threading
+
+
+class BookingCancelled(Exception):
+    '''
+    Raised inside a BookingBot once the coordinator has cancelled the remaining workers.
+    '''
+
+
+class BookingCoordinator:
+
+    def __init__(self, config, logger = None):
+        '''
+        Initialise the coordinator shared by all bike workers.
+
+        Workers reserve a booking slot before selecting the series (which spends a class credit),
+        and confirm or release it afterwards. Once the policy's quota of bookings is confirmed,
+        every other worker is cancelled at its next check.
+
+        Policies ('booking_policy.mode'):
+            - 'first_success': the first confirmed booking wins.
+            - 'up_to_k': book up to 'booking_policy.max_bookings' bikes.
+
+        Parameters:
+            config (dict): Configuration settings loaded from a JSON file.
+            logger (logging.Logger, optional): Logger object for logging events. Defaults to the root logger.
+        '''
+
+        settings = config.get('booking_policy', {})
+
+        self.logger = logger or logging.getLogger()
+        self.mode = settings.get('mode', 'first_success')
+        self.max_bookings = settings.get('max_bookings', 1) if self.mode == 'up_to_k' else 1
+        self.booked_bikes = []
+        self.confirmed_at = []    # time.monotonic() of each confirmation
+        self._claimed_bikes = set()    # bikes reserved on the site by any worker
+
+        self._pending = 0
+        self._slot_changed = threading.Condition()
+        self._done = threading.Event()
+
+
+    def is_cancelled(self):
+        '''
+        Check whether the booking quota has been reached.
+
+        Returns:
+            bool: True if the remaining workers should stop, False otherwise.
+        '''
+
+        return self._done.is_set()
+
+
+    def check(self):
+        '''
+        Abort the calling worker if the booking quota has been reached.
+
+        Returns:
+            None
+
+        Raises:
+            BookingCancelled: If the remaining workers should stop.
+        '''
+
+        if self._done.is_set():
+            raise BookingCancelled(f"Booking quota reached: {', '.join(self.booked_bikes)}.")
+
+
+    def sleep(self, seconds):
+        '''
+        Sleep, waking up early to abort if the booking quota is reached in the meantime.
+
+        Parameters:
+            seconds (float): Number of seconds to sleep.
+
+        Returns:
+            None
+
+        Raises:
+            BookingCancelled: If the remaining workers should stop.
+        '''
+
+        self._done.wait(seconds)
+        self.check()
+
+
+    def claim(self, bike):
+        '''
+        Record a bike one of the workers has reserved on the site, so no worker counts it as taken by another rider.
+
+        Parameters:
+            bike (str): The reserved bike.
+
+        Returns:
+            None
+        '''
+
+        with self._slot_changed:
+            self._claimed_bikes.add(bike)
+
+
+    def claimed(self):
+        '''
+        The bikes the workers have reserved or booked on the site.
+
+        Returns:
+            frozenset: The bikes.
+        '''
+
+        with self._slot_changed:
+            return frozenset(self._claimed_bikes)
+
+
+    def reserve(self, timeout):
+        '''
+        Reserve a booking slot before selecting the series.
+        If in-flight bookings hold every slot, waits for one of them to be confirmed or released.
+
+        Parameters:
+            timeout (float): Maximum number of seconds to wait for a slot.
+
+        Returns:
+            bool: True if a slot was reserved, False if none became free within the timeout.
+
+        Raises:
+            BookingCancelled: If the quota is reached while waiting.
+        '''
+
+        with self._slot_changed:
+            self._slot_changed.wait_for(lambda: self._done.is_set() or len(self.booked_bikes) + self._pending < self.max_bookings, timeout)
+            self.check()
+            if len(self.booked_bikes) + self._pending >= self.max_bookings:
+                return False
+            self._pending += 1
+            return True
+
+
+    def confirm(self, bike):
+        '''
+        Confirm a reserved slot as booked, cancelling the remaining workers once the quota is reached.
+
+        Parameters:
+            bike (str): The bike that was booked.
+
+        Returns:
+            None
+        '''
+
+        with self._slot_changed:
+            self._pending -= 1
+            self.booked_bikes.append(bike)
+            self._claimed_bikes.add(bike)
+            self.confirmed_at.append(time.monotonic())
+            if len(self.booked_bikes) >= self.max_bookings:
+                self._done.set()
+                self.logger.info(f"Booking quota of {self.max_bookings} reached with {', '.join(self.booked_bikes)}. Cancelling the remaining workers.")
+            self._slot_changed.notify_all()
+
+
+    def release(self):
+        '''
+        Release a reserved slot after a failed series selection.
+
+        Returns:
+            None
+        '''
+
+        with self._slot_changed:
+            self._pending -= 1
+            self._slot_changed.notify_all()
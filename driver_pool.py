@@ -0,0 +1,399 @@
+import time
+import queue
+import logging
+import threading
+import subprocess
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.common.exceptions import WebDriverException
+from driver_resolver import shared_resolver
+
+# File extensions of the resource types the lean profile can block by URL
+RESOURCE_TYPE_EXTENSIONS = {
+    'image': ['png', 'jpg', 'jpeg', 'gif', 'webp', 'svg', 'ico'],
+    'font': ['woff', 'woff2', 'ttf', 'otf', 'eot'],
+    'media': ['mp4', 'webm', 'mp3', 'ogg'],
+    'stylesheet': ['css'],
+}
+
+
+def launch_chrome(config, user_data_dir = None):
+    '''
+    Launch a new Selenium WebDriver with Chrome as the browser.
+    With 'browser_profile' set to 'lean', images, extensions and background networking are disabled,
+    pages load eagerly (at DOMContentLoaded), and the URLs in 'lean_profile' are blocked.
+
+    Parameters:
+        config (dict): Configuration settings loaded from a JSON file.
+        user_data_dir (str, optional): Persistent profile directory, whose HTTP cache and cookies are kept between runs.
+            Defaults to a new temporary profile.
+
+    Returns:
+        selenium.webdriver.Chrome: The new driver.
+    '''
+
+    lean = config.get('browser_profile') == 'lean'
+    capture = config.get('api_capture', {}).get('enabled')
+    prefs = {}
+
+    OPTIONS = Options()
+    OPTIONS.add_argument('--headless=new')  # headless: browser session not visible
+
+    if user_data_dir:
+        OPTIONS.add_argument(f'--user-data-dir={user_data_dir}')
+        # Restoring the last session keeps session cookies (such as the login) across restarts
+        prefs['session.restore_on_startup'] = 1
+
+    # Network capture reads responses from the performance log
+    if capture or config.get('performance_log'):
+        OPTIONS.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+
+    # Keeping iframes in-process puts their traffic in the same log and under the same URL blocking
+    if capture or lean:
+        OPTIONS.add_argument('--disable-features=IsolateOrigins,site-per-process')
+
+    if lean:
+        OPTIONS.add_argument('--blink-settings=imagesEnabled=false')
+        OPTIONS.add_argument('--disable-extensions')
+        OPTIONS.add_argument('--disable-background-networking')
+        prefs['profile.managed_default_content_settings.images'] = 2
+        OPTIONS.page_load_strategy = 'eager'
+
+    if prefs:
+        OPTIONS.add_experimental_option('prefs', prefs)
+
+    driver = webdriver.Chrome(service = shared_resolver(config).service(), options = OPTIONS)
+
+    if lean:
+        block_urls(driver, config)
+
+    return driver
+
+
+def block_urls(driver, config):
+    '''
+    Block the lean profile's URLs in the driver's current tab.
+    The CDP Network domain applies to one target, so every tab opened later needs its own call.
+
+    Parameters:
+        driver (selenium.webdriver.Chrome): The driver, switched to the tab.
+        config (dict): Configuration settings loaded from a JSON file.
+
+    Returns:
+        None
+    '''
+
+    driver.execute_cdp_cmd('Network.enable', {})
+    driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': blocked_urls(config)})
+
+
+def blocked_urls(config):
+    '''
+    List the URL patterns the lean profile blocks: 'lean_profile.blocked_url_patterns',
+    plus the file extensions of every type in 'lean_profile.blocked_resource_types'.
+
+    Parameters:
+        config (dict): Configuration settings loaded from a JSON file.
+
+    Returns:
+        list: URL patterns for the CDP command `Network.setBlockedURLs` ('*' is a wildcard).
+    '''
+
+    settings = config.get('lean_profile', {})
+    urls = list(settings.get('blocked_url_patterns', []))
+    for resource_type in settings.get('blocked_resource_types', []):
+        urls.extend(f"*.{extension}*" for extension in RESOURCE_TYPE_EXTENSIONS[resource_type])
+    return urls
+
+
+def driver_memory_mb(driver):
+    '''
+    Measure the resident memory of a driver's process tree (chromedriver and every Chrome process under it).
+
+    Parameters:
+        driver (selenium.webdriver.Chrome): The driver to measure.
+
+    Returns:
+        float: Resident memory in MB, or None if it cannot be measured.
+    '''
+
+    try:
+        root_pid = driver.service.process.pid
+    except AttributeError:
+        return None
+    return process_tree_memory_mb(root_pid)
+
+
+def process_tree_memory_mb(root_pid):
+    '''
+    Measure the resident memory of a process and every process under it.
+    Uses `ps`, which is available on both macOS and Linux.
+
+    Parameters:
+        root_pid (int): ID of the root process.
+
+    Returns:
+        float: Resident memory in MB, or None if it cannot be measured.
+    '''
+
+    try:
+        output = subprocess.run(['ps', '-A', '-o', 'pid=,ppid=,rss='], capture_output = True, text = True, check = True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+    children = {}
+    rss = {}
+    for line in output.splitlines():
+        pid, ppid, kb = (int(field) for field in line.split())
+        children.setdefault(ppid, []).append(pid)
+        rss[pid] = kb
+
+    total_kb = 0
+    pending = [root_pid]
+    while pending:
+        pid = pending.pop()
+        total_kb += rss.get(pid, 0)
+        pending.extend(children.get(pid, []))
+
+    return total_kb / 1024
+
+
+class DriverPool:
+
+    def __init__(self, config, logger = None):
+        '''
+        Initialise a thread-safe pool of warm Chrome drivers.
+
+        Drivers are reset (cookies, storage, frames, tabs) between uses instead of being quit,
+        and are recycled after 'max_uses' checkouts or once their process tree exceeds 'max_memory_mb'.
+
+        Parameters:
+            config (dict): Configuration settings loaded from a JSON file. Pool settings are read from 'driver_pool'.
+            logger (logging.Logger, optional): Logger object for logging events. Defaults to the root logger.
+        '''
+
+        settings = config.get('driver_pool', {})
+
+        self.config = config
+        self.logger = logger or logging.getLogger()
+        self.size = settings.get('size') or len(config['desired_bikes'])
+        self.max_uses = settings.get('max_uses', 20)
+        self.max_memory_mb = settings.get('max_memory_mb', 1024)
+        self.acquire_timeout = settings.get('acquire_timeout', 60)
+
+        self._idle = queue.LifoQueue()   # the most recently used driver is the warmest
+        self._uses = {}
+        self._lock = threading.Lock()
+        self._live = 0
+        self._closed = False
+        self._launch_error = None    # the last launch failure, cleared by the next successful launch
+
+
+    def start(self):
+        '''
+        Pre-launch drivers in parallel until the pool is full.
+
+        Returns:
+            None
+        '''
+
+        threads = [threading.Thread(target = self._replenish) for _ in range(self.size)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.logger.info(f"Driver pool started with {self._idle.qsize()} warm Chrome drivers.")
+
+
+    def _replenish(self):
+        '''
+        Launch one driver into the pool, if the pool is below its size.
+        A failed launch is logged and recorded for acquire() to raise once no other driver is live or launching.
+
+        Returns:
+            None
+        '''
+
+        with self._lock:
+            if self._closed or self._live >= self.size:
+                return
+            self._live += 1
+
+        driver = None
+        try:
+            driver = launch_chrome(self.config)
+            self._uses[id(driver)] = 0
+            self._launch_error = None
+            self._idle.put(driver)
+        except Exception as e:
+            self.logger.error(f"Error launching a pooled Chrome driver: {e}")
+            self._launch_error = e
+        finally:
+            if driver is None:
+                with self._lock:
+                    self._live -= 1
+
+
+    def _discard(self, driver, reason):
+        '''
+        Quit a driver, remove it from the pool and launch a replacement in the background.
+
+        Parameters:
+            driver (selenium.webdriver.Chrome): The driver to discard.
+            reason (str): Why the driver is being discarded, for the log.
+
+        Returns:
+            None
+        '''
+
+        self.logger.info(f"Recycling pooled Chrome driver: {reason}.")
+        self._uses.pop(id(driver), None)
+        try:
+            driver.quit()
+        except WebDriverException:
+            pass
+
+        with self._lock:
+            self._live -= 1
+        threading.Thread(target = self._replenish, daemon = True).start()
+
+
+    def _is_healthy(self, driver):
+        '''
+        Check that a driver still responds to commands.
+
+        Parameters:
+            driver (selenium.webdriver.Chrome): The driver to check.
+
+        Returns:
+            bool: True if the driver responds, False otherwise.
+        '''
+
+        try:
+            return driver.execute_script("return 1;") == 1
+        except WebDriverException:
+            return False
+
+
+    def _reset(self, driver):
+        '''
+        Return a driver to a clean state: a single blank tab, top-level frame, no cookies or web storage.
+
+        Parameters:
+            driver (selenium.webdriver.Chrome): The driver to reset.
+
+        Returns:
+            None
+        '''
+
+        handles = driver.window_handles
+        for handle in handles[1:]:
+            driver.switch_to.window(handle)
+            driver.close()
+        driver.switch_to.window(handles[0])
+        driver.switch_to.default_content()
+
+        driver.execute_cdp_cmd('Network.clearBrowserCookies', {})
+        try:
+            driver.execute_script("window.localStorage.clear(); window.sessionStorage.clear();")
+        except WebDriverException:
+            pass    # about:blank and some origins have no web storage
+        driver.get('about:blank')
+
+
+    def acquire(self, timeout = None):
+        '''
+        Check out a warm, health-checked driver.
+        Launches a new driver if the pool is below its size and none is idle.
+
+        Parameters:
+            timeout (float, optional): Seconds to wait for a driver to become idle. Defaults to 'acquire_timeout'.
+
+        Returns:
+            selenium.webdriver.Chrome: The checked-out driver.
+
+        Raises:
+            WebDriverException: If Chrome could not be launched and no driver is live or launching,
+                                or if no driver became available within the timeout.
+        '''
+
+        timeout = self.acquire_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+
+        while True:
+            if self._idle.empty():
+                self._replenish()
+
+            # Wait in short slices so a launch failing in another thread is noticed
+            try:
+                driver = self._idle.get(timeout = max(0, min(0.5, deadline - time.monotonic())))
+            except queue.Empty:
+                with self._lock:
+                    exhausted = self._live == 0 and self._idle.empty()
+                if exhausted and self._launch_error is not None:
+                    raise WebDriverException(f"No pooled Chrome driver could be launched: {self._launch_error}") from self._launch_error
+                if time.monotonic() >= deadline:
+                    raise WebDriverException(f"No pooled Chrome driver became available within {timeout:.0f} seconds.")
+                continue
+
+            if self._is_healthy(driver):
+                return driver
+
+            self._discard(driver, "failed health check")
+
+
+    def release(self, driver):
+        '''
+        Return a driver to the pool.
+        The driver is reset for its next use, or recycled if it has reached its use or memory limit.
+
+        Parameters:
+            driver (selenium.webdriver.Chrome): The driver to return.
+
+        Returns:
+            None
+        '''
+
+        uses = self._uses.get(id(driver), 0) + 1
+        self._uses[id(driver)] = uses
+
+        if self._closed:
+            self._discard(driver, "pool closed")
+            return
+
+        if uses >= self.max_uses:
+            self._discard(driver, f"reached {uses} uses")
+            return
+
+        memory_mb = driver_memory_mb(driver)
+        if memory_mb is not None and memory_mb > self.max_memory_mb:
+            self._discard(driver, f"using {memory_mb:.0f} MB")
+            return
+
+        try:
+            self._reset(driver)
+        except WebDriverException as e:
+            self._discard(driver, f"reset failed ({e.msg})")
+            return
+
+        self._idle.put(driver)
+
+
+    def close(self):
+        '''
+        Quit every idle driver and stop launching replacements.
+
+        Returns:
+            None
+        '''
+
+        with self._lock:
+            self._closed = True
+
+        while not self._idle.empty():
+            driver = self._idle.get_nowait()
+            try:
+                driver.quit()
+            except WebDriverException:
+                pass
+        self.logger.info("Driver pool closed.")
@@ -0,0 +1,216 @@
+import os
+import re
+import json
+import time
+import logging
+import threading
+import subprocess
+from datetime import date
+from selenium.webdriver.chrome.service import Service as ChromeService
+from webdriver_manager.chrome import ChromeDriverManager
+
+# Chrome binaries to query for the installed version, in order of preference
+CHROME_BINARIES = ['google-chrome', 'google-chrome-stable', 'chromium', 'chromium-browser',
+                   '/Applications/Google Chrome.app/Contents/MacOS/Google Chrome']
+
+_shared_resolver = None
+_shared_resolver_lock = threading.Lock()
+
+
+def read_version(binary):
+    '''
+    Read the version of a Chrome or chromedriver binary.
+
+    Parameters:
+        binary (str): Path or name of the binary.
+
+    Returns:
+        str: The version (e.g. '116.0.5845.96'), or None if the binary is missing or does not report a version.
+    '''
+
+    try:
+        output = subprocess.run([binary, '--version'], capture_output = True, text = True, timeout = 10).stdout
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+
+    match = re.search(r'\d+\.\d+\.\d+\.\d+', output)
+    return match.group(0) if match else None
+
+
+def chrome_version():
+    '''
+    Find the version of the installed Chrome browser.
+
+    Returns:
+        str: The version, or None if Chrome cannot be found.
+    '''
+
+    for binary in CHROME_BINARIES:
+        version = read_version(binary)
+        if version:
+            return version
+    return None
+
+
+def shared_resolver(config):
+    '''
+    Get the process-wide DriverResolver, creating it on first use.
+
+    Parameters:
+        config (dict): Configuration settings loaded from a JSON file.
+
+    Returns:
+        DriverResolver: The shared resolver.
+    '''
+
+    global _shared_resolver
+
+    with _shared_resolver_lock:
+        if _shared_resolver is None:
+            _shared_resolver = DriverResolver(config)
+        return _shared_resolver
+
+
+class DriverResolver:
+
+    def __init__(self, config, logger = None):
+        '''
+        Initialise the DriverResolver with the given configuration.
+
+        The chromedriver binary is resolved once per process, from (in order):
+            - the pinned 'chromedriver_path' in the configuration, which needs no network access;
+            - the on-disk cache, valid for the day it was written and the Chrome version it was resolved for;
+            - webdriver-manager, whose result is then written to the on-disk cache.
+
+        Parameters:
+            config (dict): Configuration settings loaded from a JSON file.
+            logger (logging.Logger, optional): Logger object for logging events. Defaults to the root logger.
+        '''
+
+        self.logger = logger or logging.getLogger()
+        self.pinned_path = config.get('chromedriver_path')
+        self.cache_path = config.get('chromedriver_cache', '.chromedriver_cache.json')
+        self.timings = {}    # source -> list of resolution times in ms
+
+        self._path = None
+        self._lock = threading.Lock()
+
+
+    def _is_valid(self, path):
+        '''
+        Check that a path points to a working chromedriver binary.
+
+        Parameters:
+            path (str): Path to the binary.
+
+        Returns:
+            bool: True if the binary exists, is executable and reports a version, False otherwise.
+        '''
+
+        return bool(path) and os.access(path, os.X_OK) and read_version(path) is not None
+
+
+    def _read_cache(self, version):
+        '''
+        Read the chromedriver path from the on-disk cache.
+
+        Parameters:
+            version (str): The installed Chrome version the cache entry must match.
+
+        Returns:
+            str: The cached path, or None if there is no valid entry for today and this Chrome version.
+        '''
+
+        try:
+            with open(self.cache_path, 'r') as file:
+                entry = json.load(file)
+        except (OSError, ValueError):
+            return None
+
+        if entry.get('chrome_version') != version or entry.get('date') != date.today().isoformat():
+            return None
+        return entry.get('path')
+
+
+    def _write_cache(self, version, path):
+        '''
+        Write the chromedriver path to the on-disk cache.
+
+        Parameters:
+            version (str): The installed Chrome version.
+            path (str): Path to the chromedriver binary.
+
+        Returns:
+            None
+        '''
+
+        entry = {'chrome_version': version, 'date': date.today().isoformat(), 'path': path}
+        try:
+            with open(self.cache_path, 'w') as file:
+                json.dump(entry, file)
+        except OSError as e:
+            self.logger.info(f"Unable to write the chromedriver cache: {e}")
+
+
+    def _record(self, source, started):
+        '''
+        Record and log how long a resolution took.
+
+        Parameters:
+            source (str): Where the path was resolved from.
+            started (float): `time.perf_counter()` at the start of the resolution.
+
+        Returns:
+            None
+        '''
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.timings.setdefault(source, []).append(elapsed_ms)
+        self.logger.info(f"Resolved chromedriver from {source} in {elapsed_ms:.1f} ms: {self._path}")
+
+
+    def resolve(self):
+        '''
+        Resolve the chromedriver path. Thread-safe; only the first call does any work.
+
+        Returns:
+            str: Path to the chromedriver binary.
+        '''
+
+        started = time.perf_counter()
+
+        with self._lock:
+            if self._path:
+                self._record('process cache', started)
+                return self._path
+
+            if self.pinned_path:
+                if self._is_valid(self.pinned_path):
+                    self._path = self.pinned_path
+                    self._record('pinned path', started)
+                    return self._path
+                self.logger.error(f"Pinned chromedriver_path is not a working chromedriver: {self.pinned_path}")
+
+            version = chrome_version() or 'unknown'
+            cached_path = self._read_cache(version)
+            if self._is_valid(cached_path):
+                self._path = cached_path
+                self._record('disk cache', started)
+                return self._path
+
+            self._path = ChromeDriverManager().install()
+            self._write_cache(version, self._path)
+            self._record('webdriver-manager', started)
+            return self._path
+
+
+    def service(self):
+        '''
+        Build a ChromeService for the resolved chromedriver.
+        Every driver needs its own service (it owns the chromedriver process), but all share the resolved path.
+
+        Returns:
+            ChromeService: A new service for one driver.
+        '''
+
+        return ChromeService(executable_path = self.resolve())
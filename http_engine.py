@@ -0,0 +1,470 @@
+import os
+import json
+import time
+import queue
+import logging
+import threading
+import http.client
+from http.cookies import SimpleCookie
+from urllib.parse import urlsplit, urlencode
+from scheduler import BookingScheduler
+from coordinator import BookingCancelled
+from tracing import TRACER
+from run_history import RunRecorder
+
+
+class HttpClient:
+
+    def __init__(self, base_url, timeout = 10):
+        '''
+        Initialise a thread-safe HTTP client that keeps its connections alive and reuses them across requests.
+        Cookies set by the server are stored and sent back with every request.
+
+        Parameters:
+            base_url (str): Scheme, host and port of the server (e.g. 'https://www.cru68.com').
+            timeout (float, optional): Socket timeout in seconds. Defaults to 10.
+        '''
+
+        parsed = urlsplit(base_url)
+        self.scheme = parsed.scheme
+        self.host = parsed.hostname
+        self.port = parsed.port
+        self.timeout = timeout
+        self.cookies = {}    # name -> value
+        self.headers = {}    # extra headers sent with every request
+
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+
+
+    def _connect(self):
+        '''
+        Open a new connection to the server.
+
+        Returns:
+            http.client.HTTPConnection: The connection.
+        '''
+
+        connection_class = http.client.HTTPSConnection if self.scheme == 'https' else http.client.HTTPConnection
+        connection = connection_class(self.host, self.port, timeout = self.timeout)
+        connection.connect()
+        return connection
+
+
+    def warm(self, count = 1):
+        '''
+        Open connections ahead of time, so the first requests skip the TCP and TLS handshakes.
+
+        Parameters:
+            count (int, optional): Number of connections to open. Defaults to 1.
+
+        Returns:
+            None
+        '''
+
+        for _ in range(count):
+            self._idle.put(self._connect())
+
+
+    def request(self, method, path, payload = None, query = None):
+        '''
+        Send a JSON request over a pooled keep-alive connection.
+        A request that fails on a reused connection (closed by the server while idle) is retried once on a new one.
+
+        Parameters:
+            method (str): HTTP method.
+            path (str): Request path.
+            payload (dict, optional): JSON body. Defaults to no body.
+            query (dict, optional): Query string parameters. Defaults to none.
+
+        Returns:
+            tuple: (status, data), where data is the decoded JSON response body (an empty dict if there is none).
+        '''
+
+        if query:
+            path = f"{path}?{urlencode(query)}"
+
+        body = json.dumps(payload).encode() if payload is not None else None
+        headers = {'Accept': 'application/json'}
+        headers.update(self.headers)
+        if body is not None:
+            headers['Content-Type'] = 'application/json'
+
+        with self._lock:
+            if self.cookies:
+                headers['Cookie'] = '; '.join(f"{name}={value}" for name, value in self.cookies.items())
+
+        for retry in range(2):
+            try:
+                connection = self._idle.get_nowait()
+                reused = True
+            except queue.Empty:
+                connection = self._connect()
+                reused = False
+
+            try:
+                connection.request(method, path, body, headers)
+                response = connection.getresponse()
+                data = response.read()
+                break
+            except (http.client.HTTPException, OSError):
+                connection.close()
+                if retry or not reused:
+                    raise
+
+        with self._lock:
+            for header in response.headers.get_all('Set-Cookie') or []:
+                for name, morsel in SimpleCookie(header).items():
+                    self.cookies[name] = morsel.value
+
+        if response.will_close:
+            connection.close()
+        else:
+            self._idle.put(connection)
+
+        try:
+            return response.status, json.loads(data) if data else {}
+        except ValueError:
+            return response.status, {}
+
+
+    def close(self):
+        '''
+        Close every idle connection.
+
+        Returns:
+            None
+        '''
+
+        while not self._idle.empty():
+            self._idle.get_nowait().close()
+
+
+class HttpBookingEngine:
+
+    def __init__(self, config, logger = None, coordinator = None, client = None):
+        '''
+        Initialise a booking engine that books over raw HTTP requests instead of driving a browser.
+        It has the same `run(desired_bike)` interface as the BookingBot.
+        Endpoint paths are read from 'http_api' in the configuration.
+
+        Parameters:
+            config (dict): Configuration settings loaded from a JSON file.
+            logger (logging.Logger, optional): Logger object for logging events. Defaults to the root logger.
+            coordinator (BookingCoordinator, optional): Coordinator shared with the other bike workers. Defaults to booking independently.
+            client (HttpClient, optional): HTTP client to use. Defaults to a new client for 'http_api.base_url'.
+        '''
+
+        self.config = config
+        self.api = config['http_api']
+        self.logger = logger or logging.getLogger()
+        self.coordinator = coordinator
+        self.client = client or HttpClient(self.api['base_url'], self.api.get('timeout', 10))
+        self.lag = config['default_lag']
+        self.scheduler = BookingScheduler(config, self.logger, coordinator.check if coordinator else None)
+        self.history = RunRecorder(config, 'http', self.scheduler, coordinator)
+        self.logged_in = False
+        self.booked_bike = None
+        self.step_times = {}    # step -> seconds spent in it
+
+
+    def call(self, step, method, path, payload = None, query = None):
+        '''
+        Send a request for a booking step and record how long it took.
+
+        Parameters:
+            step (str): Name of the step, for the timings.
+            method (str): HTTP method.
+            path (str): Request path.
+            payload (dict, optional): JSON body. Defaults to no body.
+            query (dict, optional): Query string parameters. Defaults to none.
+
+        Returns:
+            tuple: (status, data) of the response, with status 0 if the request got no response.
+        '''
+
+        if self.coordinator:
+            self.coordinator.check()
+
+        started = time.perf_counter()
+        try:
+            return self.client.request(method, path, payload, query)
+        except (http.client.HTTPException, OSError) as e:
+            # A dropped or timed-out request fails the step, which is retried like any other failure
+            self.logger.info(f"No response to {method} {path}: {e!r}")
+            return 0, {'message': str(e)}
+        finally:
+            ended = time.perf_counter()
+            self.step_times[step] = self.step_times.get(step, 0) + ended - started
+            self.history.step(step, ended - started)
+            TRACER.complete(step, 'http', started, ended, method = method, path = path)
+
+
+    def login_to_website(self):
+        '''
+        Log in with the credentials set in environment variables. The session cookie is kept by the client.
+
+        Returns:
+            bool: True if the login is successful, False otherwise.
+
+        Environment Variables:
+            - CRU_BOOKING_EMAIL: The email to log in with.
+            - CRU_BOOKING_PASSWORD: The password to log in with.
+        '''
+
+        email = os.environ.get('CRU_BOOKING_EMAIL')
+        password = os.environ.get('CRU_BOOKING_PASSWORD')
+
+        if not email or not password:
+            self.logger.info("Error: Email or password not set in environment variables.")
+            return False
+
+        status, data = self.call('login', 'POST', self.api['login'], {'email': email, 'password': password})
+        self.logged_in = status == 200
+
+        if self.logged_in:
+            self.logger.info("Login successful!")
+        else:
+            self.logger.info(f"Login failed ({status}): {data.get('message', '')}")
+        return self.logged_in
+
+
+    def find_session(self):
+        '''
+        Look up the desired session in next week's schedule for the desired location.
+
+        Returns:
+            str: The session ID, or None if the session cannot be found.
+        '''
+
+        desired_session = self.config['desired_session']
+        status, data = self.call('session', 'GET', self.api['schedule'], query = {'location': self.config['desired_location'], 'week': 'next'})
+
+        if status == 401:
+            self.logged_in = False
+        if status != 200:
+            self.logger.info(f"Error when fetching the schedule ({status}).")
+            return None
+
+        for session in data.get('sessions', []):
+            if (session['day'] == desired_session['day'] and session['data_instructor'] == desired_session['data_instructor']
+                    and desired_session['activity'] in session['activity'] and desired_session['instructor'] in session['instructor']
+                    and desired_session['time'] in session['time']):
+                self.logger.info(f"Found session {session['id']}: {session['activity']} with {session['instructor']} at {session['time']}.")
+                return session['id']
+
+        self.logger.info("Unable to find the correct activity and/or instructor.")
+        return None
+
+
+    def reserve_seat(self, session_id, desired_bikes):
+        '''
+        Reserve the highest-priority available bike in the session.
+        Falls through to the next bike if a seat is taken between reading the seat map and reserving it.
+
+        Parameters:
+            session_id (str): The session ID.
+            desired_bikes (list): The bikes to be selected, in order of priority.
+
+        Returns:
+            str: The reservation ID, or None if none of the desired bikes could be reserved.
+        '''
+
+        status, data = self.call('bike', 'GET', self.api['seats'].format(session_id = session_id))
+        if status != 200:
+            self.logger.info(f"Error when fetching the seat map ({status}).")
+            return None
+
+        available = {seat['bike'] for seat in data.get('seats', []) if seat['available']}
+        self.history.seats({seat['bike']: seat['available'] for seat in data.get('seats', [])})
+
+        for desired_bike in desired_bikes:
+            if desired_bike not in available:
+                continue
+
+            status, data = self.call('bike', 'POST', self.api['reserve'].format(session_id = session_id), {'bike': desired_bike})
+            if status == 200:
+                self.booked_bike = desired_bike
+                if self.coordinator:
+                    self.coordinator.claim(desired_bike)
+                self.logger.info(f"Reserved bike {desired_bike}!")
+                return data['reservation_id']
+            self.logger.info(f"Unable to reserve bike {desired_bike} ({status}): {data.get('message', '')}")
+
+        self.logger.info(f"None of the desired bikes is available: {', '.join(desired_bikes)}.")
+        return None
+
+
+    def pay_series(self, reservation_id):
+        '''
+        Pay for the reservation with the desired series package.
+
+        Parameters:
+            reservation_id (str): The reservation ID.
+
+        Returns:
+            str: The outcome message, as returned by the BookingBot's `select_series`.
+        '''
+
+        status, data = self.call('series', 'POST', self.api['series'].format(reservation_id = reservation_id), {'series': self.config['desired_series']})
+        message = data.get('message', '')
+        return message if status == 200 else f"Error when selecting series: {message}"
+
+
+    def cancel_reservation(self, reservation_id):
+        '''
+        Cancel an unpaid reservation, so its seat is not left held after a failed series step.
+        Sent even once the coordinator has cancelled this worker; a failure to cancel is logged, never raised.
+
+        Parameters:
+            reservation_id (str): The reservation ID.
+
+        Returns:
+            None
+        '''
+
+        try:
+            status, data = self.client.request('POST', self.api['cancel'].format(reservation_id = reservation_id))
+        except (http.client.HTTPException, OSError) as e:
+            self.logger.info(f"No response when cancelling the reservation of bike {self.booked_bike}: {e!r}")
+            return
+
+        if status == 200:
+            self.logger.info(f"Cancelled the reservation of bike {self.booked_bike}.")
+        else:
+            self.logger.info(f"Unable to cancel the reservation of bike {self.booked_bike} ({status}): {data.get('message', '')}")
+
+
+    def prewarm(self):
+        '''
+        Open connections and log in at the 'login' pre-warm offset before T0.
+        If the connection cannot be opened, book() connects and logs in at T0 instead.
+
+        Returns:
+            bool: True if logged in ahead of T0, False otherwise.
+        '''
+
+        self.scheduler.wait_until(-self.config.get('prewarm_offsets', {}).get('login', 0), label = 'login')
+        try:
+            self.client.warm()
+        except (OSError, http.client.HTTPException) as e:
+            self.logger.info(f"Error opening a connection before T0: {e!r}. Connecting at T0 instead.")
+            return False
+
+        return self.login_to_website()
+
+
+    def book(self, desired_bikes):
+        '''
+        Run the booking steps (login, session, bike, series) for up to 'max_tries' attempts.
+        A session lost mid-way (401) is re-established on the next attempt.
+
+        Parameters:
+            desired_bikes (list): The bikes to be selected, in order of priority.
+
+        Returns:
+            bool: True if a bike was booked, False otherwise.
+        '''
+
+        max_tries = self.config['max_tries']
+
+        for attempt in range(1, max_tries + 1):
+            TRACER.tag(attempt = attempt)
+            self.logger.info(f"Attempt {attempt} of {max_tries} for bike {' > '.join(desired_bikes)}...")
+
+            failed_step = 'login'
+            if self.logged_in or self.login_to_website():
+                failed_step = 'session'
+                session_id = self.find_session()
+                if session_id:
+                    failed_step = 'bike'
+                    reservation_id = self.reserve_seat(session_id, desired_bikes)
+                    if reservation_id:
+                        failed_step = 'series'
+                        booked = False
+                        try:
+                            if self.coordinator and not self.coordinator.reserve(self.lag):
+                                self.logger.info("Booking slots are held by other workers. Not selecting the series yet.")
+                            else:
+                                try:
+                                    result = self.pay_series(reservation_id)
+                                    booked = "successfully enrolled" in result
+                                finally:
+                                    if self.coordinator:
+                                        if booked:
+                                            self.coordinator.confirm(self.booked_bike)
+                                        else:
+                                            self.coordinator.release()
+
+                                if booked:
+                                    self.logger.info(f"Class booking successful for bike {self.booked_bike}!")
+                                    self.history.end_attempt('booked', booked_bike = self.booked_bike)
+                                    return True
+                                self.logger.info(result)
+                        finally:
+                            # The next attempt reserves afresh, so an unpaid seat is given back on every way out
+                            if not booked:
+                                self.cancel_reservation(reservation_id)
+
+            self.history.end_attempt(self.history.classify(failed_step, desired_bikes))
+
+            # Wait for a short duration before the next attempt
+            if self.coordinator:
+                self.coordinator.sleep(self.lag)
+            else:
+                time.sleep(self.lag)
+
+        return False
+
+
+    def run(self, desired_bike):
+        '''
+        Main function to execute the booking process over HTTP.
+
+        Waits for the exact opening of the booking window, pre-warming before it, then books the highest-priority available bike.
+        Logs the time spent in each step and the outcome.
+
+        Parameters:
+            desired_bike (str or list): The bike to be selected, or the bikes to be selected in order of priority.
+
+        Returns:
+            None
+        '''
+
+        desired_bikes = [desired_bike] if isinstance(desired_bike, str) else list(desired_bike)
+        TRACER.tag(bike = desired_bikes[0], attempt = 0)    # attempt 0 is the pre-warm
+        self.history.bike = desired_bikes[0]
+
+        # Time check: wait for the exact opening instant, for at most 'time_check_limit' minutes
+        self.scheduler.arm()
+        time_check_limit = self.config['time_check_limit']
+
+        if self.scheduler.seconds_until() > time_check_limit * 60:
+            self.logger.info(f"Booking window opens more than {time_check_limit} minutes from now. Exiting.")
+            return None
+
+        self.logger.info("Waiting for the right time to book...")
+
+        try:
+            self.prewarm()
+            self.history.end_attempt('prewarmed' if self.logged_in else 'prewarm_failed')
+            self.scheduler.wait_until()
+
+            booking_successful = self.book(desired_bikes)
+
+        except BookingCancelled as e:
+            self.logger.info(f"Another worker completed the booking. Stopping: {e}")
+            self.history.end_attempt('cancelled')
+            return None
+
+        except Exception:
+            self.history.end_attempt('error')
+            raise
+
+        finally:
+            self.client.close()
+            self.history.save(self.logger)
+            self.logger.info(f"Time per step: {', '.join(f'{step} {seconds:.3f}s' for step, seconds in self.step_times.items())}.")
+
+        if not booking_successful:
+            self.logger.error(f"Maximum number of tries without success reached for bike {' > '.join(desired_bikes)}. Please try again later.")
@@ -0,0 +1,104 @@
+import time
+from selenium.common.exceptions import WebDriverException
+from booking_bot import BookingBot
+from http_engine import HttpBookingEngine
+from session_share import capture_session
+
+
+class HybridBookingEngine(HttpBookingEngine):
+
+    def __init__(self, config, logger = None, coordinator = None, driver_pool = None, shared_login = None, client = None, user_data_dir = None):
+        '''
+        Initialise a booking engine that logs in through the browser, then books over raw HTTP.
+
+        The browser handles the login form (and anything the site runs in it) once. Its cookies, and the auth token in
+        web storage if 'http_api.auth_storage_key' is set, are exported into the keep-alive HTTP client,
+        and the browser is released before T0. Session, bike and series selection then go over HTTP.
+
+        Parameters:
+            config (dict): Configuration settings loaded from a JSON file.
+            logger (logging.Logger, optional): Logger object for logging events. Defaults to the root logger.
+            coordinator (BookingCoordinator, optional): Coordinator shared with the other bike workers. Defaults to booking independently.
+            driver_pool (DriverPool, optional): Pool of warm drivers to log in with. Defaults to launching a new driver.
+            shared_login (SharedLogin, optional): Login session shared with the other bike workers. Defaults to signing in separately.
+            client (HttpClient, optional): HTTP client to use. Defaults to a new client for 'http_api.base_url'.
+            user_data_dir (str, optional): Persistent Chrome profile to log in with. Defaults to a temporary profile.
+        '''
+
+        super().__init__(config, logger, coordinator, client)
+        self.browser = BookingBot(config, self.logger, driver_pool, shared_login, coordinator, user_data_dir)
+        self.history.engine = 'hybrid'
+
+
+    def import_session(self, snapshot):
+        '''
+        Export a browser session into the HTTP client: cookies for the API host, and the auth token as a bearer header.
+
+        Parameters:
+            snapshot (list): The session captured by `capture_session`.
+
+        Returns:
+            None
+        '''
+
+        host = self.client.host
+        auth_storage_key = self.api.get('auth_storage_key')
+
+        for context in snapshot:
+            for cookie in context['cookies']:
+                domain = cookie.get('domain', host).lstrip('.')
+                if host == domain or host.endswith('.' + domain):
+                    self.client.cookies[cookie['name']] = cookie['value']
+
+            if auth_storage_key:
+                token = context['local'].get(auth_storage_key) or context['session'].get(auth_storage_key)
+                if token:
+                    self.client.headers['Authorization'] = f"Bearer {token}"
+
+        self.logger.info(f"Exported {len(self.client.cookies)} cookies{' and the auth token' if 'Authorization' in self.client.headers else ''} into the HTTP client.")
+
+
+    def login_to_website(self):
+        '''
+        Log in through the browser, export its session into the HTTP client, then release the browser.
+        A browser error fails the login, which is retried like any other failure.
+
+        Returns:
+            bool: True if the login is successful, False otherwise.
+        '''
+
+        started = time.perf_counter()
+        try:
+            if not self.browser.login_to_website():
+                return False
+            self.import_session(capture_session(self.browser.driver))
+        except WebDriverException as e:
+            self.logger.info(f"Error logging in through the browser: {e}")
+            return False
+        finally:
+            self.browser.stop_driver()
+            self.history.step('login', time.perf_counter() - started)
+
+        self.logged_in = True
+        return True
+
+
+    def prewarm(self):
+        '''
+        Start the browser at the 'start_driver' pre-warm offset, then open connections and log in at the 'login' offset.
+        The browser is released as soon as the login is exported, before T0.
+        If the browser cannot be started, book() starts it and logs in at T0 instead.
+
+        Returns:
+            bool: True if logged in ahead of T0, False otherwise.
+        '''
+
+        self.scheduler.wait_until(-self.config.get('prewarm_offsets', {}).get('start_driver', 0), label = 'start_driver')
+        try:
+            self.browser.start_driver()
+        except WebDriverException as e:
+            self.logger.info(f"Error starting the browser before T0: {e}. Logging in at T0 instead.")
+            self.browser.stop_driver()
+            return False
+
+        return super().prewarm()
@@ -0,0 +1,895 @@
+import html
+import math
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+from urllib.parse import urlsplit, parse_qs, urlencode, quote
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MockCruState:
+
+    def __init__(self, config, email, password, bikes = None):
+        '''
+        Initialise the in-memory state of the local stand-in for the booking site.
+        The schedule holds the desired session from the configuration plus a decoy by the same instructor on the same day.
+        Seat reservations are atomic, so concurrent bookers can never get the same bike.
+
+        Parameters:
+            config (dict): Configuration settings loaded from a JSON file.
+            email (str): The only accepted login email.
+            password (str): The only accepted login password.
+            bikes (list, optional): Bikes in every session. Defaults to B1 to B20.
+        '''
+
+        self.config = config
+        self.email = email
+        self.password = password
+        self.bikes = bikes or [f"B{number}" for number in range(1, 21)]
+        self.lock = threading.Lock()
+        self.reset()
+
+
+    def reset(self):
+        '''
+        Clear every login, reservation and booking.
+
+        Returns:
+            None
+        '''
+
+        desired_session = self.config['desired_session']
+        decoy_time = '7:00 AM' if desired_session['time'] != '7:00 AM' else '8:00 AM'
+
+        with self.lock:
+            self.tokens = set()
+            self.sessions = {}
+            for time_slot in (decoy_time, desired_session['time']):
+                session_id = uuid.uuid4().hex[:12]
+                self.sessions[session_id] = {
+                    'id': session_id,
+                    'day': desired_session['day'],
+                    'time': time_slot,
+                    'activity': desired_session['activity'],
+                    'instructor': desired_session['instructor'],
+                    'data_instructor': desired_session['data_instructor'],
+                }
+            self.seats = {session_id: {bike: None for bike in self.bikes} for session_id in self.sessions}    # bike -> holder token
+            self.reservations = {}    # reservation ID -> (session ID, bike, token, paid)
+
+
+    def login(self, email, password):
+        '''
+        Log in and create a session token.
+
+        Parameters:
+            email (str): The login email.
+            password (str): The login password.
+
+        Returns:
+            str: The session token, or None if the credentials are wrong.
+        '''
+
+        if (email, password) != (self.email, self.password):
+            return None
+
+        token = uuid.uuid4().hex
+        with self.lock:
+            self.tokens.add(token)
+        return token
+
+
+    def reserve(self, session_id, bike, token):
+        '''
+        Atomically reserve a bike.
+
+        Parameters:
+            session_id (str): The session ID.
+            bike (str): The bike to reserve.
+            token (str): The session token of the booker.
+
+        Returns:
+            str: The reservation ID, or None if the bike does not exist or is taken.
+        '''
+
+        with self.lock:
+            seats = self.seats.get(session_id, {})
+            if bike not in seats or seats[bike] is not None:
+                return None
+            seats[bike] = token
+            reservation_id = uuid.uuid4().hex[:12]
+            self.reservations[reservation_id] = (session_id, bike, token, False)
+            return reservation_id
+
+
+    def take_seat(self, session_id, bikes, rng):
+        '''
+        Have another rider take one of the free bikes in a session.
+
+        Parameters:
+            session_id (str): The session ID.
+            bikes (list): Bikes to choose from, if any of them is free. Otherwise any free bike is taken.
+            rng (random.Random): Random number generator to choose with.
+
+        Returns:
+            str: The bike taken, or None if the session is full.
+        '''
+
+        with self.lock:
+            seats = self.seats.get(session_id, {})
+            free = [bike for bike in seats if seats[bike] is None]
+            candidates = [bike for bike in bikes if bike in free] or free
+            if not candidates:
+                return None
+            bike = rng.choice(candidates)
+            seats[bike] = 'another rider'
+            return bike
+
+
+    def cancel(self, reservation_id, token = None):
+        '''
+        Cancel an unpaid reservation, freeing its bike.
+
+        Parameters:
+            reservation_id (str): The reservation ID.
+            token (str, optional): The session token of the booker, who alone may cancel it. Defaults to no check.
+
+        Returns:
+            bool: True if the reservation was cancelled, False if there is no such unpaid reservation.
+        '''
+
+        with self.lock:
+            reservation = self.reservations.get(reservation_id)
+            if reservation is None or reservation[3] or (token is not None and reservation[2] != token):
+                return False
+            del self.reservations[reservation_id]
+            self.seats[reservation[0]][reservation[1]] = None
+            return True
+
+
+    def pay(self, reservation_id, series, token):
+        '''
+        Pay for a reservation with a series package.
+
+        Parameters:
+            reservation_id (str): The reservation ID.
+            series (str): Name of the series package.
+            token (str): The session token of the booker.
+
+        Returns:
+            tuple: (status, message), where status is an HTTP status code.
+        '''
+
+        with self.lock:
+            reservation = self.reservations.get(reservation_id)
+            if reservation is None or reservation[2] != token:
+                return 404, 'No such reservation.'
+            if series != self.config['desired_series']:
+                return 400, 'No such series.'
+            self.reservations[reservation_id] = reservation[:3] + (True,)
+
+        session = self.sessions[reservation[0]]
+        return 200, f"You have successfully enrolled in {session['activity']} on bike {reservation[1]}."
+
+
+class FaultInjector:
+
+    def __init__(self, latency = None, faults = None, seed = None):
+        '''
+        Initialise the latency and faults the stand-in site adds to its responses,
+        to reproduce a slow or failing site at the opening of the booking window.
+
+        Latency ('mock_site.latency_ms'): endpoint name -> {'distribution', 'mean', 'jitter'} in milliseconds,
+        with a 'default' entry for the other endpoints. Distributions:
+            - 'uniform' (default): mean plus or minus up to the jitter.
+            - 'normal': the jitter is the standard deviation.
+            - 'lognormal': long-tailed, with the given mean and standard deviation (jitter).
+
+        Faults ('mock_site.faults'):
+            - 'alert_chance': endpoint -> chance that 'login', 'reserve' or 'series' fails with an `.alert` error (503 over the API).
+            - 'drop_chance': endpoint -> chance that the connection is closed without a response.
+            - 'slow_frame': {'chance', 'ms'}: chance that an iframe page loads 'ms' milliseconds late.
+            - 'steal_seat': {'chance', 'after_ms'}: chance that, 'after_ms' after a seat map is served, another rider takes
+              one of the free desired bikes, so the bike disappears between the seat map and the click.
+            - 'stale_chance': chance that a page re-renders its body shortly after loading, making found elements stale.
+
+        Parameters:
+            latency (dict, optional): Per-endpoint latency. Defaults to none.
+            faults (dict, optional): Fault chances. Defaults to none.
+            seed (int, optional): Seed for a reproducible run. Defaults to a random seed.
+        '''
+
+        self.latency = latency or {}
+        self.faults = faults or {}
+        self.random = random.Random(seed)
+        self.injected = {}    # fault -> number of times it was injected
+        self._lock = threading.Lock()
+
+
+    def fire(self, fault, chance):
+        '''
+        Decide whether to inject a fault, counting it if so.
+
+        Parameters:
+            fault (str): Name of the fault, for the counts.
+            chance (float): Chance of injecting it.
+
+        Returns:
+            bool: True if the fault is injected, False otherwise.
+        '''
+
+        with self._lock:
+            if not chance or self.random.random() >= chance:
+                return False
+            self.injected[fault] = self.injected.get(fault, 0) + 1
+            return True
+
+
+    def delay(self, endpoint, frame = False):
+        '''
+        Sleep for an endpoint's latency, plus the slow iframe delay if it is injected.
+
+        Parameters:
+            endpoint (str): Name of the endpoint; see `endpoint_name`.
+            frame (bool, optional): Whether the request loads an iframe page. Defaults to False.
+
+        Returns:
+            None
+        '''
+
+        latency = self.latency.get(endpoint) or self.latency.get('default')
+        milliseconds = 0
+
+        if latency:
+            with self._lock:
+                milliseconds = sample_latency_ms(latency, self.random)
+
+        if frame:
+            slow_frame = self.faults.get('slow_frame', {})
+            if self.fire('slow_frame', slow_frame.get('chance')):
+                milliseconds += slow_frame.get('ms', 0)
+
+        if milliseconds > 0:
+            time.sleep(milliseconds / 1000)
+
+
+    def alert(self, endpoint):
+        '''
+        Decide whether a request to an endpoint fails with an error message.
+
+        Parameters:
+            endpoint (str): Name of the endpoint.
+
+        Returns:
+            bool: True if the request fails, False otherwise.
+        '''
+
+        return self.fire(f'alert {endpoint}', self.faults.get('alert_chance', {}).get(endpoint))
+
+
+    def drop(self, endpoint):
+        '''
+        Decide whether a request to an endpoint is dropped without a response.
+
+        Parameters:
+            endpoint (str): Name of the endpoint.
+
+        Returns:
+            bool: True if the request is dropped, False otherwise.
+        '''
+
+        return self.fire(f'drop {endpoint}', self.faults.get('drop_chance', {}).get(endpoint))
+
+
+    def stale(self):
+        '''
+        Decide whether a page re-renders after loading, and when.
+
+        Returns:
+            int: Milliseconds after loading to re-render at, or None if the page does not re-render.
+        '''
+
+        if not self.fire('stale', self.faults.get('stale_chance')):
+            return None
+        with self._lock:
+            return self.random.randint(0, 300)
+
+
+    def steal_seat(self, state, session_id):
+        '''
+        Possibly have another rider take a free desired bike shortly after a seat map is served.
+
+        Parameters:
+            state (MockCruState): The site's state.
+            session_id (str): The session whose seat map was served.
+
+        Returns:
+            None
+        '''
+
+        steal_seat = self.faults.get('steal_seat', {})
+        if self.fire('steal_seat', steal_seat.get('chance')):
+            timer = threading.Timer(steal_seat.get('after_ms', 50) / 1000, state.take_seat, (session_id, state.config['desired_bikes'], self.random))
+            timer.daemon = True
+            timer.start()
+
+
+class MockCruHandler(BaseHTTPRequestHandler):
+
+    # Keep connections alive between requests, like the real site
+    protocol_version = 'HTTP/1.1'
+
+    # Headers and body are written separately, so Nagle's algorithm would delay every response
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+    def send_json(self, status, data, headers = None):
+        '''
+        Send a JSON response.
+
+        Parameters:
+            status (int): HTTP status code.
+            data (dict): Response body.
+            headers (dict, optional): Extra response headers. Defaults to none.
+
+        Returns:
+            None
+        '''
+
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+    def read_json(self):
+        '''
+        Read the JSON request body.
+
+        Returns:
+            dict: The decoded body, or an empty dict if there is none.
+        '''
+
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length)) if length else {}
+
+
+    def token(self):
+        '''
+        Find the caller's session token, from the session cookie or a bearer Authorization header.
+
+        Returns:
+            str: The token, or None if the caller is not logged in.
+        '''
+
+        state = self.server.state
+        authorization = self.headers.get('Authorization', '')
+        if authorization.startswith('Bearer ') and authorization[7:] in state.tokens:
+            return authorization[7:]
+
+        for cookie in self.headers.get('Cookie', '').split(';'):
+            name, _, value = cookie.strip().partition('=')
+            if name == 'session' and value in state.tokens:
+                return value
+        return None
+
+
+    def do_GET(self):
+        self.route('GET')
+
+
+    def do_POST(self):
+        self.route('POST')
+
+
+    def route(self, method):
+        '''
+        Delay the request by its endpoint's latency, or drop it if the fault is injected,
+        then dispatch it to the JSON API or the pages.
+
+        Parameters:
+            method (str): HTTP method.
+
+        Returns:
+            None
+        '''
+
+        url = urlsplit(self.path)
+        endpoint = endpoint_name(url.path)
+        self.server.faults.delay(endpoint, url.path.startswith('/frame'))
+
+        if self.server.faults.drop(endpoint):
+            self.close_connection = True
+            return
+
+        if url.path.startswith('/api/'):
+            self.route_api(method, url)
+        else:
+            self.route_page(method, url)
+
+
+    def route_api(self, method, url):
+        '''
+        Dispatch a request to the JSON API:
+            POST /api/login, GET /api/schedule, GET /api/sessions/<id>/seats,
+            POST /api/sessions/<id>/reserve, POST /api/reservations/<id>/series and POST /api/reservations/<id>/cancel.
+
+        Parameters:
+            method (str): HTTP method.
+            url (urllib.parse.SplitResult): The request URL.
+
+        Returns:
+            None
+        '''
+
+        state = self.server.state
+        parts = url.path.strip('/').split('/')
+        payload = self.read_json() if method == 'POST' else {}
+
+        faults = self.server.faults
+        endpoint = endpoint_name(url.path)
+        if endpoint in ('login', 'reserve') and faults.alert(endpoint):
+            return self.send_json(503, {'message': 'The server is busy. Please try again.'})
+
+        if (method, url.path) == ('POST', '/api/login'):
+            token = state.login(payload.get('email'), payload.get('password'))
+            if token is None:
+                return self.send_json(401, {'message': 'Incorrect username or password.'})
+            return self.send_json(200, {'token': token}, {'Set-Cookie': f'session={token}; Path=/; HttpOnly'})
+
+        token = self.token()
+        if token is None:
+            return self.send_json(401, {'message': 'Unauthorized.'})
+
+        if (method, url.path) == ('GET', '/api/schedule'):
+            week = parse_qs(url.query).get('week', ['this'])[0]
+            sessions = list(state.sessions.values()) if week == 'next' else []
+            return self.send_json(200, {'sessions': sessions})
+
+        if parts[:2] == ['api', 'sessions'] and len(parts) == 4 and parts[2] in state.seats:
+            session_id = parts[2]
+
+            if (method, parts[3]) == ('GET', 'seats'):
+                with state.lock:
+                    seats = [{'bike': bike, 'available': holder is None} for bike, holder in state.seats[session_id].items()]
+                faults.steal_seat(state, session_id)
+                return self.send_json(200, {'seats': seats})
+
+            if (method, parts[3]) == ('POST', 'reserve'):
+                reservation_id = state.reserve(session_id, payload.get('bike'), token)
+                if reservation_id is None:
+                    return self.send_json(409, {'message': f"Bike {payload.get('bike')} is not available."})
+                return self.send_json(200, {'reservation_id': reservation_id})
+
+        if method == 'POST' and parts[:2] == ['api', 'reservations'] and len(parts) == 4 and parts[3] == 'series':
+            if faults.alert('series'):
+                state.cancel(parts[2])
+                return self.send_json(503, {'message': 'Payment failed. Your reservation was released.'})
+            status, message = state.pay(parts[2], payload.get('series'), token)
+            return self.send_json(status, {'message': message})
+
+        if method == 'POST' and parts[:2] == ['api', 'reservations'] and len(parts) == 4 and parts[3] == 'cancel':
+            if not state.cancel(parts[2], token):
+                return self.send_json(404, {'message': 'No such reservation.'})
+            return self.send_json(200, {'message': 'Your reservation was cancelled.'})
+
+        self.send_json(404, {'message': 'Not found.'})
+
+
+    def send_html(self, status, body, headers = None):
+        '''
+        Send an HTML page.
+
+        Parameters:
+            status (int): HTTP status code.
+            body (str): The page.
+            headers (dict, optional): Extra response headers. Defaults to none.
+
+        Returns:
+            None
+        '''
+
+        rerender_ms = self.server.faults.stale() if status == 200 else None
+        if rerender_ms is not None:
+            body = body.replace('</body>', f'<script>setTimeout(function() {{ document.body.innerHTML = document.body.innerHTML; }}, {rerender_ms});</script></body>')
+
+        data = body.encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+    def redirect(self, location, headers = None):
+        '''
+        Redirect to another page with a 303 See Other.
+
+        Parameters:
+            location (str): The page to redirect to.
+            headers (dict, optional): Extra response headers. Defaults to none.
+
+        Returns:
+            None
+        '''
+
+        self.send_response(303)
+        self.send_header('Location', location)
+        self.send_header('Content-Length', '0')
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+
+
+    def route_page(self, method, url):
+        '''
+        Dispatch a request to the pages the BookingBot drives.
+        The top-level page (/schedule) holds the 'Book Now' hover menu and an iframe. Everything else is served in that iframe:
+            /frame (login form, or the account page once logged in), POST /frame/login,
+            /frame/schedule?location=<name>&week=<this|next>, /frame/sessions/<id> (seat map),
+            /frame/sessions/<id>/reserve?bike=<bike> (series choice) and /frame/reservations/<id>/series?series=<name>.
+        Iframe pages other than the login form show the login form when the caller is not logged in.
+
+        Parameters:
+            method (str): HTTP method.
+            url (urllib.parse.SplitResult): The request URL.
+
+        Returns:
+            None
+        '''
+
+        state = self.server.state
+        faults = self.server.faults
+        parts = url.path.strip('/').split('/')
+        query = {name: values[0] for name, values in parse_qs(url.query).items()}
+
+        if url.path in ('/', '/schedule'):
+            return self.send_html(200, render_top_page(state, query.get('location')))
+
+        if (method, url.path) == ('POST', '/frame/login'):
+            length = int(self.headers.get('Content-Length') or 0)
+            form = {name: values[0] for name, values in parse_qs(self.rfile.read(length).decode()).items()}
+            if faults.alert('login'):
+                return self.send_html(200, render_login(error = 'The server is busy. Please try again.'))
+            token = state.login(form.get('username'), form.get('password'))
+            if token is None:
+                return self.send_html(200, render_login(error = 'Incorrect username or password.'))
+            return self.redirect('/frame', {'Set-Cookie': f'session={token}; Path=/; HttpOnly'})
+
+        if url.path == '/logout':
+            return self.redirect('/schedule', {'Set-Cookie': 'session=; Path=/; Max-Age=0'})
+
+        if parts[0] != 'frame':
+            return self.send_html(404, render_page('Not found', '<div class="alert">Page not found.</div>'))
+
+        token = self.token()
+        if token is None:
+            return self.send_html(200, render_login())
+
+        if url.path == '/frame':
+            return self.send_html(200, render_page('Account', '<p>Welcome back!</p><a href="/logout">Log out</a>'))
+
+        if url.path == '/frame/schedule':
+            return self.send_html(200, render_schedule(state, query.get('location', ''), query.get('week', 'this')))
+
+        if parts[1:2] == ['sessions'] and len(parts) >= 3 and parts[2] in state.seats:
+            session_id = parts[2]
+            if len(parts) == 3:
+                page = render_seats(state, session_id)
+                faults.steal_seat(state, session_id)
+                return self.send_html(200, page)
+
+            if parts[3:] == ['reserve']:
+                bike = query.get('bike')
+                if faults.alert('reserve'):
+                    return self.send_html(200, render_seats(state, session_id, error = 'The server is busy. Please try again.'))
+                reservation_id = state.reserve(session_id, bike, token)
+                if reservation_id is None:
+                    return self.send_html(200, render_seats(state, session_id, error = f"Bike {bike} is not available."))
+                return self.send_html(200, render_series(state, reservation_id))
+
+        if parts[1:2] == ['reservations'] and parts[3:] == ['series'] and len(parts) == 4:
+            if faults.alert('series'):
+                state.cancel(parts[2])
+                return self.send_html(200, render_page('Booking', '<div class="alert">Payment failed. Your reservation was released.</div>'))
+            status, message = state.pay(parts[2], query.get('series'), token)
+            css_class = 'success-message' if status == 200 else 'alert'
+            return self.send_html(200, render_page('Booking', f'<div class="{css_class}">{html.escape(message)}</div>'))
+
+        self.send_html(404, render_page('Not found', '<div class="alert">Page not found.</div>'))
+
+
+def sample_latency_ms(latency, rng):
+    '''
+    Draw a latency from a distribution in the format of 'mock_site.latency_ms'.
+
+    Parameters:
+        latency (dict): {'distribution', 'mean', 'jitter'} in milliseconds. The distribution defaults to 'uniform'.
+        rng (random.Random): Random number generator to draw with.
+
+    Returns:
+        float: The latency in milliseconds. May be negative for a 'normal' distribution.
+    '''
+
+    mean = latency.get('mean', 0)
+    jitter = latency.get('jitter', 0)
+    distribution = latency.get('distribution', 'uniform')
+
+    if distribution == 'normal':
+        return rng.gauss(mean, jitter)
+    elif distribution == 'lognormal' and mean > 0:
+        sigma = math.sqrt(math.log(1 + (jitter / mean) ** 2))
+        return rng.lognormvariate(math.log(mean) - sigma ** 2 / 2, sigma)
+    return mean + rng.uniform(-jitter, jitter)
+
+
+def endpoint_name(path):
+    '''
+    Name the endpoint a request path belongs to, for its latency and faults:
+    'login', 'schedule', 'seats', 'reserve', 'series', 'frame' (other iframe pages) or 'page'.
+    The JSON API and the pages share names, so both see the same latency and faults.
+
+    Parameters:
+        path (str): The request path.
+
+    Returns:
+        str: The endpoint name.
+    '''
+
+    parts = path.strip('/').split('/')
+    if parts[-1] in ('login', 'schedule', 'seats', 'reserve', 'series'):
+        return parts[-1]
+    if parts[:2] == ['frame', 'sessions'] and len(parts) == 3:
+        return 'seats'
+    if parts[0] == 'frame':
+        return 'frame'
+    return 'page'
+
+
+def render_page(title, body, script = ''):
+    '''
+    Wrap content in a minimal HTML page.
+
+    Parameters:
+        title (str): The page title.
+        body (str): HTML content of the body.
+        script (str, optional): JavaScript run after the body has loaded. Defaults to none.
+
+    Returns:
+        str: The page.
+    '''
+
+    return f'''<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{html.escape(title)}</title>
+<style>
+body {{ font-family: sans-serif; }}
+#book-now ul {{ display: none; }}
+#book-now:hover ul {{ display: block; }}
+iframe {{ width: 100%; height: 900px; border: 0; }}
+.week {{ display: flex; }}
+.week > div {{ flex: 1; }}
+.seats a {{ display: inline-block; width: 3em; margin: 0.2em; }}
+.seats a.reserved {{ pointer-events: none; color: #aaa; }}
+.alert, .success-message {{ padding: 1em; }}
+</style></head>
+<body>{body}{f'<script>{script}</script>' if script else ''}</body></html>'''
+
+
+def render_top_page(state, location = None):
+    '''
+    Render the top-level page: the 'Book Now' hover menu of locations, and the iframe
+    (the location's schedule if one is selected, otherwise the login form or account page).
+
+    Parameters:
+        state (MockCruState): The site's state.
+        location (str, optional): The selected location. Defaults to none.
+
+    Returns:
+        str: The page.
+    '''
+
+    locations = [state.config['desired_location'], 'CRU Orchard']
+    menu = ''.join(f'<li><a href="/schedule?{urlencode({"location": name})}">{html.escape(name)}</a></li>' for name in locations)
+    frame = f'/frame/schedule?{urlencode({"location": location, "week": "this"})}' if location else '/frame'
+    return render_page('CRU', f'''<nav><ul><li id="book-now"><a href="#">Book Now</a><ul>{menu}</ul></li></ul></nav>
+<iframe src="{frame}"></iframe>''')
+
+
+def render_login(error = None):
+    '''
+    Render the login form, with an error message if a login failed.
+
+    Parameters:
+        error (str, optional): The error message. Defaults to none.
+
+    Returns:
+        str: The page.
+    '''
+
+    alert = f'<div class="alert">{html.escape(error)}</div>' if error else ''
+    return render_page('Sign in', f'''{alert}<form method="post" action="/frame/login">
+<input id="username" name="username" type="email"> <input id="password" name="password" type="password">
+<button type="submit">Sign In</button></form>''')
+
+
+def render_schedule(state, location, week):
+    '''
+    Render a location's weekly schedule: a 'NEXT WEEK' link and one 'dayN' column per day,
+    with a 'data-instructor' block per session. Only next week has sessions.
+    Like the real site, the page also loads the schedule from the JSON API.
+
+    Parameters:
+        state (MockCruState): The site's state.
+        location (str): The selected location.
+        week (str): 'this' or 'next'.
+
+    Returns:
+        str: The page.
+    '''
+
+    sessions = list(state.sessions.values()) if week == 'next' else []
+    columns = ''
+    for number in range(1, 8):
+        day = f'day{number}'
+        blocks = ''.join(f'''<div data-instructor="{html.escape(session['data_instructor'])}"><a href="/frame/sessions/{session['id']}">{html.escape(session['time'])}</a>
+<p>{html.escape(session['activity'])}</p><p>{html.escape(session['instructor'])}</p></div>''' for session in sessions if session['day'] == day)
+        columns += f'<div class="{day}"><h3>Day {number}</h3>{blocks}</div>'
+
+    next_week = f'/frame/schedule?{urlencode({"location": location, "week": "next"})}'
+    script = f"fetch('/api/schedule?{urlencode({'location': location, 'week': week})}');"
+    return render_page('Schedule', f'''<h2>{html.escape(location)}</h2><div class="next"><a href="{next_week}">NEXT WEEK</a></div>
+<div class="week">{columns}</div>''', script)
+
+
+def render_seats(state, session_id, error = None):
+    '''
+    Render a session's seat map: one link per bike, with the bike's name in a span. Taken bikes have the 'reserved' class.
+    Like the real site, the page also loads the seat map from the JSON API.
+
+    Parameters:
+        state (MockCruState): The site's state.
+        session_id (str): The session ID.
+        error (str, optional): An error message to show above the seat map. Defaults to none.
+
+    Returns:
+        str: The page.
+    '''
+
+    with state.lock:
+        seats = list(state.seats[session_id].items())
+
+    links = ''.join(f'''<a class="seat{' reserved' if holder else ''}"{' aria-disabled="true"' if holder else ''} href="/frame/sessions/{session_id}/reserve?{urlencode({'bike': bike})}"><span>{html.escape(bike)}</span></a>'''
+                    for bike, holder in seats)
+    alert = f'<div class="alert">{html.escape(error)}</div>' if error else ''
+    return render_page('Seats', f'{alert}<div class="seats">{links}</div>', f"fetch('/api/sessions/{session_id}/seats');")
+
+
+def render_series(state, reservation_id):
+    '''
+    Render the series packages a reservation can be paid with: the desired series plus a single class credit.
+
+    Parameters:
+        state (MockCruState): The site's state.
+        reservation_id (str): The reservation ID.
+
+    Returns:
+        str: The page.
+    '''
+
+    options = [state.config['desired_series'], 'Single Class Credit']
+    links = ''.join(f'<li><a href="/frame/reservations/{reservation_id}/series?{urlencode({"series": name}, quote_via = quote)}">{html.escape(name)}</a></li>' for name in options)
+    return render_page('Series', f'<h2>Choose a series</h2><ul>{links}</ul>')
+
+
+class MockCruServer:
+
+    def __init__(self, config, email, password, port = 0, bikes = None, latency = None, faults = None, seed = None):
+        '''
+        Initialise a local stand-in for the booking site, served from a background thread.
+        It serves both the JSON API used by the HTTP engine and the pages driven by the BookingBot.
+
+        Parameters:
+            config (dict): Configuration settings loaded from a JSON file.
+            email (str): The only accepted login email.
+            password (str): The only accepted login password.
+            port (int, optional): Port to listen on. Defaults to any free port.
+            bikes (list, optional): Bikes in every session. Defaults to B1 to B20.
+            latency (dict, optional): Per-endpoint latency (e.g. 'mock_site.latency_ms'); see FaultInjector. Defaults to no added latency.
+            faults (dict, optional): Fault chances (e.g. 'mock_site.faults'); see FaultInjector. Defaults to no faults.
+            seed (int, optional): Seed for the latency and faults. Defaults to a random seed.
+        '''
+
+        self.state = MockCruState(config, email, password, bikes)
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', port), MockCruHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.state = self.state
+        self.httpd.faults = FaultInjector(latency, faults, seed)
+        self.thread = None
+
+
+    @property
+    def url(self):
+        '''
+        str: Base URL of the server.
+        '''
+
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+    def start(self):
+        '''
+        Start serving in a background thread.
+
+        Returns:
+            MockCruServer: The server, for chaining.
+        '''
+
+        self.thread = threading.Thread(target = self.httpd.serve_forever, daemon = True)
+        self.thread.start()
+        return self
+
+
+    def stop(self):
+        '''
+        Stop serving and close the socket.
+
+        Returns:
+            None
+        '''
+
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+    def __enter__(self):
+        return self.start()
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+        return False
+
+
+def main():
+    '''
+    Serve the stand-in site in the foreground, with the booking configuration from config.json.
+
+    Returns:
+        None
+    '''
+
+    parser = argparse.ArgumentParser(description = "Local stand-in for the booking site.")
+    parser.add_argument('--port', type = int, default = 8068)
+    parser.add_argument('--email', default = 'rider@example.com')
+    parser.add_argument('--password', default = 'password')
+    parser.add_argument('--latency', action = 'store_true', help = "Add the per-endpoint latency and jitter in 'mock_site.latency_ms'.")
+    parser.add_argument('--faults', action = 'store_true', help = "Inject the faults in 'mock_site.faults'.")
+    parser.add_argument('--seed', type = int, help = "Seed for a reproducible run.")
+    args = parser.parse_args()
+
+    with open('config.json', 'r') as file:
+        config = json.load(file)
+
+    settings = config.get('mock_site', {})
+    latency = settings.get('latency_ms') if args.latency else None
+    faults = settings.get('faults') if args.faults else None
+    server = MockCruServer(config, args.email, args.password, args.port, latency = latency, faults = faults, seed = args.seed)
+    print(f"Serving the stand-in booking site on {server.url} (log in at {server.url}/schedule)")
+    server.httpd.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+import re
+import json
+import time
+import logging
+from selenium.common.exceptions import WebDriverException
+
+
+def json_path(data, path):
+    '''
+    Read a value from decoded JSON by a dot-separated path (e.g. 'data.sessions').
+
+    Parameters:
+        data: The decoded JSON.
+        path (str): Dot-separated keys. An empty path returns the data itself.
+
+    Returns:
+        The value, or None if the path does not exist.
+    '''
+
+    for key in filter(None, path.split('.')):
+        if not isinstance(data, dict):
+            return None
+        data = data.get(key)
+    return data
+
+
+class NetworkCapture:
+
+    def __init__(self, driver, config, logger = None, cancel_check = None):
+        '''
+        Initialise a listener for the JSON responses the booking site's pages load.
+
+        Responses are read from Chrome's performance log (enabled in `launch_chrome` when 'api_capture.enabled' is set),
+        and their bodies fetched with the CDP command `Network.getResponseBody`.
+        Each response is filed under the first kind in 'api_capture.url_patterns' whose regular expression matches its URL.
+
+        Parameters:
+            driver (selenium.webdriver.Chrome): The driver to listen on.
+            config (dict): Configuration settings loaded from a JSON file.
+            logger (logging.Logger, optional): Logger object for logging events. Defaults to the root logger.
+            cancel_check (callable, optional): Called on every poll of `wait_for`; raises to abort the wait. Defaults to none.
+        '''
+
+        settings = config['api_capture']
+
+        self.driver = driver
+        self.logger = logger or logging.getLogger()
+        self.cancel_check = cancel_check or (lambda: None)
+        self.patterns = {kind: re.compile(pattern) for kind, pattern in settings['url_patterns'].items()}
+        self.poll_interval = config.get('waits', {}).get('poll_interval_ms', 25) / 1000
+        self.responses = {}    # kind -> list of decoded JSON bodies, oldest first
+        self._pending = {}     # request ID -> kind, for responses whose body has not finished loading
+
+
+    def start(self):
+        '''
+        Enable network events and drop anything logged before this point (e.g. by a previous user of a pooled driver).
+
+        Returns:
+            None
+        '''
+
+        self.driver.execute_cdp_cmd('Network.enable', {})
+        self.driver.get_log('performance')
+
+
+    def poll(self):
+        '''
+        Read new network events and decode the JSON responses that finished loading.
+
+        Returns:
+            None
+        '''
+
+        for entry in self.driver.get_log('performance'):
+            message = json.loads(entry['message'])['message']
+            params = message.get('params', {})
+
+            if message['method'] == 'Network.responseReceived':
+                response = params['response']
+                if 'json' not in response.get('mimeType', ''):
+                    continue
+                for kind, pattern in self.patterns.items():
+                    if pattern.search(response['url']):
+                        self._pending[params['requestId']] = kind
+                        break
+
+            elif message['method'] == 'Network.loadingFinished' and params['requestId'] in self._pending:
+                kind = self._pending.pop(params['requestId'])
+                try:
+                    body = self.driver.execute_cdp_cmd('Network.getResponseBody', {'requestId': params['requestId']})
+                    self.responses.setdefault(kind, []).append(json.loads(body['body']))
+                except (WebDriverException, ValueError) as e:
+                    self.logger.info(f"Unable to read a captured '{kind}' response: {e}")
+
+
+    def mark(self, kind):
+        '''
+        Forget the responses of a kind captured so far, so the next `wait_for` only returns a newer one.
+
+        Parameters:
+            kind (str): The kind of response.
+
+        Returns:
+            None
+        '''
+
+        self.poll()
+        self.responses.pop(kind, None)
+
+
+    def wait_for(self, kind, timeout):
+        '''
+        Wait for a response of a kind to be captured.
+
+        Parameters:
+            kind (str): The kind of response.
+            timeout (float): Maximum number of seconds to wait.
+
+        Returns:
+            The latest decoded JSON body of that kind, or None if none was captured within the timeout.
+        '''
+
+        deadline = time.monotonic() + timeout
+        while True:
+            self.cancel_check()
+            self.poll()
+            if self.responses.get(kind):
+                return self.responses[kind][-1]
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(self.poll_interval)
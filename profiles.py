@@ -0,0 +1,118 @@
+import os
+import re
+import time
+import shutil
+import hashlib
+import logging
+
+# Cache directories Chrome can rebuild, relative to a profile; pruned before the cookies and storage are
+CACHE_DIRECTORIES = [
+    os.path.join('Default', 'Cache'),
+    os.path.join('Default', 'Code Cache'),
+    os.path.join('Default', 'GPUCache'),
+    os.path.join('Default', 'Service Worker', 'CacheStorage'),
+    os.path.join('Default', 'Service Worker', 'ScriptCache'),
+    'GrShaderCache',
+    'ShaderCache',
+    'GraphiteDawnCache',
+]
+
+
+def profile_dir(config, worker):
+    '''
+    Find the persistent Chrome profile of a worker, for the account set in the environment variables.
+    Each worker gets its own profile, because Chrome locks a profile to one browser at a time.
+
+    Parameters:
+        config (dict): Configuration settings loaded from a JSON file. Profile settings are read from 'persistent_profile'.
+        worker (str): Name of the worker (e.g. its desired bike).
+
+    Returns:
+        str: Absolute path of the profile directory, or None if persistent profiles are disabled.
+
+    Environment Variables:
+        - CRU_BOOKING_EMAIL: The account the profile belongs to.
+    '''
+
+    settings = config.get('persistent_profile', {})
+    if not settings.get('enabled'):
+        return None
+
+    # The account is hashed, so the email does not end up in directory names
+    account = hashlib.sha1(os.environ.get('CRU_BOOKING_EMAIL', '').lower().encode()).hexdigest()[:12]
+    worker = re.sub(r'[^\w.-]', '_', worker)
+    return os.path.abspath(os.path.join(settings.get('directory', 'profiles'), account, worker))
+
+
+def directory_size_mb(path):
+    '''
+    Measure the size of the files under a directory.
+
+    Parameters:
+        path (str): The directory.
+
+    Returns:
+        float: Size in MB.
+    '''
+
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass    # removed by a running browser in the meantime
+    return total / (1024 * 1024)
+
+
+def prune_profiles(config, logger = None):
+    '''
+    Keep every persistent profile within 'persistent_profile.max_size_mb'.
+    A profile over budget has its caches cleared first, which keeps the remembered login.
+    If it is still over budget, it is removed entirely. Profiles unused for more than 'max_age_days' are removed too.
+    Must not run while a browser is using one of the profiles.
+
+    Parameters:
+        config (dict): Configuration settings loaded from a JSON file.
+        logger (logging.Logger, optional): Logger object for logging events. Defaults to the root logger.
+
+    Returns:
+        None
+    '''
+
+    logger = logger or logging.getLogger()
+    settings = config.get('persistent_profile', {})
+    directory = settings.get('directory', 'profiles')
+    max_size_mb = settings.get('max_size_mb', 500)
+    max_age = settings.get('max_age_days', 30) * 24 * 3600
+
+    if not settings.get('enabled') or not os.path.isdir(directory):
+        return
+
+    for account in os.listdir(directory):
+        account_dir = os.path.join(directory, account)
+        if not os.path.isdir(account_dir):
+            continue
+
+        for worker in os.listdir(account_dir):
+            path = os.path.join(account_dir, worker)
+            if not os.path.isdir(path):
+                continue
+
+            if time.time() - os.path.getmtime(path) > max_age:
+                shutil.rmtree(path, ignore_errors = True)
+                logger.info(f"Removed profile {path}: unused for more than {settings.get('max_age_days', 30)} days.")
+                continue
+
+            size_mb = directory_size_mb(path)
+            if size_mb <= max_size_mb:
+                continue
+
+            for cache in CACHE_DIRECTORIES:
+                shutil.rmtree(os.path.join(path, cache), ignore_errors = True)
+            pruned_mb = directory_size_mb(path)
+            logger.info(f"Cleared the caches of profile {path}: {size_mb:.0f} MB -> {pruned_mb:.0f} MB.")
+
+            if pruned_mb > max_size_mb:
+                shutil.rmtree(path, ignore_errors = True)
+                logger.info(f"Removed profile {path}: still over the {max_size_mb} MB budget.")
@@ -0,0 +1,446 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import argparse
+import statistics
+from datetime import datetime
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS attempts (
+    id INTEGER PRIMARY KEY,
+    run_id TEXT NOT NULL,
+    recorded_at TEXT NOT NULL,
+    week TEXT NOT NULL,                 -- ISO week of T0, e.g. 2026-W42
+    opening TEXT NOT NULL,              -- T0
+    activity TEXT NOT NULL,
+    instructor TEXT NOT NULL,
+    session_time TEXT NOT NULL,
+    bike TEXT NOT NULL,                 -- the worker's first-choice bike
+    engine TEXT NOT NULL,
+    attempt INTEGER NOT NULL,           -- 0 is the pre-warm
+    outcome TEXT NOT NULL,
+    booked_bike TEXT,
+    started_after_t0 REAL,
+    ended_after_t0 REAL,
+    step_seconds TEXT NOT NULL,         -- JSON: step -> seconds
+    commands TEXT,                      -- JSON: step -> WebDriver commands, or NULL without a browser
+    sold_out_after_t0 REAL              -- first time the worker saw no free bike in the class, or NULL
+);
+CREATE INDEX IF NOT EXISTS attempts_by_class ON attempts (activity, instructor, bike, week);
+
+CREATE TABLE IF NOT EXISTS availability (
+    run_id TEXT NOT NULL,
+    week TEXT NOT NULL,
+    activity TEXT NOT NULL,
+    instructor TEXT NOT NULL,
+    bike TEXT NOT NULL,
+    last_free_after_t0 REAL,            -- last time the bike was seen free, or NULL
+    first_taken_after_t0 REAL           -- first time the bike was seen taken by someone else, or NULL
+);
+CREATE INDEX IF NOT EXISTS availability_by_class ON availability (activity, instructor, bike, week);
+'''
+
+# Traced BookingBot methods, which key the WebDriver commands, -> the booking step their time is recorded under
+TRACED_STEPS = {
+    'start_driver': 'start_driver',
+    'login_to_website': 'login',
+    'click_book_now': 'location',
+    'select_session': 'session',
+    'select_bike': 'bike',
+    'select_series': 'series',
+}
+
+
+def percentile(values, fraction):
+    '''
+    Nearest-rank percentile of a list of values.
+
+    Parameters:
+        values (list): The values.
+        fraction (float): The percentile as a fraction (e.g. 0.95).
+
+    Returns:
+        float: The percentile, or None if there are no values.
+    '''
+
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))]
+
+
+def connect(path):
+    '''
+    Open the run history database, creating it if needed.
+
+    Parameters:
+        path (str): Path of the SQLite database.
+
+    Returns:
+        sqlite3.Connection: The connection.
+    '''
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok = True)
+
+    connection = sqlite3.connect(path, timeout = 30)    # the workers of a run save at about the same time
+    connection.executescript(SCHEMA)
+    return connection
+
+
+class RunRecorder:
+
+    def __init__(self, config, engine, scheduler, coordinator = None):
+        '''
+        Initialise the record of one worker's run: each attempt's step timings, WebDriver commands and outcome,
+        and when the bikes were seen free or taken. Saved to 'run_history.path' at the end of the run, if 'run_history.enabled' is set.
+
+        Times are in seconds after T0, as anchored by the worker's scheduler.
+
+        Parameters:
+            config (dict): Configuration settings loaded from a JSON file.
+            engine (str): Name of the booking engine.
+            scheduler (BookingScheduler): The worker's scheduler.
+            coordinator (BookingCoordinator, optional): Coordinator shared with the other bike workers, whose reserved bikes are not recorded. Defaults to none.
+        '''
+
+        self.config = config
+        self.engine = engine
+        self.scheduler = scheduler
+        self.coordinator = coordinator
+        self.bike = None
+        self.attempts = []    # (attempt, outcome, started, ended, step seconds, commands)
+        self.availability = {}    # bike -> [last seen free, first seen taken]
+        self.sold_out_at = None
+        self.booked_bike = None
+
+        self._step_seconds = {}
+        self._started = None
+
+
+    def after_t0(self):
+        '''
+        Seconds since T0.
+
+        Returns:
+            float: Seconds after T0 (negative before it), or None if the scheduler is not armed yet.
+        '''
+
+        if self.scheduler.opening_monotonic is None:
+            return None
+        return time.monotonic() - self.scheduler.opening_monotonic
+
+
+    def step(self, step, seconds):
+        '''
+        Add time spent in a step to the current attempt.
+
+        Parameters:
+            step (str): The step (e.g. 'session').
+            seconds (float): Seconds spent in it.
+
+        Returns:
+            None
+        '''
+
+        now = self.after_t0()
+        if self._started is None and now is not None:
+            self._started = now - seconds
+        self._step_seconds[step] = self._step_seconds.get(step, 0) + seconds
+
+
+    def seats(self, seat_map):
+        '''
+        Record a seat map read from the site.
+        Bikes reserved or booked by any of our workers are skipped: they were not taken by another rider.
+
+        Parameters:
+            seat_map (dict): bike -> True if the bike is free.
+
+        Returns:
+            None
+        '''
+
+        now = self.after_t0()
+        ours = self.coordinator.claimed() if self.coordinator else ()
+        for bike, available in seat_map.items():
+            if bike in ours:
+                continue
+            seen = self.availability.setdefault(bike, [None, None])
+            if available:
+                seen[0] = now
+            elif seen[1] is None:
+                seen[1] = now
+
+        if seat_map and not any(seat_map.values()) and self.sold_out_at is None:
+            self.sold_out_at = now
+
+
+    def classify(self, step, desired_bikes):
+        '''
+        Classify why an attempt failed at a step.
+
+        Parameters:
+            step (str): The step whose retries were spent.
+            desired_bikes (list): The bikes to be selected, in order of priority.
+
+        Returns:
+            str: 'sold_out' or 'bikes_taken' if the bike step found no bike, otherwise '<step>_failed'.
+        '''
+
+        if step == 'bike':
+            if self.sold_out_at is not None:
+                return 'sold_out'
+            if all((self.availability.get(bike) or [None, None])[1] is not None for bike in desired_bikes):
+                return 'bikes_taken'
+        return f"{step}_failed"
+
+
+    def end_attempt(self, outcome, commands = None, booked_bike = None):
+        '''
+        Close the current attempt (the pre-warm, then attempts 1, 2, ...) with its outcome.
+
+        Parameters:
+            outcome (str): The outcome: 'prewarmed', 'booked', 'cancelled', 'error', or a failure from `classify`.
+            commands (dict, optional): Per-step WebDriver command totals; see `CommandLog.per_step`. Defaults to none.
+                                       They are stored under the booking steps of TRACED_STEPS, beside the step timings.
+            booked_bike (str, optional): The bike booked in this attempt. Defaults to none.
+
+        Returns:
+            None
+        '''
+
+        ended = self.after_t0()
+        started = self._started if self._started is not None else ended
+        counts = None
+        if commands is not None:
+            counts = {}
+            for step, totals in commands.items():
+                step = TRACED_STEPS.get(step, step)
+                counts[step] = counts.get(step, 0) + totals['commands']
+
+        self.attempts.append((len(self.attempts), outcome, started, ended, self._step_seconds, counts))
+        if booked_bike:
+            self.booked_bike = booked_bike
+            self.availability.setdefault(booked_bike, [None, None])[0] = ended
+        self._step_seconds = {}
+        self._started = None
+
+
+    def save(self, logger = None):
+        '''
+        Write the run's attempts and bike availability to the run history database, if it is enabled.
+        A failure to save is logged, never raised, so it cannot affect a booking.
+
+        Parameters:
+            logger (logging.Logger, optional): Logger object for logging events. Defaults to the root logger.
+
+        Returns:
+            None
+        '''
+
+        logger = logger or logging.getLogger()
+        settings = self.config.get('run_history', {})
+        if not settings.get('enabled') or not self.attempts or self.scheduler.opening is None:
+            return
+
+        opening = self.scheduler.opening
+        year, week, _ = opening.isocalendar()
+        week = f"{year}-W{week:02d}"
+        session = self.config['desired_session']
+        run_id = f"{opening:%Y%m%dT%H%M}-{self.bike}-{uuid.uuid4().hex[:8]}"
+        recorded_at = datetime.now().isoformat(timespec = 'seconds')
+
+        try:
+            with connect(settings.get('path', 'logs/history.db')) as connection:
+                connection.executemany(
+                    'INSERT INTO attempts (run_id, recorded_at, week, opening, activity, instructor, session_time, bike, engine, attempt, outcome, '
+                    'booked_bike, started_after_t0, ended_after_t0, step_seconds, commands, sold_out_after_t0) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    [(run_id, recorded_at, week, opening.isoformat(), session['activity'], session['instructor'], session['time'], self.bike, self.engine, attempt, outcome, self.booked_bike if outcome == 'booked' else None, started, ended,
+                      json.dumps(step_seconds), json.dumps(counts) if counts is not None else None, self.sold_out_at)
+                     for attempt, outcome, started, ended, step_seconds, counts in self.attempts])
+                connection.executemany(
+                    'INSERT INTO availability (run_id, week, activity, instructor, bike, last_free_after_t0, first_taken_after_t0) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    [(run_id, week, session['activity'], session['instructor'], bike, free, taken) for bike, (free, taken) in self.availability.items()])
+            connection.close()
+        except sqlite3.Error as e:
+            logger.error(f"Unable to save the run history: {e}")
+
+
+def attempt_filters(activity = None, instructor = None, bike = None):
+    '''
+    Build the SQL conditions selecting the attempts of a class, instructor and first-choice bike.
+
+    Parameters:
+        activity (str, optional): Only this class. Defaults to every class.
+        instructor (str, optional): Only this instructor. Defaults to every instructor.
+        bike (str, optional): Only workers starting on this bike. Defaults to every bike.
+
+    Returns:
+        tuple: (list of conditions, list of their parameters).
+    '''
+
+    filters, parameters = [], []
+    for column, value in (('activity', activity), ('instructor', instructor), ('bike', bike)):
+        if value:
+            filters.append(f"{column} = ?")
+            parameters.append(value)
+    return filters, parameters
+
+
+def step_samples(connection, activity = None, instructor = None, bike = None, weeks = 8):
+    '''
+    Collect the time spent in each step, and the WebDriver commands it sent, per week.
+    Only attempts after T0 count, since the pre-warm is off the critical path.
+
+    Parameters:
+        connection (sqlite3.Connection): The run history database.
+        activity (str, optional): Only this class. Defaults to every class.
+        instructor (str, optional): Only this instructor. Defaults to every instructor.
+        bike (str, optional): Only workers starting on this bike. Defaults to every bike.
+        weeks (int, optional): Number of most recent weeks. Defaults to 8.
+
+    Returns:
+        dict: week -> step -> {'seconds': [...], 'commands': [...]}, weeks in order.
+    '''
+
+    filters, parameters = attempt_filters(activity, instructor, bike)
+    where = ''.join(f" AND {condition}" for condition in filters)
+
+    rows = connection.execute(
+        f"SELECT week, step_seconds, commands FROM attempts WHERE attempt > 0{where} "
+        f"AND week IN (SELECT DISTINCT week FROM attempts WHERE attempt > 0{where} ORDER BY week DESC LIMIT ?) ORDER BY week",
+        parameters + parameters + [weeks]).fetchall()
+
+    samples = {}
+    for week, step_seconds, commands in rows:
+        commands = json.loads(commands) if commands else {}
+        for step, seconds in json.loads(step_seconds).items():
+            samples.setdefault(week, {}).setdefault(step, {'seconds': [], 'commands': []})['seconds'].append(seconds)
+        for step, count in commands.items():
+            step = TRACED_STEPS.get(step, step)    # runs recorded before the commands were keyed by booking step
+            samples.setdefault(week, {}).setdefault(step, {'seconds': [], 'commands': []})['commands'].append(count)
+    return samples
+
+
+def regressions(samples, threshold = 0.25, min_delta = 0.1):
+    '''
+    Flag the steps whose latest week is slower than the weeks before it:
+    a p50 or p95 over the median of the previous weeks' by more than 'threshold' (a fraction) and 'min_delta' seconds,
+    or a p50 command count over the previous weeks' median by more than 'threshold'.
+
+    Parameters:
+        samples (dict): Samples from `step_samples`.
+        threshold (float, optional): Relative increase to flag. Defaults to 0.25.
+        min_delta (float, optional): Smallest increase in seconds to flag, so noise on fast steps is not flagged. Defaults to 0.1.
+
+    Returns:
+        list: Descriptions of the regressions, e.g. "select bike p95 1.20s vs 0.80s".
+    '''
+
+    weeks = list(samples)
+    if len(weeks) < 2:
+        return []
+
+    latest, previous = samples[weeks[-1]], [samples[week] for week in weeks[:-1]]
+    flagged = []
+
+    for step, latest_samples in latest.items():
+        for measure, fraction, unit in (('seconds', 0.5, 's'), ('seconds', 0.95, 's'), ('commands', 0.5, ' commands')):
+            current = percentile(latest_samples[measure], fraction)
+            baseline = [percentile(week[step][measure], fraction) for week in previous if step in week and week[step][measure]]
+            if current is None or not baseline:
+                continue
+
+            baseline = statistics.median(baseline)
+            delta = current - baseline
+            if delta > threshold * baseline and (measure == 'commands' or delta > min_delta):
+                flagged.append(f"{step} {measure} p{round(fraction * 100)} {current:.2f}{unit} vs {baseline:.2f}{unit} in {weeks[-2] if len(previous) == 1 else 'previous weeks'}")
+
+    return flagged
+
+
+def report(connection, activity = None, instructor = None, bike = None, weeks = 8, threshold = 0.25):
+    '''
+    Print the p50/p95 latency and p50 WebDriver commands of each step per week, the outcomes per week, and any regressions.
+
+    Parameters:
+        connection (sqlite3.Connection): The run history database.
+        activity (str, optional): Only this class. Defaults to every class.
+        instructor (str, optional): Only this instructor. Defaults to every instructor.
+        bike (str, optional): Only workers starting on this bike. Defaults to every bike.
+        weeks (int, optional): Number of most recent weeks. Defaults to 8.
+        threshold (float, optional): Relative increase flagged as a regression. Defaults to 0.25.
+
+    Returns:
+        None
+    '''
+
+    samples = step_samples(connection, activity, instructor, bike, weeks)
+    if not samples:
+        print("No runs recorded.")
+        return
+
+    print(f"{'week':<10}{'step':<14}{'attempts':>9}{'p50':>9}{'p95':>9}{'commands p50':>14}")
+    for week, steps in samples.items():
+        for step, measured in steps.items():
+            seconds, commands = measured['seconds'], measured['commands']
+            p50 = f"{percentile(seconds, 0.5):.2f}s" if seconds else '-'
+            p95 = f"{percentile(seconds, 0.95):.2f}s" if seconds else '-'
+            print(f"{week:<10}{step:<14}{len(seconds):>9}{p50:>9}{p95:>9}{percentile(commands, 0.5) if commands else '-':>14}")
+
+    filters, parameters = attempt_filters(activity, instructor, bike)
+    where = ''.join(f" AND {condition}" for condition in filters)
+
+    print(f"\n{'week':<10}{'runs':>6}{'booked':>8}{'sold out p50':>14}  outcomes")
+    for week in samples:
+        runs, booked = connection.execute(f"SELECT COUNT(DISTINCT run_id), COUNT(DISTINCT CASE WHEN outcome = ? THEN run_id END) FROM attempts WHERE week = ?{where}",
+                                          ['booked', week] + parameters).fetchone()
+        sold_out = [row[0] for row in connection.execute(f"SELECT MIN(sold_out_after_t0) FROM attempts WHERE week = ?{where} AND sold_out_after_t0 IS NOT NULL GROUP BY run_id",
+                                                         [week] + parameters)]
+        outcomes = connection.execute(f"SELECT outcome, COUNT(*) FROM attempts WHERE week = ?{where} AND attempt > 0 GROUP BY outcome ORDER BY COUNT(*) DESC",
+                                      [week] + parameters).fetchall()
+        sold_out_p50 = f"{statistics.median(sold_out):.1f}s" if sold_out else '-'
+        print(f"{week:<10}{runs:>6}{booked:>8}{sold_out_p50:>14}  {', '.join(f'{outcome} x{count}' for outcome, count in outcomes)}")
+
+    flagged = regressions(samples, threshold)
+    print(f"\nRegressions in {list(samples)[-1]}:{'' if flagged else ' none'}")
+    for regression in flagged:
+        print(f"  - {regression}")
+
+
+def main():
+    '''
+    Command-line entry point: report step latency across weeks and flag regressions.
+
+    Returns:
+        None
+    '''
+
+    with open('config.json', 'r') as file:
+        settings = json.load(file).get('run_history', {})
+
+    parser = argparse.ArgumentParser(description = "Step latency, WebDriver commands and outcomes of past runs, per week.")
+    parser.add_argument('--path', default = settings.get('path', 'logs/history.db'), help = "Run history database. Defaults to 'run_history.path'.")
+    parser.add_argument('--activity', help = "Only this class (e.g. 'CRUCYCLE DUXTON').")
+    parser.add_argument('--instructor', help = "Only this instructor (e.g. 'MARK L.').")
+    parser.add_argument('--bike', help = "Only workers starting on this bike.")
+    parser.add_argument('--weeks', type = int, default = 8, help = "Number of most recent weeks. Defaults to 8.")
+    parser.add_argument('--threshold', type = float, default = settings.get('regression_threshold', 0.25),
+                        help = "Relative increase flagged as a regression. Defaults to 'run_history.regression_threshold'.")
+    args = parser.parse_args()
+
+    connection = connect(args.path)
+    try:
+        report(connection, args.activity, args.instructor, args.bike, args.weeks, args.threshold)
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+import time
+import logging
+from datetime import datetime, timedelta
+from tracing import TRACER
+
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+class BookingScheduler:
+
+    def __init__(self, config, logger = None, cancel_check = None):
+        '''
+        Initialise the BookingScheduler with the given configuration.
+
+        The scheduler computes the exact instant the booking window opens (T0) from
+        'booking_day', 'booking_hour' and 'booking_minute_start' (or takes it from 'booking_opening', if set),
+        then waits for it on the monotonic clock,
+        so wall-clock adjustments (e.g. NTP) while waiting do not shift the trigger.
+
+        Parameters:
+            config (dict): Configuration settings loaded from a JSON file.
+            logger (logging.Logger, optional): Logger object for logging events. Defaults to the root logger.
+            cancel_check (callable, optional): Called before every coarse sleep; raises to abort the wait. Defaults to none.
+        '''
+
+        self.config = config
+        self.logger = logger or logging.getLogger()
+        self.cancel_check = cancel_check
+        self.spin_window = config.get('spin_window_ms', 5) / 1000    # busy-wait the last few milliseconds
+        # Seconds; bounds each coarse sleep, to one poll interval when a cancellation must be noticed promptly
+        self.max_sleep_chunk = config.get('waits', {}).get('poll_interval_ms', 25) / 1000 if cancel_check else 0.5
+        self.opening = None
+        self.opening_monotonic = None
+
+
+    def next_opening(self, now = None):
+        '''
+        Compute the opening instant of the current or next booking window.
+
+        Parameters:
+            now (datetime, optional): The reference time. Defaults to the current local time.
+
+        Returns:
+            datetime: The opening instant. This is in the past if the window is currently open.
+        '''
+
+        now = now or datetime.now()
+
+        # A fixed opening instant, for dry runs against the local stand-in
+        if self.config.get('booking_opening'):
+            return datetime.fromisoformat(self.config['booking_opening'])
+
+        days_ahead = (WEEKDAYS.index(self.config['booking_day']) - now.weekday()) % 7
+        opening = (now + timedelta(days = days_ahead)).replace(hour = self.config['booking_hour'],
+                                                               minute = self.config['booking_minute_start'],
+                                                               second = 0, microsecond = 0)
+        window_end = opening.replace(minute = self.config['booking_minute_end'], second = 59, microsecond = 999999)
+
+        # This week's window has already closed, so target next week's
+        if now > window_end:
+            opening += timedelta(days = 7)
+
+        return opening
+
+
+    def arm(self):
+        '''
+        Compute the next opening instant and anchor it to the monotonic clock.
+        Logs the opening instant.
+
+        Returns:
+            datetime: The opening instant (T0).
+        '''
+
+        now = datetime.now()
+        now_monotonic = time.monotonic()
+
+        self.opening = self.next_opening(now)
+        self.opening_monotonic = now_monotonic + (self.opening - now).total_seconds()
+
+        self.logger.info(f"Booking window opens at {self.opening.strftime('%A, %H:%M:%S')} (T0).")
+        return self.opening
+
+
+    def seconds_until(self, offset = 0):
+        '''
+        Seconds remaining until T0 plus the given offset.
+
+        Parameters:
+            offset (float, optional): Offset from T0 in seconds (negative for before T0). Defaults to 0.
+
+        Returns:
+            float: Seconds remaining; negative if the instant has already passed.
+        '''
+
+        return self.opening_monotonic + offset - time.monotonic()
+
+
+    def wait_until(self, offset = 0, label = 'T0'):
+        '''
+        Block until T0 plus the given offset.
+        Sleeps coarsely until just before the target, then spin-waits the remaining few milliseconds.
+        Logs how late the trigger fired, and traces the trigger as an instant event.
+
+        Parameters:
+            offset (float, optional): Offset from T0 in seconds (negative for before T0). Defaults to 0.
+            label (str, optional): Name of the trigger used in the log. Defaults to 'T0'.
+
+        Returns:
+            float: How late the trigger fired, in milliseconds.
+        '''
+
+        target = self.opening_monotonic + offset
+
+        if time.monotonic() >= target:
+            lateness_ms = (time.monotonic() - target) * 1000
+            self.logger.info(f"Trigger '{label}' fired immediately, {lateness_ms:.1f} ms after its target.")
+            TRACER.instant(label, lateness_ms = lateness_ms)
+            return lateness_ms
+
+        # Coarse sleep until just before the target
+        remaining = target - time.monotonic()
+        while remaining > self.spin_window:
+            if self.cancel_check:
+                self.cancel_check()
+            time.sleep(min(remaining - self.spin_window, self.max_sleep_chunk))
+            remaining = target - time.monotonic()
+
+        # Spin-wait the last few milliseconds
+        while time.monotonic() < target:
+            pass
+
+        lateness_ms = (time.monotonic() - target) * 1000
+        self.logger.info(f"Trigger '{label}' fired {lateness_ms:.3f} ms late.")
+        TRACER.instant(label, lateness_ms = lateness_ms)
+        return lateness_ms
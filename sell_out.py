@@ -0,0 +1,227 @@
+import os
+import json
+import logging
+import argparse
+from run_history import connect, percentile
+
+
+def survival_quantile(observations, quantile):
+    '''
+    Kaplan-Meier estimate of the time by which a fraction of bikes are taken.
+    A bike still seen free at the end of a run only tells that it lasted at least that long (a censored observation),
+    so it lowers the chance of being taken without counting as taken.
+
+    Parameters:
+        observations (list): (seconds after T0, True if the bike was taken then or False if it was last seen free then).
+        quantile (float): Fraction of bikes taken (e.g. 0.5 for the median).
+
+    Returns:
+        float: Seconds after T0, or None if fewer than that fraction were ever seen taken.
+    '''
+
+    at_risk = len(observations)
+    surviving = 1.0
+
+    # Takings before censorings at the same instant, as is conventional
+    for seconds, taken in sorted(observations, key = lambda observation: (observation[0], not observation[1])):
+        if taken:
+            surviving *= 1 - 1 / at_risk
+            if 1 - surviving >= quantile:
+                return seconds
+        at_risk -= 1
+
+    return None
+
+
+class SellOutPredictor:
+
+    def __init__(self, config, logger = None):
+        '''
+        Initialise the predictor of how long each bike of the desired class stays available after T0,
+        from the bike availability in the run history of the same class and instructor.
+
+        Settings ('sell_out'):
+            - 'quantile': the prediction is the time by which the bike was taken in this fraction of weeks.
+            - 'min_weeks': weeks of history needed before the plan departs from one worker per desired bike.
+            - 'tight_seconds': bikes predicted to go within this many seconds are contested and get their own worker.
+            - 'hedge_seconds': a contested bike predicted to go within this many seconds gets up to 'max_hedge' workers,
+              so one slow browser does not lose the race.
+            - 'max_workers': cap on the number of workers.
+            - 'default_reach_seconds': seconds after T0 our bike step completes, until the history has bookings to measure it.
+
+        Parameters:
+            config (dict): Configuration settings loaded from a JSON file.
+            logger (logging.Logger, optional): Logger object for logging events. Defaults to the root logger.
+        '''
+
+        self.config = config
+        self.settings = config.get('sell_out', {})
+        self.logger = logger or logging.getLogger()
+        self.availability = {}    # bike -> week -> [last seen free, first seen taken]
+        self.booked_at = []    # seconds after T0 of every booking
+
+        path = config.get('run_history', {}).get('path', 'logs/history.db')
+        if os.path.exists(path):
+            self.load(path)
+
+
+    def load(self, path):
+        '''
+        Load the availability of the desired class's bikes and the times of our bookings from the run history.
+        Every worker of a week sees the same bikes, so each bike keeps its earliest taking and latest free sighting per week.
+        Bikes booked by our own runs are left out of that week.
+
+        Parameters:
+            path (str): Path of the run history database.
+
+        Returns:
+            None
+        '''
+
+        session = self.config['desired_session']
+        connection = connect(path)
+        try:
+            # A bike our own runs booked that week was not taken by another rider
+            rows = connection.execute(
+                'SELECT bike, week, MAX(last_free_after_t0), MIN(first_taken_after_t0) FROM availability '
+                'WHERE activity = ? AND instructor = ? AND NOT EXISTS (SELECT 1 FROM attempts WHERE attempts.activity = availability.activity '
+                'AND attempts.instructor = availability.instructor AND attempts.week = availability.week '
+                'AND attempts.outcome = ? AND attempts.booked_bike = availability.bike) GROUP BY bike, week',
+                (session['activity'], session['instructor'], 'booked')).fetchall()
+            self.booked_at = [row[0] for row in connection.execute(
+                'SELECT ended_after_t0 FROM attempts WHERE activity = ? AND instructor = ? AND outcome = ? AND ended_after_t0 IS NOT NULL',
+                (session['activity'], session['instructor'], 'booked'))]
+        finally:
+            connection.close()
+
+        for bike, week, last_free, first_taken in rows:
+            self.availability.setdefault(bike, {})[week] = [last_free, first_taken]
+
+
+    def weeks(self):
+        '''
+        Number of weeks of history for the class.
+
+        Returns:
+            int: The number of weeks.
+        '''
+
+        return len({week for weeks in self.availability.values() for week in weeks})
+
+
+    def predict(self, bike):
+        '''
+        Predict how many seconds after T0 a bike is taken.
+
+        Parameters:
+            bike (str): The bike.
+
+        Returns:
+            float: Seconds after T0, or None if the bike was not taken often enough in the history to tell
+                   (it stays available, as far as is known).
+        '''
+
+        observations = []
+        for last_free, first_taken in self.availability.get(bike, {}).values():
+            if first_taken is not None:
+                observations.append((first_taken, True))
+            elif last_free is not None:
+                observations.append((last_free, False))
+
+        return survival_quantile(observations, self.settings.get('quantile', 0.5))
+
+
+    def reach_seconds(self):
+        '''
+        Seconds after T0 by which our workers book, from the history: the p95, to be safe.
+
+        Returns:
+            float: Seconds after T0.
+        '''
+
+        return percentile(self.booked_at, 0.95) or self.settings.get('default_reach_seconds', 3)
+
+
+    def plan(self, desired_bikes):
+        '''
+        Decide the workers to start and the bikes each one tries, in order of priority.
+
+        Without enough history (or with 'sell_out.enabled' unset) every desired bike gets one worker, as before.
+        Otherwise:
+            - Bikes predicted to go before our workers can reach them are tried last.
+            - Contested bikes (predicted within 'tight_seconds') come first, soonest to go first; the others keep the configured order.
+            - Each contested bike gets a worker, and the soonest to go gets up to 'max_hedge' if it goes within 'hedge_seconds'.
+              If no bike is contested, a single worker tries them all, saving the other browsers.
+
+        Parameters:
+            desired_bikes (list): The configured bikes, in order of priority.
+
+        Returns:
+            list: (worker name, bikes to be selected in order of priority) of every worker.
+        '''
+
+        default = [(bike, [bike] + [other for other in desired_bikes if other != bike]) for bike in desired_bikes]
+        weeks = self.weeks()
+        if not self.settings.get('enabled') or weeks < self.settings.get('min_weeks', 3):
+            self.logger.info(f"Sell-out prediction off or {weeks} weeks of history: one worker per desired bike.")
+            return default
+
+        reach = self.reach_seconds()
+        tight = self.settings.get('tight_seconds', 60)
+        predicted = {bike: self.predict(bike) for bike in desired_bikes}
+
+        hopeless = [bike for bike in desired_bikes if predicted[bike] is not None and predicted[bike] < reach]
+        contested = sorted((bike for bike in desired_bikes if bike not in hopeless and predicted[bike] is not None and predicted[bike] < tight),
+                           key = lambda bike: predicted[bike])
+        relaxed = [bike for bike in desired_bikes if bike not in hopeless and bike not in contested]
+        order = contested + relaxed + hopeless
+
+        # One worker per contested bike (or one for all), each trying its bike first, then the others in order
+        firsts = contested or order[:1]
+        hedge = 1
+        if contested and predicted[contested[0]] < self.settings.get('hedge_seconds', 10):
+            hedge = self.settings.get('max_hedge', 2)
+        firsts = [firsts[0]] * hedge + firsts[1:]
+        firsts = firsts[:max(1, self.settings.get('max_workers', 4))]
+
+        workers, starts = [], {}
+        for bike in firsts:
+            starts[bike] = starts.get(bike, 0) + 1
+            name = bike if starts[bike] == 1 else f"{bike}-hedge{starts[bike] - 1}"
+            workers.append((name, [bike] + [other for other in order if other != bike]))
+
+        forecast = ', '.join(f"{bike} {predicted[bike]:.1f}s" if predicted[bike] is not None else f"{bike} open" for bike in desired_bikes)
+        self.logger.info(f"Predicted sell-out over {weeks} weeks: {forecast}; we book by {reach:.1f}s. "
+                         f"Bike order {' > '.join(order)}; workers {', '.join(worker for worker, _ in workers)}.")
+        return workers
+
+
+def main():
+    '''
+    Command-line entry point: print the predicted sell-out of each desired bike and the workers the bot would start.
+
+    Returns:
+        None
+    '''
+
+    parser = argparse.ArgumentParser(description = "Predicted sell-out of the desired bikes, and the workers the bot would start.")
+    parser.add_argument('--config', default = 'config.json')
+    args = parser.parse_args()
+
+    with open(args.config, 'r') as file:
+        config = json.load(file)
+    config['sell_out'] = dict(config.get('sell_out', {}), enabled = True)
+
+    predictor = SellOutPredictor(config)
+    print(f"{predictor.weeks()} weeks of history for {config['desired_session']['activity']} with {config['desired_session']['instructor']}")
+    for bike in sorted(predictor.availability, key = lambda bike: (len(bike), bike)):
+        seconds = predictor.predict(bike)
+        print(f"{bike:<6}{f'{seconds:.1f}s' if seconds is not None else 'stays open':>12}")
+
+    print(f"\nWe book by {predictor.reach_seconds():.1f}s after T0 (p95).")
+    for worker, bikes in predictor.plan(config['desired_bikes']):
+        print(f"Worker {worker}: {' > '.join(bikes)}")
+
+
+if __name__ == "__main__":
+    main()
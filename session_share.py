@@ -0,0 +1,176 @@
+import json
+import time
+import logging
+import threading
+from selenium.webdriver.common.by import By
+
+# Runs before any page script, in every frame, and restores the captured web storage for that frame's origin
+STORAGE_RESTORE_SCRIPT = '''
+(function(storage) {
+    var state = storage[window.location.origin];
+    if (!state) return;
+    Object.keys(state.local).forEach(function(key) { window.localStorage.setItem(key, state.local[key]); });
+    Object.keys(state.session).forEach(function(key) { window.sessionStorage.setItem(key, state.session[key]); });
+})(%s);
+'''
+
+CAPTURE_STORAGE_SCRIPT = '''
+return {
+    origin: window.location.origin,
+    local: Object.assign({}, window.localStorage),
+    session: Object.assign({}, window.sessionStorage)
+};
+'''
+
+
+def _capture_context(driver):
+    '''
+    Capture the cookies and web storage visible to the current browsing context.
+
+    Parameters:
+        driver (selenium.webdriver.Chrome): The driver, switched to the context to capture.
+
+    Returns:
+        dict: The context's origin, localStorage, sessionStorage and cookies.
+    '''
+
+    state = driver.execute_script(CAPTURE_STORAGE_SCRIPT)
+    state['cookies'] = driver.get_cookies()
+    return state
+
+
+def capture_session(driver):
+    '''
+    Capture the authenticated session of a logged-in driver: cookies and web storage of the top-level page and every iframe.
+    The driver is left switched to the top-level page.
+
+    Parameters:
+        driver (selenium.webdriver.Chrome): The logged-in driver.
+
+    Returns:
+        list: One captured state per browsing context.
+    '''
+
+    driver.switch_to.default_content()
+    snapshot = [_capture_context(driver)]
+
+    for iframe in driver.find_elements(By.TAG_NAME, "iframe"):
+        driver.switch_to.frame(iframe)
+        snapshot.append(_capture_context(driver))
+        driver.switch_to.default_content()
+
+    return snapshot
+
+
+def inject_session(driver, snapshot):
+    '''
+    Inject a captured session into another driver before it navigates.
+    Cookies are set through CDP for their own domains, so no navigation is needed.
+    Web storage is restored by a script that runs on every new document, before the page's own scripts.
+
+    Parameters:
+        driver (selenium.webdriver.Chrome): The driver to inject into.
+        snapshot (list): The session captured by `capture_session`.
+
+    Returns:
+        str: Identifier of the storage restore script, for `Page.removeScriptToEvaluateOnNewDocument`.
+    '''
+
+    storage = {}
+    for context in snapshot:
+        storage[context['origin']] = {'local': context['local'], 'session': context['session']}
+
+        for cookie in context['cookies']:
+            params = {key: cookie[key] for key in ('name', 'value', 'domain', 'path', 'secure', 'httpOnly', 'sameSite') if key in cookie}
+            if 'expiry' in cookie:
+                params['expires'] = cookie['expiry']
+            driver.execute_cdp_cmd('Network.setCookie', params)
+
+    script = driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {'source': STORAGE_RESTORE_SCRIPT % json.dumps(storage)})
+    return script['identifier']
+
+
+class SharedLogin:
+
+    def __init__(self, config, logger = None):
+        '''
+        Initialise a login session shared by all bike workers.
+
+        The first worker to log in becomes the leader: it signs in through the form and publishes its session.
+        Every other worker waits for the published session and injects it into its own driver instead of signing in.
+
+        Parameters:
+            config (dict): Configuration settings loaded from a JSON file.
+            logger (logging.Logger, optional): Logger object for logging events. Defaults to the root logger.
+        '''
+
+        self.logger = logger or logging.getLogger()
+        self.timeout = config.get('shared_login_timeout', 30)
+        self.poll_interval = config.get('waits', {}).get('poll_interval_ms', 25) / 1000
+        self.snapshot = None
+
+        self._leader_claimed = False
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+
+
+    def claim_leadership(self):
+        '''
+        Claim the leader role. Only the first caller succeeds.
+
+        Returns:
+            bool: True if the caller is the leader, False otherwise.
+        '''
+
+        with self._lock:
+            if self._leader_claimed:
+                return False
+            self._leader_claimed = True
+            return True
+
+
+    def publish(self, snapshot):
+        '''
+        Publish the leader's authenticated session to the followers.
+
+        Parameters:
+            snapshot (list): The session captured by `capture_session`.
+
+        Returns:
+            None
+        '''
+
+        self.snapshot = snapshot
+        self._ready.set()
+        self.logger.info("Published the shared login session.")
+
+
+    def abandon(self):
+        '''
+        Release waiting followers without a session, so they fall back to a full login.
+
+        Returns:
+            None
+        '''
+
+        self._ready.set()
+
+
+    def wait(self, cancel_check = None):
+        '''
+        Wait for the leader to publish its session.
+
+        Parameters:
+            cancel_check (callable, optional): Called on every poll; raises to abort the wait. Defaults to none.
+
+        Returns:
+            list: The published session, or None if the leader failed or timed out.
+        '''
+
+        deadline = time.monotonic() + self.timeout
+        while not self._ready.wait(max(0, min(self.poll_interval, deadline - time.monotonic()))):
+            if cancel_check:
+                cancel_check()
+            if time.monotonic() >= deadline:
+                break
+        return self.snapshot
@@ -0,0 +1,513 @@
+import copy
+import json
+import math
+import time
+import heapq
+import random
+import argparse
+import itertools
+import statistics
+from mock_cru import sample_latency_ms
+from coordinator import BookingCancelled
+from run_history import TRACED_STEPS, percentile
+
+# Booking steps, in the order BookingBot runs them; pre-warm phases run 'start_driver', 'login' and 'location'
+STEPS = ['login', 'location', 'session', 'bike', 'series']
+
+
+
+class StepModel:
+
+    def __init__(self, settings, durations = None):
+        '''
+        Initialise the latency and failure model of the booking steps.
+
+        Latency ('simulator.step_latency_ms'): step -> {'distribution', 'mean', 'jitter'} in milliseconds, as in
+        'mock_site.latency_ms'. 'session_check' is the cost of checking whether a session is still valid between attempts.
+        Steps with measured durations (e.g. from a trace) are resampled from those instead.
+
+        Failures: each step fails with its 'failure_chance', plus the 'load_spike' extra chance after T0,
+        which decays exponentially with 'decay_s' as the opening rush passes.
+
+        Parameters:
+            settings (dict): The 'simulator' configuration.
+            durations (dict, optional): step -> list of measured durations in seconds. Defaults to none.
+        '''
+
+        self.latency = settings.get('step_latency_ms', {})
+        self.failure_chance = settings.get('failure_chance', {})
+        self.spike = settings.get('load_spike', {})
+        self.durations = {step: values for step, values in (durations or {}).items() if values}
+
+
+    def seconds(self, step, rng):
+        '''
+        Draw the duration of a step.
+
+        Parameters:
+            step (str): The step.
+            rng (random.Random): Random number generator to draw with.
+
+        Returns:
+            float: Duration in seconds.
+        '''
+
+        if step in self.durations:
+            return rng.choice(self.durations[step])
+        latency = self.latency.get(step) or self.latency.get('default')
+        return max(0, sample_latency_ms(latency, rng)) / 1000 if latency else 0
+
+
+    def fails(self, step, now, rng):
+        '''
+        Draw whether a step fails.
+
+        Parameters:
+            step (str): The step.
+            now (float): Seconds since T0 when the step ends.
+            rng (random.Random): Random number generator to draw with.
+
+        Returns:
+            bool: True if the step fails, False otherwise.
+        '''
+
+        chance = self.failure_chance.get(step, 0)
+        if now >= 0 and self.spike.get('extra_failure_chance'):
+            chance += self.spike['extra_failure_chance'] * math.exp(-now / self.spike.get('decay_s', 1))
+        return rng.random() < chance
+
+
+def load_trace_durations(path):
+    '''
+    Collect the measured duration of every booking step from a trace exported by `tracing.Tracer`.
+
+    Parameters:
+        path (str): Path of the trace file (e.g. 'logs/trace.json').
+
+    Returns:
+        dict: step -> list of durations in seconds.
+    '''
+
+    with open(path, 'r') as file:
+        events = json.load(file).get('traceEvents', [])
+
+    durations = {}
+    for event in events:
+        step = TRACED_STEPS.get(event.get('name'))
+        if step and event.get('ph') == 'X' and event.get('cat') == 'step':
+            durations.setdefault(step, []).append(event['dur'] / 1e6)
+    return durations
+
+
+class Simulation:
+
+    def __init__(self, config, model, settings, seed):
+        '''
+        Initialise one simulated booking window: our workers, as `bot_runner` starts them (one per desired bike,
+        sharing a first-success coordinator), and rival riders taking bikes after T0 until the class sells out.
+        Time is in seconds relative to T0.
+
+        Rivals ('simulator.rivals'): {'count', 'arrival_ms', 'desired_chance'}. Each rival arrives after T0 at a time drawn
+        from 'arrival_ms' and takes a free bike: one of our desired bikes with 'desired_chance', otherwise any free bike.
+        The class has 'simulator.bikes' bikes (B1 to B<n>).
+
+        Parameters:
+            config (dict): The configuration to simulate (the booking settings of config.json).
+            model (StepModel): Latency and failure model of the steps.
+            settings (dict): The 'simulator' configuration.
+            seed (int): Seed of this window. Rivals are drawn from it alone, so every configuration faces the same rivals.
+        '''
+
+        self.config = config
+        self.model = model
+        self.now = -max(config.get('prewarm_offsets', {}).values(), default = 0)
+        self.session_timeout = settings.get('session_idle_timeout_s')
+        self.seats = {f"B{number}": None for number in range(1, settings.get('bikes', 20) + 1)}
+        self.booked = None    # (bike, seconds after T0) of our booking
+        self.series_held = False
+        self.sold_out_at = None
+
+        self._queue = []
+        self._sequence = itertools.count()
+
+        rivals = settings.get('rivals', {})
+        rival_rng = random.Random(seed)
+        for number in range(rivals.get('count', 0)):
+            arrival = max(0, sample_latency_ms(rivals.get('arrival_ms', {}), rival_rng)) / 1000
+            self.start(self.rival(f"rival {number}", arrival, rivals.get('desired_chance', 0), rival_rng), 0)
+
+        self.rng = random.Random(seed * 7919 + 1)
+        for bike in config['desired_bikes']:
+            self.start(self.worker([bike] + [other for other in config['desired_bikes'] if other != bike]), self.now)
+
+
+    def start(self, process, at):
+        '''
+        Schedule a process (a generator yielding the seconds it waits) to start at an instant.
+
+        Parameters:
+            process (generator): The process.
+            at (float): Seconds after T0.
+
+        Returns:
+            None
+        '''
+
+        heapq.heappush(self._queue, (at, next(self._sequence), process))
+
+
+    def run(self):
+        '''
+        Run every process to completion.
+
+        Returns:
+            tuple: (booked bike or None, seconds after T0 of the booking or None, seconds after T0 the class sold out or None).
+        '''
+
+        while self._queue:
+            self.now, _, process = heapq.heappop(self._queue)
+            try:
+                wait = next(process)
+            except StopIteration:
+                continue
+            heapq.heappush(self._queue, (self.now + max(0, wait), next(self._sequence), process))
+
+        bike, booked_at = self.booked or (None, None)
+        return bike, booked_at, self.sold_out_at
+
+
+    def take(self, bike, holder):
+        '''
+        Atomically take a free bike.
+
+        Parameters:
+            bike (str): The bike.
+            holder (str): Who takes it.
+
+        Returns:
+            bool: True if the bike was free, False otherwise.
+        '''
+
+        if self.seats.get(bike, holder) is not None:
+            return False
+        self.seats[bike] = holder
+        if self.sold_out_at is None and all(self.seats.values()):
+            self.sold_out_at = self.now
+        return True
+
+
+    def rival(self, name, arrival, desired_chance, rng):
+        '''
+        A rival rider taking one free bike when they arrive, 'arrival' seconds after T0.
+        '''
+
+        yield arrival
+        free = [bike for bike, holder in self.seats.items() if holder is None]
+        desired = [bike for bike in self.config['desired_bikes'] if bike in free]
+        if free:
+            self.take(rng.choice(desired) if desired and rng.random() < desired_chance else rng.choice(free), name)
+
+
+    def wait_until(self, offset):
+        '''
+        Wait until T0 plus an offset, as BookingScheduler.wait_until does; returns immediately if it has passed.
+        '''
+
+        yield max(0, offset - self.now)
+
+
+    def pause(self, seconds):
+        '''
+        Sleep between retries, then stop if another of our workers has booked.
+        (The coordinator wakes the worker up as soon as that happens, which makes no difference to the outcome.)
+        '''
+
+        yield seconds
+        self.check()
+
+
+    def check(self):
+        if self.booked:
+            raise BookingCancelled()
+
+
+    def step(self, step, state, desired_bikes):
+        '''
+        Run a booking step once, as BookingBot.run_step does. Yields the time it takes.
+
+        Returns:
+            bool: True if the step succeeded, False otherwise.
+        '''
+
+        rng = self.rng
+        started = self.now
+
+        # The seat map is read when the step starts; the bike can be taken by the time it is clicked
+        free_at_start = [bike for bike in desired_bikes if self.seats.get(bike) is None] if step == 'bike' else None
+
+        if step == 'series':
+            # Hold the booking slot, waiting up to the lag for another worker's series selection
+            deadline = self.now + self.config['default_lag']
+            while self.series_held and self.now < deadline:
+                yield 0.05
+                self.check()
+            if self.series_held:
+                return False
+            self.series_held = True
+
+        yield self.model.seconds(step, rng)
+        failed = self.model.fails(step, self.now, rng)
+
+        if step == 'login':
+            if not failed:
+                state['login_at'] = self.now
+            return not failed
+
+        expired = state.get('login_at') is None or (self.session_timeout and started - state['login_at'] > self.session_timeout)
+        if expired:
+            if step == 'series':
+                # The slot and the bike are given back, as after a failed series selection
+                self.series_held = False
+                self.seats[state['bike']] = None
+            return False
+
+        if step == 'bike':
+            state['bike'] = None
+            if failed:
+                return False
+            for bike in free_at_start:
+                if self.take(bike, 'us'):
+                    state['bike'] = bike
+                    return True
+            return False
+
+        if step == 'series':
+            self.series_held = False
+            if failed:
+                # A failed series selection gives the bike back
+                self.seats[state['bike']] = None
+                return False
+            self.check()
+            self.booked = (state['bike'], self.now)
+            return True
+
+        return not failed
+
+
+    def attempt_step(self, step, state, desired_bikes):
+        '''
+        Run a booking step with its retry budget and exponential backoff, as BookingBot.attempt_step does.
+        '''
+
+        retries = self.config.get('step_retries', {}).get(step, 0)
+        backoff = self.config.get('step_backoff', 0.25)
+
+        for retry in range(retries + 1):
+            if retry:
+                yield from self.pause(backoff * 2 ** (retry - 1))
+            if (yield from self.step(step, state, desired_bikes)):
+                return True
+        return False
+
+
+    def worker(self, desired_bikes):
+        '''
+        One of our workers, following BookingBot.run: the pre-warm phases at their offsets, then the booking state machine from T0.
+        '''
+
+        try:
+            yield from self.book(desired_bikes)
+        except BookingCancelled:
+            return
+
+
+    def book(self, desired_bikes):
+        offsets = self.config.get('prewarm_offsets', {})
+        state = {}
+        prewarmed = True
+
+        # Pre-warm: start the driver, log in, open the location schedule
+        yield from self.wait_until(-offsets.get('start_driver', 0))
+        yield self.model.seconds('start_driver', self.rng)
+        for phase, step in (('login', 'login'), ('open_schedule', 'location')):
+            yield from self.wait_until(-offsets.get(phase, 0))
+            if not (yield from self.step(step, state, desired_bikes)):
+                prewarmed = False
+                state = {}
+                break
+
+        yield from self.wait_until(0)
+
+        if not prewarmed:
+            yield self.model.seconds('start_driver', self.rng)
+        index = STEPS.index('session') if prewarmed else 0
+        attempt = 1
+
+        while True:
+            self.check()
+            step = STEPS[index]
+
+            if (yield from self.attempt_step(step, state, desired_bikes)):
+                if step == STEPS[-1]:
+                    return
+                index += 1
+                continue
+
+            attempt += 1
+            if attempt > self.config['max_tries']:
+                return
+            yield from self.pause(self.config['default_lag'])
+
+            # Resume from the previous step if the session is still valid, otherwise restart from login with a new driver
+            yield self.model.seconds('session_check', self.rng)
+            login_at = state.get('login_at')
+            if login_at is not None and not (self.session_timeout and self.now - login_at > self.session_timeout):
+                index = min(max(index - 1, STEPS.index('location')), STEPS.index('session'))
+            else:
+                yield self.model.seconds('start_driver', self.rng)
+                state = {}
+                index = 0
+
+
+def set_path(config, path, value):
+    '''
+    Set a configuration value by its dotted path (e.g. 'prewarm_offsets.login').
+
+    Parameters:
+        config (dict): The configuration.
+        path (str): Dotted path of the value.
+        value: The value.
+
+    Returns:
+        None
+    '''
+
+    *parents, key = path.split('.')
+    for parent in parents:
+        config = config.setdefault(parent, {})
+    config[key] = value
+
+
+def evaluate(config, model, settings, trials, seed = 0):
+    '''
+    Simulate a configuration over a number of booking windows.
+
+    Parameters:
+        config (dict): The configuration to simulate.
+        model (StepModel): Latency and failure model of the steps.
+        settings (dict): The 'simulator' configuration.
+        trials (int): Number of booking windows.
+        seed (int, optional): Seed of the first window. Defaults to 0.
+
+    Returns:
+        dict: 'booked' (fraction of windows with a booking), 'p50' and 'p95' (seconds after T0 of the bookings, or None),
+              and 'sold_out_p50' (seconds after T0 the class sold out, or None).
+    '''
+
+    booked_at, sold_out = [], []
+    for trial in range(trials):
+        _, seconds, sold_out_at = Simulation(config, model, settings, seed + trial).run()
+        if seconds is not None:
+            booked_at.append(seconds)
+        if sold_out_at is not None:
+            sold_out.append(sold_out_at)
+
+    return {
+        'booked': len(booked_at) / trials,
+        'p50': statistics.median(booked_at) if booked_at else None,
+        'p95': percentile(booked_at, 0.95),
+        'sold_out_p50': statistics.median(sold_out) if sold_out else None,
+    }
+
+
+def sweep(config, model, settings, trials, seed = 0):
+    '''
+    Simulate every combination of the values in 'simulator.sweep' (dotted path -> list of values).
+    Every combination faces the same booking windows, so differences come from the configuration, not the draw.
+    Combinations that would open the schedule before logging in are skipped.
+
+    Parameters:
+        config (dict): The base configuration.
+        model (StepModel): Latency and failure model of the steps.
+        settings (dict): The 'simulator' configuration.
+        trials (int): Number of booking windows per combination.
+        seed (int, optional): Seed of the first window. Defaults to 0.
+
+    Returns:
+        list: (values by path, result of `evaluate`) of every combination, best first: highest booking probability,
+              then earliest median booking, then fewest changes from the base configuration.
+    '''
+
+    grid = settings.get('sweep', {})
+    paths = list(grid)
+    results = []
+
+    def get_path(path):
+        value = config
+        for key in path.split('.'):
+            value = value.get(key) if isinstance(value, dict) else None
+        return value
+
+    for values in itertools.product(*(grid[path] for path in paths)):
+        candidate = copy.deepcopy(config)
+        for path, value in zip(paths, values):
+            set_path(candidate, path, value)
+        offsets = candidate.get('prewarm_offsets', {})
+        if offsets.get('open_schedule', 0) > offsets.get('login', 0):
+            continue
+        results.append((dict(zip(paths, values)), evaluate(candidate, model, settings, trials, seed)))
+
+    results.sort(key = lambda result: (-result[1]['booked'], result[1]['p50'] if result[1]['p50'] is not None else math.inf,
+                                       sum(value != get_path(path) for path, value in result[0].items())))
+    return results
+
+
+def main():
+    '''
+    Command-line entry point: sweep the configurations in 'simulator.sweep' and recommend config.json values.
+
+    Returns:
+        None
+    '''
+
+    parser = argparse.ArgumentParser(description = "Discrete-event simulation of the booking window, to tune the pre-warm offsets and retry timing.")
+    parser.add_argument('--config', default = 'config.json')
+    parser.add_argument('--trials', type = int, help = "Booking windows per configuration. Defaults to 'simulator.trials'.")
+    parser.add_argument('--trace', help = "Resample step durations from a trace exported by the bot (e.g. logs/trace.json).")
+    parser.add_argument('--top', type = int, default = 10, help = "Number of configurations to list. Defaults to 10.")
+    parser.add_argument('--seed', type = int, default = 0)
+    args = parser.parse_args()
+
+    with open(args.config, 'r') as file:
+        config = json.load(file)
+    settings = config.get('simulator', {})
+    trials = args.trials or settings.get('trials', 200)
+    model = StepModel(settings, load_trace_durations(args.trace) if args.trace else None)
+
+    started = time.perf_counter()
+    current = evaluate(config, model, settings, trials, args.seed)
+    results = sweep(config, model, settings, trials, args.seed)
+    elapsed = time.perf_counter() - started
+
+    windows = (len(results) + 1) * trials
+    print(f"Simulated {len(results)} configurations x {trials} booking windows in {elapsed:.1f}s ({windows / elapsed:.0f} windows/s).")
+    if current['sold_out_p50'] is not None:
+        print(f"The class sells out {current['sold_out_p50']:.1f}s after T0 (median).")
+
+    def describe(result):
+        p50 = f"{result['p50']:.2f}s" if result['p50'] is not None else '-'
+        p95 = f"{result['p95']:.2f}s" if result['p95'] is not None else '-'
+        return f"booked {result['booked']:>6.1%}  T0->booked p50 {p50:>7}  p95 {p95:>7}"
+
+    print(f"\nCurrent config: {describe(current)}\n")
+    for values, result in results[:args.top]:
+        print(f"{describe(result)}  {', '.join(f'{path}={value}' for path, value in values.items())}")
+
+    recommended = {}
+    for path, value in results[0][0].items():
+        set_path(recommended, path, value)
+    print(f"\nRecommended config.json values:\n{json.dumps(recommended, indent = 4)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from selenium.webdriver.remote.command import Command
+from selenium.webdriver.remote.switch_to import SwitchTo
+from selenium.common.exceptions import WebDriverException
+from driver_pool import launch_chrome, block_urls
+
+
+class TabScheduler:
+
+    def __init__(self):
+        '''
+        Initialise the scheduler that interleaves the WebDriver commands of every tab of one browser.
+
+        A WebDriver session runs one command at a time, against its current window and frame.
+        Each command takes a turn in first-come, first-served order, so a tab polling a wait cannot starve the others.
+        Before a tab's command runs, the scheduler switches the session to that tab's window and re-enters its frames.
+        '''
+
+        self.current = None    # tab the session is switched to
+        self.switches = 0
+        self.queued_seconds = 0
+
+        self._condition = threading.Condition()
+        self._next_ticket = 0
+        self._serving = 0
+
+
+    @contextmanager
+    def turn(self):
+        '''
+        Wait for the session to be free, in order of arrival, and hold it for the duration of the block.
+
+        Returns:
+            contextlib.AbstractContextManager: The turn.
+        '''
+
+        started = time.perf_counter()
+        with self._condition:
+            ticket = self._next_ticket
+            self._next_ticket += 1
+            self._condition.wait_for(lambda: self._serving == ticket)
+            self.queued_seconds += time.perf_counter() - started
+
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._serving += 1
+                self._condition.notify_all()
+
+
+    def enter(self, tab):
+        '''
+        Switch the session to a tab's window and frames, if it is not already there. Must be called during a turn.
+
+        Parameters:
+            tab (TabDriver): The tab.
+
+        Returns:
+            None
+        '''
+
+        if self.current is tab:
+            return
+
+        tab.execute_directly(Command.SWITCH_TO_WINDOW, {'handle': tab.handle})
+        for frame in tab.frames:
+            tab.execute_directly(Command.SWITCH_TO_FRAME, frame)
+        self.current = tab
+        self.switches += 1
+
+
+    def run(self, tab, driver_command, params):
+        '''
+        Run a tab's command in its turn, keeping track of the frame the tab is in.
+
+        Parameters:
+            tab (TabDriver): The tab sending the command.
+            driver_command (str): The WebDriver command.
+            params (dict): The command's parameters.
+
+        Returns:
+            dict: The command's response.
+        '''
+
+        with self.turn():
+            self.enter(tab)
+            response = tab.execute_directly(driver_command, params)
+
+            if driver_command == Command.SWITCH_TO_FRAME:
+                if params.get('id') is None:
+                    tab.frames = []
+                else:
+                    tab.frames.append(params)
+            elif driver_command == Command.SWITCH_TO_PARENT_FRAME:
+                tab.frames = tab.frames[:-1]
+
+            return response
+
+
+class TabDriver:
+    '''
+    Mixin for a WebDriver that sends every command through a TabScheduler, as one tab of a shared browser.
+    Elements found through a tab send their commands through the tab too.
+    '''
+
+    def execute(self, driver_command, params = None):
+        return self.tab_scheduler.run(self, driver_command, params or {})
+
+
+    def execute_directly(self, driver_command, params = None):
+        return super().execute(driver_command, params)
+
+
+def tab_driver(driver, handle, scheduler):
+    '''
+    Create a tab view of a driver: a driver of the same class, on the same WebDriver session, bound to one window.
+
+    Parameters:
+        driver (selenium.webdriver.Chrome): The browser's driver.
+        handle (str): The window handle of the tab.
+        scheduler (TabScheduler): The browser's scheduler.
+
+    Returns:
+        TabDriver: The tab's driver.
+    '''
+
+    tab = object.__new__(type(f"Tab{type(driver).__name__}", (TabDriver, type(driver)), {}))
+    tab.__dict__.update(driver.__dict__)
+    tab._switch_to = SwitchTo(tab)
+    tab.handle = handle
+    tab.frames = []    # parameters of the frame switches from the top-level document to the tab's current frame
+    tab.tab_scheduler = scheduler
+    return tab
+
+
+class TabBrowser:
+
+    def __init__(self, config, logger = None, user_data_dir = None):
+        '''
+        Initialise a single Chrome browser whose tabs are handed out to the bike workers, instead of one browser per bike.
+        Tabs share the browser's cookies, so one login serves every bike.
+
+        It has the same `acquire` and `release` interface as the DriverPool, so a BookingBot takes it as its driver pool.
+        Page loads still hold the session until the page is loaded, which the lean profile's eager loading keeps short.
+
+        Parameters:
+            config (dict): Configuration settings loaded from a JSON file.
+            logger (logging.Logger, optional): Logger object for logging events. Defaults to the root logger.
+            user_data_dir (str, optional): Persistent profile directory for the browser. Defaults to a temporary profile.
+        '''
+
+        self.config = config
+        self.logger = logger or logging.getLogger()
+        self.user_data_dir = user_data_dir
+        self.driver = None
+        self.scheduler = TabScheduler()
+        self._lock = threading.Lock()
+
+
+    def start(self):
+        '''
+        Launch the browser. Its first window stays open, so closing the last bike's tab does not end the session.
+
+        Returns:
+            None
+        '''
+
+        with self._lock:
+            if not self.driver:
+                self.driver = launch_chrome(self.config, self.user_data_dir)
+                self.logger.info("Started the shared Chrome browser for tabs.")
+
+
+    def acquire(self, timeout = None):
+        '''
+        Open a new tab, with the lean profile's URLs blocked in it too.
+
+        Parameters:
+            timeout (float, optional): Unused; tabs are opened immediately.
+
+        Returns:
+            TabDriver: The tab's driver.
+        '''
+
+        self.start()
+        with self.scheduler.turn():
+            handle = self.driver.execute(Command.NEW_WINDOW, {'type': 'tab'})['value']['handle']
+        tab = tab_driver(self.driver, handle, self.scheduler)
+
+        # Sent through the tab, so the scheduler switches the session to it first
+        if self.config.get('browser_profile') == 'lean':
+            block_urls(tab, self.config)
+        return tab
+
+
+    def release(self, tab):
+        '''
+        Close a tab.
+
+        Parameters:
+            tab (TabDriver): The tab's driver.
+
+        Returns:
+            None
+        '''
+
+        with self.scheduler.turn():
+            try:
+                self.scheduler.enter(tab)
+                tab.execute_directly(Command.CLOSE)
+            except WebDriverException as e:
+                self.logger.info(f"Error closing a tab: {e}")
+            self.scheduler.current = None
+
+
+    def close(self):
+        '''
+        Quit the browser.
+
+        Returns:
+            None
+        '''
+
+        with self._lock:
+            if self.driver:
+                self.logger.info(f"Closing the shared Chrome browser after {self.scheduler.switches} tab switches "
+                                 f"and {self.scheduler.queued_seconds:.2f}s of commands queued behind other tabs.")
+                try:
+                    self.driver.quit()
+                except WebDriverException:
+                    pass
+                self.driver = None
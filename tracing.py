@@ -0,0 +1,218 @@
+import os
+import json
+import time
+import functools
+import threading
+from contextlib import contextmanager
+
+
+class Tracer:
+
+    def __init__(self):
+        '''
+        Initialise a thread-safe recorder of timed spans, exported in the Chrome trace event format
+        (loadable in chrome://tracing or https://ui.perfetto.dev).
+
+        Every span is tagged with the tags set on its thread (e.g. bike and attempt) and the thread's name.
+        Recording is off until `enable` is called, so spans cost next to nothing in normal runs.
+        The step each thread is in is tracked either way (see `current_step`).
+        '''
+
+        self.enabled = False
+        self.origin = time.perf_counter()
+        self.events = []
+
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._named_threads = set()
+
+
+    def enable(self):
+        '''
+        Start recording spans.
+
+        Returns:
+            None
+        '''
+
+        self.enabled = True
+
+
+    def tag(self, **tags):
+        '''
+        Set tags on every span the calling thread records from now on.
+
+        Parameters:
+            **tags: Tag names and values (e.g. bike = 'B3', attempt = 2).
+
+        Returns:
+            None
+        '''
+
+        self._local.tags = dict(getattr(self._local, 'tags', {}), **tags)
+
+
+    def current_step(self):
+        '''
+        Find the innermost 'step' span the calling thread is in.
+
+        Returns:
+            str: Name of the step, or None outside of any step.
+        '''
+
+        steps = getattr(self._local, 'steps', None)
+        return steps[-1] if steps else None
+
+
+    def _event(self, name, category, phase, started, **args):
+        '''
+        Build a trace event on the calling thread, naming the thread in the trace the first time it records one.
+
+        Parameters:
+            name (str): Name of the event.
+            category (str): Category of the event (e.g. 'step' or 'wait').
+            phase (str): Trace event phase ('X' for a complete span, 'i' for an instant).
+            started (float): `time.perf_counter()` at the start of the event.
+            **args: Extra arguments shown with the event.
+
+        Returns:
+            dict: The event, not yet recorded.
+        '''
+
+        thread = threading.current_thread()
+        tid = threading.get_ident()
+
+        if tid not in self._named_threads:
+            self._named_threads.add(tid)
+            self.events.append({'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(), 'tid': tid, 'args': {'name': thread.name}})
+
+        return {
+            'name': name,
+            'cat': category,
+            'ph': phase,
+            'ts': (started - self.origin) * 1e6,
+            'pid': os.getpid(),
+            'tid': tid,
+            'args': dict(getattr(self._local, 'tags', {}), thread = thread.name, **args),
+        }
+
+
+    def complete(self, name, category, started, ended = None, **args):
+        '''
+        Record a span that has already finished.
+
+        Parameters:
+            name (str): Name of the span.
+            category (str): Category of the span (e.g. 'step' or 'wait').
+            started (float): `time.perf_counter()` at the start of the span.
+            ended (float, optional): `time.perf_counter()` at the end of the span. Defaults to now.
+            **args: Extra arguments shown with the span.
+
+        Returns:
+            None
+        '''
+
+        if not self.enabled:
+            return
+
+        ended = ended if ended is not None else time.perf_counter()
+        with self._lock:
+            event = self._event(name, category, 'X', started, **args)
+            event['dur'] = (ended - started) * 1e6
+            self.events.append(event)
+
+
+    @contextmanager
+    def span(self, name, category = 'step', **args):
+        '''
+        Record a span around a block. A span is recorded even if the block raises, with the exception's name.
+
+        Parameters:
+            name (str): Name of the span.
+            category (str, optional): Category of the span. Defaults to 'step'.
+            **args: Extra arguments shown with the span.
+
+        Returns:
+            contextlib.AbstractContextManager: The span.
+        '''
+
+        if category == 'step':
+            if not hasattr(self._local, 'steps'):
+                self._local.steps = []
+            self._local.steps.append(name)
+
+        started = time.perf_counter()
+        try:
+            yield
+        except BaseException as e:
+            args['error'] = type(e).__name__
+            raise
+        finally:
+            self.complete(name, category, started, **args)
+            if category == 'step':
+                self._local.steps.pop()
+
+
+    def instant(self, name, category = 'trigger', **args):
+        '''
+        Record an instant event (e.g. T0).
+
+        Parameters:
+            name (str): Name of the event.
+            category (str, optional): Category of the event. Defaults to 'trigger'.
+            **args: Extra arguments shown with the event.
+
+        Returns:
+            None
+        '''
+
+        if not self.enabled:
+            return
+
+        with self._lock:
+            event = self._event(name, category, 'i', time.perf_counter(), **args)
+            event['s'] = 'g'    # drawn across every thread
+            self.events.append(event)
+
+
+    def export(self, path):
+        '''
+        Write the recorded events to a JSON trace file.
+
+        Parameters:
+            path (str): Path of the trace file.
+
+        Returns:
+            None
+        '''
+
+        with self._lock:
+            events = list(self.events)
+
+        with open(path, 'w') as file:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, file)
+
+
+# Tracer shared by every worker of the process
+TRACER = Tracer()
+
+
+def traced(category = 'step'):
+    '''
+    Decorate a method to record a span named after it on every call.
+
+    Parameters:
+        category (str, optional): Category of the spans. Defaults to 'step'.
+
+    Returns:
+        callable: The decorator.
+    '''
+
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            with TRACER.span(method.__name__, category):
+                return method(*args, **kwargs)
+        return wrapper
+
+    return decorator
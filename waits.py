@@ -0,0 +1,285 @@
+import time
+import logging
+from tracing import TRACER
+from selenium.webdriver.common.by import By
+from selenium.webdriver.remote.webelement import WebElement
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import NoSuchElementException, StaleElementReferenceException, TimeoutException
+
+# Resolves with the first element matching the selector under the root, as soon as it is added to the DOM
+OBSERVER_SCRIPT = '''
+var selector = arguments[0], timeoutMs = arguments[1], root = arguments[2] || document, done = arguments[arguments.length - 1];
+var found = root.querySelector(selector);
+if (found) { done(found); return; }
+var timer = null;
+var observer = new MutationObserver(function() {
+    var match = root.querySelector(selector);
+    if (match) { observer.disconnect(); clearTimeout(timer); done(match); }
+});
+observer.observe(root === document ? document.documentElement : root, {childList: true, subtree: true, attributes: true});
+timer = setTimeout(function() { observer.disconnect(); done(null); }, timeoutMs);
+'''
+
+
+def wait_for_first(driver, outcomes, timeout, poll_frequency = 0.5):
+    '''
+    Wait until the first of several outcomes occurs, instead of sleeping for a fixed duration.
+    Outcomes are checked in order on every poll, so list the one that should win a tie first.
+
+    Parameters:
+        driver (selenium.webdriver.Chrome): The driver to wait on.
+        outcomes (dict): Outcome name -> condition, called with the driver and returning a truthy value once the outcome occurred
+            (e.g. an `expected_conditions` instance).
+        timeout (float): Maximum number of seconds to wait.
+        poll_frequency (float, optional): Seconds between polls. Defaults to Selenium's 0.5.
+
+    Returns:
+        tuple: (name, value, elapsed), where name is the outcome that occurred (None on timeout),
+            value is what its condition returned and elapsed is the wait in seconds.
+    '''
+
+    started = time.perf_counter()
+
+    def first_outcome(driver):
+        for name, condition in outcomes.items():
+            try:
+                value = condition(driver)
+            except (NoSuchElementException, StaleElementReferenceException):
+                value = False
+            if value:
+                return name, value
+        return False
+
+    try:
+        name, value = WebDriverWait(driver, timeout, poll_frequency = poll_frequency).until(first_outcome)
+    except TimeoutException:
+        name, value = None, None
+
+    return name, value, time.perf_counter() - started
+
+
+def css_selector(locator):
+    '''
+    Convert a locator to an equivalent CSS selector.
+
+    Parameters:
+        locator (tuple): (By strategy, value).
+
+    Returns:
+        str: The CSS selector, or None if the strategy has no CSS equivalent (e.g. XPath or link text).
+    '''
+
+    by, value = locator
+    if by == By.CSS_SELECTOR:
+        return value
+    if by == By.ID:
+        return f'[id="{value}"]'
+    if by == By.CLASS_NAME:
+        return f'.{value}'
+    if by == By.TAG_NAME:
+        return value
+    return None
+
+
+class Waiter:
+
+    def __init__(self, config, logger = None, cancel_check = None):
+        '''
+        Initialise the wait engine used for every wait in the BookingBot.
+
+        In 'poll' mode, waits poll every 'poll_interval_ms' instead of Selenium's default 500 ms.
+        In 'observer' mode, presence waits install a MutationObserver in the page and resolve as soon as
+        a matching node is added, re-armed every 'observer_slice_ms' so a cancellation is noticed; other waits still poll.
+
+        Parameters:
+            config (dict): Configuration settings loaded from a JSON file. Wait settings are read from 'waits'.
+            logger (logging.Logger, optional): Logger object for logging events. Defaults to the root logger.
+            cancel_check (callable, optional): Called on every poll; raises to abort the wait. Defaults to none.
+        '''
+
+        settings = config.get('waits', {})
+
+        self.logger = logger or logging.getLogger()
+        self.cancel_check = cancel_check or (lambda: None)
+        self.poll_interval = settings.get('poll_interval_ms', 25) / 1000
+        self.mode = settings.get('mode', 'poll')
+        self.observer_slice = settings.get('observer_slice_ms', 250) / 1000
+        self.records = []    # one dict per wait: name, mode, latency, polls, found
+
+
+    def _record(self, name, mode, started, polls, found):
+        '''
+        Record the latency and poll count of a wait, and trace it as a span.
+
+        Parameters:
+            name (str): Name of the wait.
+            mode (str): 'poll' or 'observer'.
+            started (float): `time.perf_counter()` at the start of the wait.
+            polls (int): Number of times the condition was checked.
+            found (bool): Whether the wait succeeded.
+
+        Returns:
+            None
+        '''
+
+        ended = time.perf_counter()
+        latency = ended - started
+        TRACER.complete(name, 'wait', started, ended, mode = mode, polls = polls, found = found)
+        self.records.append({'name': name, 'mode': mode, 'latency': latency, 'polls': polls, 'found': found})
+        self.logger.debug(f"Wait '{name}' ({mode}): {latency * 1000:.1f} ms, {polls} polls, {'found' if found else 'timed out'}.")
+
+
+    def until(self, scope, condition, timeout, name = 'wait'):
+        '''
+        Poll a condition until it returns a truthy value.
+
+        Parameters:
+            scope (WebDriver or WebElement): What the condition is evaluated against.
+            condition (callable): Called with the scope, e.g. an `expected_conditions` instance.
+            timeout (float): Maximum number of seconds to wait.
+            name (str, optional): Name of the wait, for the records. Defaults to 'wait'.
+
+        Returns:
+            The condition's return value.
+
+        Raises:
+            TimeoutException: If the condition is not met within the timeout.
+        '''
+
+        started = time.perf_counter()
+        polls = [0]
+
+        def counted(scope):
+            self.cancel_check()
+            polls[0] += 1
+            return condition(scope)
+
+        found = False
+        try:
+            value = WebDriverWait(scope, timeout, poll_frequency = self.poll_interval).until(counted)
+            found = True
+            return value
+        finally:
+            self._record(name, 'poll', started, polls[0], found)
+
+
+    def present(self, scope, locator, timeout, name = 'present'):
+        '''
+        Wait for an element to be present in the DOM.
+
+        Parameters:
+            scope (WebDriver or WebElement): Where to search for the element.
+            locator (tuple): (By strategy, value).
+            timeout (float): Maximum number of seconds to wait.
+            name (str, optional): Name of the wait, for the records. Defaults to 'present'.
+
+        Returns:
+            WebElement: The element.
+
+        Raises:
+            TimeoutException: If the element is not present within the timeout.
+        '''
+
+        selector = css_selector(locator)
+        if self.mode != 'observer' or selector is None:
+            return self.until(scope, EC.presence_of_element_located(locator), timeout, name)
+
+        if isinstance(scope, WebElement):
+            driver, root = scope.parent, scope
+        else:
+            driver, root = scope, None
+
+        started = time.perf_counter()
+        deadline = started + timeout
+        element = None
+        polls = 0
+        try:
+            # One observer per slice, checking for cancellation between slices
+            while element is None:
+                self.cancel_check()
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                slice_seconds = min(remaining, self.observer_slice)
+                driver.set_script_timeout(slice_seconds + 1)
+                element = driver.execute_async_script(OBSERVER_SCRIPT, selector, int(slice_seconds * 1000), root)
+                polls += 1
+        finally:
+            self._record(name, 'observer', started, polls, element is not None)
+
+        if element is None:
+            raise TimeoutException(f"No element matching '{selector}' within {timeout}s.")
+        return element
+
+
+    def clickable(self, scope, locator, timeout, name = 'clickable'):
+        '''
+        Wait for an element to be visible and enabled.
+        In 'observer' mode, waits for the element to be present first.
+
+        Parameters:
+            scope (WebDriver or WebElement): Where to search for the element.
+            locator (tuple): (By strategy, value).
+            timeout (float): Maximum number of seconds to wait.
+            name (str, optional): Name of the wait, for the records. Defaults to 'clickable'.
+
+        Returns:
+            WebElement: The element.
+
+        Raises:
+            TimeoutException: If the element is not clickable within the timeout.
+        '''
+
+        if self.mode == 'observer' and css_selector(locator) is not None:
+            self.present(scope, locator, timeout, name)
+        return self.until(scope, EC.element_to_be_clickable(locator), timeout, name)
+
+
+    def first(self, driver, outcomes, timeout, name = 'outcome'):
+        '''
+        Wait until the first of several outcomes occurs. See `wait_for_first`.
+
+        Parameters:
+            driver (selenium.webdriver.Chrome): The driver to wait on.
+            outcomes (dict): Outcome name -> condition.
+            timeout (float): Maximum number of seconds to wait.
+            name (str, optional): Name of the wait, for the records. Defaults to 'outcome'.
+
+        Returns:
+            tuple: (name, value, elapsed) of the outcome that occurred.
+        '''
+
+        started = time.perf_counter()
+        polls = [0]
+
+        def counted(condition):
+            def check(driver):
+                self.cancel_check()
+                polls[0] += 1
+                return condition(driver)
+            return check
+
+        # Count one poll per round of checks, not per outcome
+        conditions = dict(outcomes)
+        first_name = next(iter(conditions))
+        conditions[first_name] = counted(conditions[first_name])
+
+        result = wait_for_first(driver, conditions, timeout, self.poll_interval)
+        self._record(name, 'poll', started, polls[0], result[0] is not None)
+        return result
+
+
+    def summary(self):
+        '''
+        Summarise and clear the recorded waits.
+
+        Returns:
+            str: Number of waits, total latency and total polls since the last summary.
+        '''
+
+        latency = sum(record['latency'] for record in self.records)
+        polls = sum(record['polls'] for record in self.records)
+        summary = f"{len(self.records)} waits, {latency:.2f}s waiting, {polls} polls"
+        self.records = []
+        return summary